@@ -0,0 +1,140 @@
+"""Micro-benchmarks of the data path at scaled dataset sizes.
+
+Covers loading (cold: CSV parse + Arrow conversion; warm: memory-mapped Arrow),
+missing-value counts, the store and range-index builds, the top-emitters
+ranking, the time-series filter + rolling mean, and figure serialization with
+``figure_json`` (what the routes send, see figures.py). Each size runs against
+a synthetic dataset (see synthetic.py) written once under ``data/bench/<size>/``.
+
+    python -m benchmarks.data_path                  # 15k, 150k, 1m, 10m (~2 min)
+    python -m benchmarks.data_path --sizes 15k,150k
+
+Results are merged into ``benchmarks/results/data_path.json`` (sizes not run
+keep their previous numbers) with sorted keys and rounded timings, so a
+regression between commits shows up as a diff of that file.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.synthetic import FIRST_YEAR, LAST_YEAR, SIZES, write_synthetic_csv  # noqa: E402
+from flask_app.config import CO2_COL, COUNTRY_COL, LOCAL_PATH, YEAR_COL  # noqa: E402
+from flask_app.services import data  # noqa: E402
+from flask_app.services.arrow_cache import cache_path_for  # noqa: E402
+from flask_app.services.figures import figure_json  # noqa: E402
+from flask_app.services.histogram import histogram_bins, histogram_figure  # noqa: E402
+from flask_app.services.range_index import PrefixSumIndex  # noqa: E402
+from flask_app.services.store import CountryStore  # noqa: E402
+
+RESULTS_PATH = os.path.join(ROOT, "benchmarks", "results", "data_path.json")
+DEFAULT_SIZES = ",".join(SIZES)
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.3g}")
+
+
+def timed(fn: Callable[[], object], min_time: float = 0.2, min_repeat: int = 3, max_repeat: int = 25) -> Dict[str, float]:
+    """Run fn until min_time has elapsed (within the repeat bounds); min and median in ms."""
+    samples: List[float] = []
+    start = time.perf_counter()
+    while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"min_ms": _round(min(samples)), "median_ms": _round(statistics.median(samples)), "repeat": len(samples)}
+
+
+def bench_size(label: str, rows: int) -> Dict[str, object]:
+    workdir = os.path.join(ROOT, "data", "bench", label)
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    # The data service reads the relative LOCAL_PATH, so each size gets its own working directory
+    os.chdir(workdir)
+    try:
+        write_synthetic_csv(LOCAL_PATH, rows)
+        cases: Dict[str, Dict[str, float]] = {}
+
+        def cold_load():
+            if os.path.exists(cache_path_for(LOCAL_PATH)):
+                os.remove(cache_path_for(LOCAL_PATH))
+            data.load_data()
+
+        cases["load_data_cold"] = timed(cold_load, min_time=0, min_repeat=1)
+        cases["load_data"] = timed(data.load_data)
+        dataset = data.load_data()
+        clean_df, raw_df = dataset.clean(), dataset.raw
+
+        cases["compute_nan_counts"] = timed(lambda: data.compute_nan_counts(raw_df))
+        cases["store_build"] = timed(lambda: CountryStore.from_frame(clean_df), min_repeat=1)
+        store = CountryStore.from_frame(clean_df)
+        cases["range_index_build"] = timed(lambda: PrefixSumIndex.from_store(store), min_repeat=1)
+        index = PrefixSumIndex.from_store(store)
+        cases["aggregate_top_emitters"] = timed(lambda: data.aggregate_top_emitters(index, 1990, 2010, 10))
+
+        one, ten = store.country_list[:1], store.country_list[:10]
+        cases["series_1_country_rolling5"] = timed(lambda: store.compare(one, FIRST_YEAR, LAST_YEAR, 5))
+        cases["series_10_countries_rolling5"] = timed(lambda: store.compare(ten, FIRST_YEAR, LAST_YEAR, 5))
+
+        import plotly.express as px
+
+        hist_fig = histogram_figure(*histogram_bins(store.columns[CO2_COL]))
+        top_fig = px.bar(index.top(1990, 2010, 30), x=CO2_COL, y=COUNTRY_COL, orientation="h", text=CO2_COL)
+        series_fig = px.line(store.compare(ten, FIRST_YEAR, LAST_YEAR, 1), x=YEAR_COL, y=CO2_COL, color=COUNTRY_COL)
+        cases["figure_json_histogram"] = timed(lambda: figure_json(hist_fig))
+        cases["figure_json_top_emitters_30"] = timed(lambda: figure_json(top_fig))
+        cases["figure_json_series_10_countries"] = timed(lambda: figure_json(series_fig))
+        return {"rows": int(len(raw_df)), "countries": int(len(store.countries)), "cases": cases}
+    finally:
+        os.chdir(cwd)
+
+
+def environment() -> Dict[str, str]:
+    import plotly
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": str(os.cpu_count()),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated subset of {','.join(SIZES)}")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, object] = {}
+    if os.path.exists(args.output):
+        with open(args.output) as fh:
+            results = json.load(fh).get("results", {})
+    for label in args.sizes.split(","):
+        results[label] = bench_size(label, SIZES[label])
+        print(f"== {label} ({results[label]['rows']} rows)")
+        for case, timing in results[label]["cases"].items():
+            print(f"  {case:<32} {timing['median_ms']:>10} ms (min {timing['min_ms']}, n={timing['repeat']})")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as fh:
+        json.dump({"environment": environment(), "results": results}, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Local load test of the Flask routes under gunicorn.
+
+Starts ``gunicorn -c gunicorn.conf.py`` on a synthetic dataset (see
+synthetic.py) for every combination of worker count, thread count and cache
+backend, drives it with closed-loop virtual users and reports p50/p90/p99
+latency and throughput per route. Everything runs on this machine: the users
+are threads holding keep-alive ``http.client`` connections, and only the
+in-process ``lru`` and ``filesystem`` cache backends are swept by default.
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --workers 1,2,4 --threads 1,4 --backends lru,filesystem \\
+        --users 16 --duration 30 --size 1m
+
+Each user loops over a weighted mix of dashboard, time-series and download
+requests. Countries, year ranges and controls are drawn from skewed
+distributions so that, as with real traffic, a few popular views repeat and
+the tail is mostly unique. Each configuration starts with empty cache,
+artifact and pre-render directories, so none is measured against results
+warmed by the previous one. The report is printed and written as JSON
+(``--output``, default ``data/loadtest/report.json``).
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.synthetic import FIRST_YEAR, LAST_YEAR, SIZES, write_synthetic_csv  # noqa: E402
+from flask_app.config import COUNTRY_COL, LOCAL_PATH, SEPARATOR  # noqa: E402
+
+HOST = "127.0.0.1"
+
+# (route label, weight); see QueryMix.next_request
+ROUTE_MIX = (("index", 0.45), ("time_series", 0.4), ("download", 0.15))
+
+
+class QueryMix:
+    """Realistic query-parameter mix: Zipf-skewed countries, mostly default controls."""
+
+    def __init__(self, countries: List[str], seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.countries = countries
+        ranks = np.arange(1, len(countries) + 1)
+        self.country_weights = (1 / ranks ** 1.1).tolist()
+        self.routes, self.route_weights = zip(*ROUTE_MIX)
+
+    def _country(self) -> str:
+        return self.rng.choices(self.countries, self.country_weights)[0]
+
+    def _years(self, default_start: int) -> Tuple[int, int]:
+        if self.rng.random() < 0.5:
+            return default_start, LAST_YEAR
+        start = self.rng.randint(FIRST_YEAR, LAST_YEAR - 5)
+        return start, self.rng.randint(start + 5, LAST_YEAR)
+
+    def next_request(self) -> Tuple[str, str]:
+        route = self.rng.choices(self.routes, self.route_weights)[0]
+        if route == "index":
+            start, end = self._years(max(FIRST_YEAR, 1950))
+            params = {"start_year": start, "end_year": end, "top_n": self.rng.choice([10, 10, 10, 5, 15, 20, 30])}
+            if self.rng.random() < 0.1:
+                params["show_missing"] = 1
+            return route, "/?" + urlencode(params)
+        start, end = self._years(FIRST_YEAR)
+        n_countries = 1 if self.rng.random() < 0.8 else self.rng.randint(2, 5)
+        params = [("country", self._country()) for _ in range(n_countries)]
+        params += [("start_year", start), ("end_year", end)]
+        if route == "time_series":
+            params += [("rolling", self.rng.choice([1, 1, 1, 3, 5, 10])), ("log", int(self.rng.random() < 0.1))]
+            return route, "/pages/time-series?" + urlencode(params)
+        params.append(("format", self.rng.choice(["csv", "csv", "csv", "csv.gz", "parquet"])))
+        return route, "/pages/time-series/download?" + urlencode(params)
+
+
+def user_loop(port: int, mix: QueryMix, stop_at: float, record_from: float, samples: Dict[str, list]) -> None:
+    conn = http.client.HTTPConnection(HOST, port, timeout=60)
+    while time.perf_counter() < stop_at:
+        route, path = mix.next_request()
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            size = len(resp.read())
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(HOST, port, timeout=60)
+            size, status = 0, 0
+        t1 = time.perf_counter()
+        if t0 >= record_from:
+            # list.append is atomic under the GIL; one list per route
+            samples[route].append((t1 - t0, status, size))
+    conn.close()
+
+
+def run_load(port: int, countries: List[str], users: int, duration: float, warmup: float, seed: int) -> Dict[str, object]:
+    samples: Dict[str, list] = {route: [] for route, _ in ROUTE_MIX}
+    start = time.perf_counter()
+    record_from, stop_at = start + warmup, start + warmup + duration
+    threads = [
+        threading.Thread(target=user_loop, args=(port, QueryMix(countries, seed + i), stop_at, record_from, samples))
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, duration)
+
+
+def summarize(samples: Dict[str, list], duration: float) -> Dict[str, object]:
+    report: Dict[str, object] = {}
+    every = list(itertools.chain.from_iterable(samples.values()))
+    for route, rows in [*samples.items(), ("all", every)]:
+        if not rows:
+            continue
+        latency = np.array([r[0] for r in rows]) * 1000
+        errors = sum(1 for r in rows if r[1] != 200)
+        report[route] = {
+            "requests": len(rows),
+            "rps": round(len(rows) / duration, 1),
+            "errors": errors,
+            "p50_ms": round(float(np.percentile(latency, 50)), 2),
+            "p90_ms": round(float(np.percentile(latency, 90)), 2),
+            "p99_ms": round(float(np.percentile(latency, 99)), 2),
+            "max_ms": round(float(latency.max()), 2),
+            "mb_per_s": round(sum(r[2] for r in rows) / duration / 1e6, 2),
+        }
+    return report
+
+
+def wait_ready(port: int, proc: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}, see gunicorn.log in the dataset directory")
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=2)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def start_server(workdir: str, state_dir: str, port: int, workers: int, threads: int, backend: str) -> subprocess.Popen:
+    """gunicorn serving the dataset of workdir, with its caches, artifacts and
+    pre-rendered payloads under state_dir."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        GUNICORN_BIND=f"{HOST}:{port}",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        CO2_CACHE_BACKEND=backend,
+        CO2_CACHE_DIR=os.path.join(state_dir, "cache"),
+        CO2_ARTIFACT_DIR=os.path.join(state_dir, "artifacts"),
+        CO2_PRERENDER_DIR=os.path.join(state_dir, "prerender"),
+        # Routes are measured, not the browser cache
+        CO2_HTTP_CACHE_MAX_AGE="0",
+    )
+    # Server output goes to a log file: an unread pipe would eventually block gunicorn
+    with open(os.path.join(workdir, "gunicorn.log"), "ab") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "--log-level", "warning"],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+
+def print_report(configs: List[Dict[str, object]]) -> None:
+    header = f"{'workers':>7} {'threads':>7} {'backend':<10} {'route':<12} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for config in configs:
+        for route, row in config["routes"].items():
+            print(
+                f"{config['workers']:>7} {config['threads']:>7} {config['backend']:<10} {route:<12} "
+                f"{row['rps']:>8} {row['p50_ms']:>8} {row['p90_ms']:>8} {row['p99_ms']:>8} {row['errors']:>6}"
+            )
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=_ints, default=[1, 2])
+    parser.add_argument("--threads", type=_ints, default=[1, 4])
+    parser.add_argument("--backends", default="lru,filesystem", help="cache backends (redis needs a local server)")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each measurement")
+    parser.add_argument("--size", default="15k", choices=list(SIZES))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(ROOT, "data", "loadtest", "report.json"))
+    args = parser.parse_args(argv)
+
+    workdir = os.path.join(ROOT, "data", "loadtest", args.size)
+    csv_path = write_synthetic_csv(os.path.join(workdir, LOCAL_PATH), SIZES[args.size])
+    countries = sorted(pd.read_csv(csv_path, sep=SEPARATOR, usecols=[COUNTRY_COL])[COUNTRY_COL].unique())
+    # Popularity order independent of the alphabetical one
+    random.Random(args.seed).shuffle(countries)
+
+    configs: List[Dict[str, object]] = []
+    for workers, threads, backend in itertools.product(args.workers, args.threads, args.backends.split(",")):
+        state_dir = tempfile.mkdtemp(prefix="state-", dir=workdir)
+        proc = start_server(workdir, state_dir, args.port, workers, threads, backend)
+        try:
+            wait_ready(args.port, proc)
+            routes = run_load(args.port, countries, args.users, args.duration, args.warmup, args.seed)
+        finally:
+            proc.terminate()
+            proc.wait(30)
+            shutil.rmtree(state_dir, ignore_errors=True)
+        configs.append({"workers": workers, "threads": threads, "backend": backend, "routes": routes})
+        print(f"done: workers={workers} threads={threads} backend={backend} rps={routes['all']['rps']}", file=sys.stderr)
+
+    print_report(configs)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as fh:
+        json.dump(
+            {"size": args.size, "users": args.users, "duration_s": args.duration, "configs": configs},
+            fh, indent=2,
+        )
+        fh.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
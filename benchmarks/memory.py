@@ -0,0 +1,87 @@
+"""Bytes per row of the in-memory dataset, before and after the compact dtypes.
+
+"before" is the previous layout: the raw frame as read (string names/codes,
+int64 years, float64 CO2), a ``dropna`` copy of it as the clean frame and the
+country store built from that copy. "after" is what a worker holds now: the
+compact raw frame (see flask_app/services/compact.py), its CO2 mask and the
+store built from it. Sizes count every buffer and each distinct Python object
+once, so shared strings are not counted per row.
+
+    python -m benchmarks.memory                     # 15k, 1m
+    python -m benchmarks.memory --sizes 15k,150k,1m,10m
+
+The report is printed and written to ``benchmarks/results/memory.json``.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import SIZES, write_synthetic_csv  # noqa: E402
+from flask_app.config import CO2_COL, LOCAL_PATH, SEPARATOR  # noqa: E402
+from flask_app.services.arrow_cache import read_csv_cached  # noqa: E402
+from flask_app.services.compact import CompactDataset, array_nbytes, frame_nbytes  # noqa: E402
+from flask_app.services.store import CountryStore  # noqa: E402
+
+RESULTS_PATH = os.path.join(ROOT, "benchmarks", "results", "memory.json")
+
+
+def store_nbytes(store: CountryStore) -> int:
+    return store.offsets.nbytes + sum(array_nbytes(values) for values in store.columns.values())
+
+
+def measure(label: str, rows: int) -> Dict[str, object]:
+    path = write_synthetic_csv(os.path.join(ROOT, "data", "bench", label, LOCAL_PATH), rows)
+    raw = read_csv_cached(path, SEPARATOR)
+    clean = raw.dropna(subset=[CO2_COL])
+    before = {
+        "raw": frame_nbytes(raw),
+        "clean": frame_nbytes(clean),
+        "store": store_nbytes(CountryStore.from_frame(clean)),
+    }
+    dataset = CompactDataset.from_frame(raw)
+    after = {
+        "raw": frame_nbytes(dataset.raw),
+        "mask": dataset.valid.nbytes,
+        "store": store_nbytes(CountryStore.from_frame(dataset.clean())),
+    }
+    n = len(raw)
+    return {
+        "rows": n,
+        "before_bytes_per_row": {k: round(v / n, 1) for k, v in {**before, "total": sum(before.values())}.items()},
+        "after_bytes_per_row": {k: round(v / n, 1) for k, v in {**after, "total": sum(after.values())}.items()},
+        "reduction": round(sum(before.values()) / sum(after.values()), 2),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="15k,1m", help=f"comma-separated subset of {','.join(SIZES)}")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, object] = {}
+    if os.path.exists(args.output):
+        with open(args.output) as fh:
+            results = json.load(fh)
+    print(f"{'size':<6} {'rows':>10} {'before B/row':>13} {'after B/row':>12} {'reduction':>10}")
+    for label in args.sizes.split(","):
+        results[label] = report = measure(label, SIZES[label])
+        print(
+            f"{label:<6} {report['rows']:>10} {report['before_bytes_per_row']['total']:>13} "
+            f"{report['after_bytes_per_row']['total']:>12} {report['reduction']:>9}x"
+        )
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Figure payload size, serialization and parse time: decimal text vs typed arrays.
+
+For the dashboard figures (histogram, top 30 emitters, one and ten countries'
+series, and a 50-country compare view) on synthetic datasets (see
+synthetic.py), three encodings are compared:
+
+- ``to_json``: ``fig.to_json()`` of the installed plotly.py (decimal text
+  before plotly.py 6, typed arrays for numpy data since)
+- ``decimal``: every value as decimal text, i.e. plotly.py 5's output
+- ``typed``: ``figure_json`` (typed arrays, scattergl above the WebGL threshold)
+
+Each gets its byte and gzip size, the server-side serialization time, and the
+client-side parse time: ``JSON.parse`` plus decoding every typed array the
+way plotly.js does (base64 -> ``ArrayBuffer`` -> typed array), timed in
+Node's V8 (the engine of Chrome) when ``node`` is on the PATH. Drawing time,
+where scattergl pays off, needs a real browser and is not measured.
+
+    python -m benchmarks.payloads                   # 15k, 1m
+    python -m benchmarks.payloads --sizes 15k
+
+Results are printed and merged into ``benchmarks/results/payloads.json``.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.data_path import environment, timed  # noqa: E402
+from benchmarks.synthetic import FIRST_YEAR, LAST_YEAR, SIZES, write_synthetic_csv  # noqa: E402
+from flask_app.config import CO2_COL, COUNTRY_COL, LOCAL_PATH, SEPARATOR, YEAR_COL  # noqa: E402
+from flask_app.services.arrow_cache import read_csv_cached  # noqa: E402
+from flask_app.services.compact import CompactDataset  # noqa: E402
+from flask_app.services.figures import figure_json  # noqa: E402
+from flask_app.services.histogram import histogram_bins, histogram_figure  # noqa: E402
+from flask_app.services.range_index import PrefixSumIndex  # noqa: E402
+from flask_app.services.store import CountryStore  # noqa: E402
+
+RESULTS_PATH = os.path.join(ROOT, "benchmarks", "results", "payloads.json")
+DEFAULT_SIZES = "15k,1m"
+
+# Parse each payload file like the pages do, then decode its typed arrays like plotly.js
+NODE_PARSE = r"""
+const fs = require('fs');
+const CTORS = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+               i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array};
+function decode(value) {
+  if (Array.isArray(value)) { value.forEach(decode); return; }
+  if (value === null || typeof value !== 'object') return;
+  if (typeof value.bdata === 'string' && value.dtype in CTORS) {
+    const buf = Buffer.from(value.bdata, 'base64');
+    const bytes = new Uint8Array(buf.length);
+    bytes.set(buf);
+    new CTORS[value.dtype](bytes.buffer);
+    return;
+  }
+  Object.values(value).forEach(decode);
+}
+const results = {};
+for (const path of process.argv.slice(1)) {
+  const text = fs.readFileSync(path, 'utf8');
+  const samples = [];
+  const start = process.hrtime.bigint();
+  while (samples.length < 25 && (samples.length < 5 || Number(process.hrtime.bigint() - start) < 2e8)) {
+    const t0 = process.hrtime.bigint();
+    decode(JSON.parse(text).data);
+    samples.push(Number(process.hrtime.bigint() - t0) / 1e6);
+  }
+  samples.sort((a, b) => a - b);
+  results[path] = samples[Math.floor(samples.length / 2)];
+}
+console.log(JSON.stringify(results));
+"""
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.3g}")
+
+
+def figures(label: str, rows: int) -> Dict[str, object]:
+    import plotly.express as px
+
+    path = write_synthetic_csv(os.path.join(ROOT, "data", "bench", label, LOCAL_PATH), rows)
+    dataset = CompactDataset.from_frame(read_csv_cached(path, SEPARATOR))
+    store = CountryStore.from_frame(dataset.clean())
+    index = PrefixSumIndex.from_store(store)
+    countries = store.country_list
+    one = store.compare(countries[:1], FIRST_YEAR, LAST_YEAR, 5)
+    rolling = px.line(one, x=YEAR_COL, y=CO2_COL, markers=True)
+    rolling.add_scatter(x=one[YEAR_COL], y=one["Rolling 5y"], mode="lines")
+    return {
+        "histogram": histogram_figure(*histogram_bins(store.columns[CO2_COL])),
+        "top_emitters_30": px.bar(index.top(1990, 2010, 30), x=CO2_COL, y=COUNTRY_COL, orientation="h", text=CO2_COL),
+        "series_1_country_rolling5": rolling,
+        "series_10_countries": px.line(
+            store.compare(countries[:10], FIRST_YEAR, LAST_YEAR), x=YEAR_COL, y=CO2_COL, color=COUNTRY_COL
+        ),
+        "series_50_countries": px.line(
+            store.compare(countries[:50], FIRST_YEAR, LAST_YEAR), x=YEAR_COL, y=CO2_COL, color=COUNTRY_COL
+        ),
+    }
+
+
+def bench_size(label: str, rows: int, node: str = None) -> Dict[str, object]:
+    encoders = {
+        "to_json": lambda fig: fig.to_json(),
+        "decimal": lambda fig: figure_json(fig, typed=False, webgl_threshold=None),
+        "typed": figure_json,
+    }
+    cases: Dict[str, Dict[str, Dict[str, float]]] = {}
+    workdir = tempfile.mkdtemp(prefix="co2-payloads-")
+    files: Dict[str, tuple] = {}
+    try:
+        for name, fig in figures(label, rows).items():
+            cases[name] = {}
+            for encoding, encode in encoders.items():
+                text = encode(fig)
+                body = text.encode()
+                cases[name][encoding] = {
+                    "bytes": len(body),
+                    "gzip_bytes": len(gzip.compress(body, 6)),
+                    "serialize_ms": timed(lambda: encode(fig))["median_ms"],
+                }
+                path = os.path.join(workdir, f"{name}.{encoding}.json")
+                with open(path, "w") as fh:
+                    fh.write(text)
+                files[path] = (name, encoding)
+        if node:
+            out = subprocess.run([node, "-e", NODE_PARSE, *files], capture_output=True, text=True, check=True).stdout
+            for path, ms in json.loads(out).items():
+                name, encoding = files[path]
+                cases[name][encoding]["parse_ms"] = _round(ms)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"rows": rows, "cases": cases}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated subset of {','.join(SIZES)}")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    node = shutil.which("node")
+    if node is None:
+        print("node not found: parse times are not measured")
+    results: Dict[str, object] = {}
+    if os.path.exists(args.output):
+        with open(args.output) as fh:
+            results = json.load(fh).get("results", {})
+    for label in args.sizes.split(","):
+        results[label] = bench_size(label, SIZES[label], node)
+        print(f"== {label}")
+        print(f"  {'figure':<28}{'encoding':<10}{'bytes':>10}{'gzip':>9}{'serialize ms':>14}{'parse ms':>10}")
+        for name, encodings in results[label]["cases"].items():
+            for encoding, r in encodings.items():
+                print(
+                    f"  {name:<28}{encoding:<10}{r['bytes']:>10}{r['gzip_bytes']:>9}"
+                    f"{r['serialize_ms']:>14}{r.get('parse_ms', '-'):>10}"
+                )
+
+    env = environment()
+    if node:
+        env["node"] = subprocess.run([node, "--version"], capture_output=True, text=True).stdout.strip()
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as fh:
+        json.dump({"environment": env, "results": results}, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
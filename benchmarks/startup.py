@@ -0,0 +1,144 @@
+"""Cold-start report and budget check for the Flask and Streamlit entry points.
+
+Each entry point is started in a fresh interpreter with ``-X importtime``, so
+nothing is warm. The report splits wall time into stages (importing the app,
+``create_app()``, loading the dataset; running the Streamlit script) and
+attributes import cost to packages. ``--check`` exits non-zero when a cold
+start goes over its budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --check --budget-flask 1.5 --budget-streamlit 6
+
+Run it from the directory holding ``data/`` (the repo root by default). The
+dataset is fetched first if missing; the fetch is not part of the timings.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds; the budgeted figure is import + create_app() for Flask and the first
+# script run for Streamlit (dataset reads and index builds included)
+FLASK_BUDGET_S = float(os.environ.get("CO2_FLASK_COLD_START_BUDGET", "1.5"))
+STREAMLIT_BUDGET_S = float(os.environ.get("CO2_STREAMLIT_COLD_START_BUDGET", "6.0"))
+
+# Child programs: print a JSON dict of stage timings as their last stdout line
+FLASK_CHILD = """
+import json, time
+t0 = time.perf_counter()
+from flask_app.app import create_app
+t1 = time.perf_counter()
+app = create_app(background_load=False)
+t2 = time.perf_counter()
+from flask_app.services.data import loader
+loader.run()
+t3 = time.perf_counter()
+assert loader.ready, loader.error
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "dataset": t3 - t2}))
+"""
+
+STREAMLIT_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file({script!r}, default_timeout=120)
+at.run()
+t2 = time.perf_counter()
+assert not at.exception, [e.value for e in at.exception]
+print(json.dumps({{"harness": t1 - t0, "script": t2 - t1}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Self import time in seconds per package (per module for this repo's code)."""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        local = name.startswith(("flask_app", "streamlit_data"))
+        totals[name if local else name.split(".")[0]] += int(self_us) / 1e6
+    return dict(totals)
+
+
+def run_child(code: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    env.setdefault("CO2_BACKGROUND_LOAD", "0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def measure(name: str, code: str, repeat: int) -> Dict[str, object]:
+    """Best-of-repeat stage timings plus the import breakdown of that run."""
+    runs = [run_child(code) for _ in range(repeat)]
+    stages, imports = min(runs, key=lambda run: sum(run[0].values()))
+    return {"target": name, "stages": stages, "imports": imports}
+
+
+def print_report(result: Dict[str, object], top: int) -> None:
+    stages = result["stages"]
+    imports = sorted(result["imports"].items(), key=lambda kv: kv[1], reverse=True)
+    print(f"== {result['target']}")
+    for stage, seconds in stages.items():
+        print(f"  {stage:<12} {seconds * 1000:8.1f} ms")
+    print(f"  imports by package (self time, top {top}):")
+    for module, seconds in imports[:top]:
+        print(f"    {module:<40} {seconds * 1000:8.1f} ms")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="exit 1 when a cold start is over budget")
+    parser.add_argument("--budget-flask", type=float, default=FLASK_BUDGET_S)
+    parser.add_argument("--budget-streamlit", type=float, default=STREAMLIT_BUDGET_S)
+    parser.add_argument("--script", default=os.path.join(ROOT, "app.py"), help="Streamlit script to start")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from flask_app.services.loader import fetch_dataset
+
+    fetch_dataset()
+
+    results = [
+        measure("flask", FLASK_CHILD, args.repeat),
+        measure("streamlit", STREAMLIT_CHILD.format(script=args.script), args.repeat),
+    ]
+    for result in results:
+        print_report(result, args.top)
+
+    flask_s = results[0]["stages"]["import"] + results[0]["stages"]["create_app"]
+    streamlit_s = results[1]["stages"]["script"]
+    checks = [
+        ("flask import + create_app()", flask_s, args.budget_flask),
+        ("streamlit first script run", streamlit_s, args.budget_streamlit),
+    ]
+    print("== budgets")
+    over = False
+    for label, seconds, budget in checks:
+        status = "OK" if seconds <= budget else "OVER"
+        over |= seconds > budget
+        print(f"  {label:<30} {seconds:6.2f} s / {budget:.2f} s  {status}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"results": results, "budgets": checks}, fh, indent=2)
+    return 1 if args.check and over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
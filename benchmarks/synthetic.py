@@ -0,0 +1,51 @@
+"""Synthetic CO2 datasets with the real file's schema, scaled by row count.
+
+The real CSV has ~15k rows: ~260 countries x ~60 years. Larger datasets add
+countries and, past ``MONTHLY_FROM`` rows, switch to monthly resolution (12
+rows per country and year, same integer ``Year``), which is how 10M rows stay
+within a plausible number of countries. About 5% of the CO2 values are NaN.
+"""
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from flask_app.config import CO2_COL, COUNTRY_COL, SEPARATOR, YEAR_COL
+from flask_app.services.fs import atomic_path
+
+FIRST_YEAR, LAST_YEAR = 1960, 2019
+MONTHLY_FROM = 100_000
+NAN_FRACTION = 0.05
+SIZES: Dict[str, int] = {"15k": 15_000, "150k": 150_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """About ``rows`` rows (rounded up to whole countries), grouped by country and year."""
+    rng = np.random.default_rng(seed)
+    months = 12 if rows >= MONTHLY_FROM else 1
+    per_country = (LAST_YEAR - FIRST_YEAR + 1) * months
+    n_countries = -(-rows // per_country)
+    names = np.array([f"Country {i:05d}" for i in range(n_countries)], dtype=object)
+    codes = np.array([f"C{i:05d}" for i in range(n_countries)], dtype=object)
+    years = np.repeat(np.arange(FIRST_YEAR, LAST_YEAR + 1), months)
+    # Per-country level times a noisy trend, so rankings and rolling means are non-trivial
+    level = rng.gamma(2.0, 2.5, n_countries)
+    trend = 1 + 0.01 * (years - FIRST_YEAR)
+    co2 = (level[:, None] * trend[None, :] * rng.lognormal(0, 0.2, (n_countries, per_country))).ravel()
+    co2[rng.random(co2.size) < NAN_FRACTION] = np.nan
+    return pd.DataFrame({
+        COUNTRY_COL: np.repeat(names, per_country),
+        "Country Code": np.repeat(codes, per_country),
+        YEAR_COL: np.tile(years, n_countries),
+        CO2_COL: co2,
+    })
+
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 0) -> str:
+    """Write the synthetic dataset to path unless it already exists; return path."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with atomic_path(path) as tmp_path:
+            synthetic_frame(rows, seed).to_csv(tmp_path, sep=SEPARATOR, index=False)
+    return path
@@ -1,29 +1,51 @@
 from flask import Flask
 from flask_caching import Cache
 
+from .config import BACKGROUND_LOAD, CACHE_BACKEND, CACHE_BACKENDS
+
 
 # Create a single Cache instance to be shared across modules
 cache = Cache()
 
 
-def create_app() -> Flask:
+def create_app(cache_backend: str = CACHE_BACKEND, background_load: bool = BACKGROUND_LOAD) -> Flask:
     app = Flask(__name__, static_folder="static", template_folder="templates")
 
     # Basic config
+    if cache_backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend {cache_backend!r}, expected one of {sorted(CACHE_BACKENDS)}")
     app.config.from_mapping(
-        CACHE_TYPE="SimpleCache",
         CACHE_DEFAULT_TIMEOUT=600,
+        **CACHE_BACKENDS[cache_backend],
     )
 
     # Initialize cache with the app
     cache.init_app(app)
 
-    # Blueprints
+    # Blueprints (instrumentation first: its hooks wrap those of the others)
+    from .blueprints.instrumentation import bp as instrumentation_bp
     from .blueprints.main import bp as main_bp
     from .blueprints.pages import bp as pages_bp
+    from .blueprints.api import bp as api_bp
+    from .blueprints.health import bp as health_bp
+    from .blueprints.admin import bp as admin_bp
+    from .blueprints.assets import bp as assets_bp
 
+    app.register_blueprint(instrumentation_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(pages_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(assets_bp)
+
+    # Fetch and index the dataset off the request path; /readyz reports progress
+    if background_load:
+        from .services.data import loader, watcher
+
+        loader.start()
+        # Pick up ingested deltas (INGEST_DIR and the journal) every INGEST_POLL_S
+        watcher.start()
 
     return app
 
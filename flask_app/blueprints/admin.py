@@ -0,0 +1,45 @@
+"""Operator endpoints: incremental dataset ingest, enabled by ``CO2_ADMIN_TOKEN``."""
+import hmac
+
+import orjson
+from flask import Blueprint, Response, abort, request
+
+from ..config import ADMIN_TOKEN
+from ..services import data
+
+
+bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+def _json(payload: dict, status: int = 200) -> Response:
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
+@bp.before_request
+def require_token():
+    if not ADMIN_TOKEN:
+        abort(404)
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        abort(401)
+
+
+@bp.post("/ingest")
+def ingest():
+    """Append the CSV rows of the request body (the dataset's columns and separator)
+    to the default dataset, or to the one named by ``?indicator=``.
+
+    Applied in this worker before responding; the others pick it up on their
+    next poll (``CO2_INGEST_POLL_S``) or on ``POST /admin/refresh``.
+    """
+    try:
+        summary = data.ingest(request.get_data())
+    except ValueError as exc:
+        return _json({"error": str(exc)}, 400)
+    return _json(summary)
+
+
+@bp.post("/refresh")
+def refresh():
+    """Apply journal entries ingested by other workers or processes."""
+    return _json(data.refresh())
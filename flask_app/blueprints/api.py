@@ -0,0 +1,127 @@
+"""JSON endpoints returning only the chart data a control change affects.
+
+static/js/app.js calls these on input changes and patches the existing charts
+with ``Plotly.react`` instead of reloading the page.
+"""
+import gzip
+from typing import Any, Dict
+
+import orjson
+from flask import Blueprint, Response, abort, request, url_for
+
+from ..config import TABLE_MAX_PAGE_SIZE, TABLE_PAGE_SIZE
+from ..services.data import get_describe, get_nan_counts, get_series, get_store, get_top_emitters, get_year_bounds
+from ..services.metrics import stage
+from ..services.payloads import display_frame, payload_json, race_payload, series_payload, top_emitters_payload
+from ..services.prerender import find_prerendered, read_prerendered
+from ..services.registry import indicator_args
+from ..services.tables import table_frame, table_page
+from .http_cache import conditional
+from .params import countries_arg, flag_arg, int_arg, year_range_args
+
+
+bp = Blueprint("api", __name__, url_prefix="/api")
+
+
+def json_response(payload: Dict[str, Any]) -> Response:
+    return Response(payload_json(payload), mimetype="application/json")
+
+
+def prerendered_response(path: str) -> Response:
+    """A pre-rendered payload file, sent as stored (gzip) when the client accepts it."""
+    with stage("prerender"):
+        body = read_prerendered(path)
+        if request.accept_encodings["gzip"] > 0:
+            response = Response(body, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(gzip.decompress(body), mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@bp.get("/top-emitters")
+@conditional()
+def top_emitters():
+    min_year, max_year = get_year_bounds()
+    start_year, end_year = year_range_args(max(min_year, 1950), min_year, max_year)
+    top_n = int_arg("top_n", 10, 1, 30)
+    return json_response(top_emitters_payload(start_year, end_year, top_n))
+
+
+@bp.get("/top-emitters/race")
+@conditional()
+def top_emitters_race():
+    """Year-by-year top N frames for the animated ranking, sliced from the per-year rank table."""
+    min_year, max_year = get_year_bounds()
+    start_year, end_year = year_range_args(max(min_year, 1950), min_year, max_year)
+    top_n = int_arg("top_n", 10, 1, 30)
+    return json_response(race_payload(start_year, end_year, top_n))
+
+
+@bp.get("/series")
+@conditional()
+def series():
+    store = get_store()
+    countries = countries_arg(tuple(store.country_list[:1]))
+    start_year, end_year = year_range_args(store.min_year, store.min_year, store.max_year)
+    rolling_window = int_arg("rolling", 1, 1, 25)
+    args = (countries, start_year, end_year, rolling_window, flag_arg("log"), flag_arg("table", "1"))
+    # Default views were rendered at deploy time, download_url included
+    path = find_prerendered(*args)
+    if path is not None:
+        return prerendered_response(path)
+    payload = series_payload(*args)
+    download_url = url_for(
+        "pages.download_csv",
+        country=list(countries),
+        start_year=start_year,
+        end_year=end_year,
+        **indicator_args(),
+    )
+    return json_response({**payload, "download_url": download_url})
+
+
+# ---------------------- Paginated tables ---------------------- #
+# Same query params (and defaults) as the section each table belongs to
+def _top_emitters_table():
+    min_year, max_year = get_year_bounds()
+    start_year, end_year = year_range_args(max(min_year, 1950), min_year, max_year)
+    return get_top_emitters(start_year, end_year, int_arg("top_n", 10, 1, 30))
+
+
+def _series_table():
+    store = get_store()
+    countries = countries_arg(tuple(store.country_list[:1]))
+    start_year, end_year = year_range_args(store.min_year, store.min_year, store.max_year)
+    return get_series(countries, start_year, end_year, int_arg("rolling", 1, 1, 25))
+
+
+TABLES = {
+    "top-emitters": _top_emitters_table,
+    "series": _series_table,
+    "missing": get_nan_counts,
+    "describe": lambda: table_frame(get_describe()),
+}
+
+
+@bp.get("/tables/<name>")
+@conditional()
+def table(name: str):
+    """One page of a dashboard table: ``page`` (from 0), ``page_size``, ``sort`` (column position), ``desc``."""
+    if name not in TABLES:
+        abort(404)
+    with stage("aggregate"):
+        df = display_frame(TABLES[name]())
+    sort = int_arg("sort", -1, -1, len(df.columns) - 1)
+    page_size = int_arg("page_size", TABLE_PAGE_SIZE, 1, TABLE_MAX_PAGE_SIZE)
+    with stage("table"):
+        page = table_page(
+            df,
+            request.full_path.rstrip("?"),
+            page=int_arg("page", 0, 0, max(len(df) - 1, 0) // page_size),
+            page_size=page_size,
+            sort=sort if sort >= 0 else None,
+            descending=flag_arg("desc"),
+        )
+    return Response(orjson.dumps(page), mimetype="application/json")
@@ -0,0 +1,51 @@
+"""Self-hosted third-party assets (see services/assets.py).
+
+Files are named after their content hash, so they are cached as immutable for
+a year; a new build changes the names the pages link to. Text assets are sent
+as their precompressed brotli or gzip copy when the client accepts it.
+"""
+import mimetypes
+import os
+
+from flask import Blueprint, abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+from ..config import ASSET_CDN_FALLBACK, ASSET_MAX_AGE, VENDOR_ASSETS
+from ..services.assets import COMPRESSED_SUFFIXES, MANIFEST, VENDOR_DIR, vendored_file
+
+
+bp = Blueprint("assets", __name__, url_prefix="/assets")
+
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@bp.app_template_global()
+def asset_url(name: str) -> str:
+    """URL of the vendored asset name, or its CDN URL until it is vendored (unless CO2_ASSET_CDN_FALLBACK=0)."""
+    filename = vendored_file(name)
+    if filename is not None:
+        return url_for("assets.asset", filename=filename)
+    if ASSET_CDN_FALLBACK:
+        return VENDOR_ASSETS[name]
+    raise RuntimeError(f"Asset {name!r} is not vendored, run `python -m flask_app.services.assets`")
+
+
+@bp.get("/<path:filename>")
+def asset(filename: str):
+    path = safe_join(VENDOR_DIR, filename)
+    if path is None or filename == MANIFEST or filename.endswith(COMPRESSED_SUFFIXES) or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            path, encoding = path + suffix, name
+            break
+    response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
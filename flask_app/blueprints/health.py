@@ -0,0 +1,66 @@
+"""Liveness/readiness endpoints, dataset selection and the loading gate for the other routes."""
+import orjson
+from flask import Blueprint, Response, abort, request
+
+from ..config import DEFAULT_DATASET
+from ..services.data import dataset_loader, datasets, loader, loader_states
+from ..services.registry import current_spec, select_dataset
+
+
+bp = Blueprint("health", __name__)
+
+RETRY_AFTER_S = 5
+# Answered while the dataset loads: probes, metrics and static files
+EXEMPT_ENDPOINTS = ("health.healthz", "health.readyz", "instrumentation.metrics", "static", "assets.asset")
+
+
+def _json(payload: dict, status: int) -> Response:
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
+@bp.get("/healthz")
+def healthz():
+    """The process is up and serving; says nothing about the dataset."""
+    return _json({"status": "ok"}, 200)
+
+
+@bp.get("/readyz")
+def readyz():
+    """200 once the default dataset is loaded, 503 with the load state until then;
+    ``datasets`` lists the loaded ones and their memory use, ``loaders`` the load
+    state of every dataset requested so far."""
+    payload = {**loader.state(), "datasets": datasets.state(), "loaders": loader_states()}
+    return _json(payload, 200 if loader.ready else 503)
+
+
+@bp.before_app_request
+def select_indicator():
+    """Make ``?indicator=<name>`` the dataset of this request (see registry.py); 404 if not registered."""
+    try:
+        select_dataset(request.args.get("indicator", DEFAULT_DATASET))
+    except KeyError:
+        abort(404, f"Unknown indicator {request.args['indicator']!r}")
+
+
+@bp.before_app_request
+def require_dataset():
+    """503 with ``Retry-After`` and the load state until the request's dataset is loaded."""
+    if request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    spec = current_spec()
+    current = dataset_loader(spec.name)
+    if current.ready:
+        return None
+    # (Re)start loading if it never started in this process or a previous attempt failed
+    current.start()
+    if request.accept_mimetypes.accept_html and not request.path.startswith("/api/"):
+        response = Response(
+            f'<meta http-equiv="refresh" content="{RETRY_AFTER_S}">'
+            f"Loading the {spec.title} dataset, this page will refresh.",
+            status=503,
+            mimetype="text/html",
+        )
+    else:
+        response = _json({"message": "Dataset is loading, retry shortly", "dataset": spec.name, **current.state()}, 503)
+    response.headers["Retry-After"] = str(RETRY_AFTER_S)
+    return response
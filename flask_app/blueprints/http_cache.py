@@ -0,0 +1,54 @@
+"""Conditional GET support for the dashboard routes.
+
+A response is fully determined by the dataset, the code/templates and the
+query string, so its strong ETag is a hash of those three and can be checked
+against ``If-None-Match`` before any data or rendering work happens. Bodies
+sent with a content coding get its name appended, so the gzip and identity
+representations of a URL never share a strong validator.
+"""
+import hashlib
+from functools import wraps
+from typing import Callable
+
+from flask import make_response, request
+
+from ..config import HTTP_CACHE_MAX_AGE
+from ..services.build import build_id
+from ..services.data import dataset_version
+from ..services.metrics import CACHE_REQUESTS
+
+# Content codings a view may send its body in (see api.prerendered_response)
+CODINGS = ("gzip",)
+
+
+def request_etag() -> str:
+    args = sorted(request.args.items(multi=True))
+    key = repr((build_id(), dataset_version(), request.path, args))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def conditional(max_age: int = HTTP_CACHE_MAX_AGE) -> Callable:
+    """Answer repeats with 304 and mark responses cacheable by browsers and proxies."""
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = request_etag()
+            # A response sent with a content coding (pre-rendered gzip payloads) is a
+            # different representation, tagged "<etag>-<coding>"
+            tags = [etag, *(f"{etag}-{coding}" for coding in CODINGS if request.accept_encodings[coding])]
+            matched = next((tag for tag in tags if request.if_none_match.contains(tag)), None)
+            CACHE_REQUESTS.inc(cache="http", name=request.endpoint, result="miss" if matched is None else "hit")
+            if matched is not None:
+                response = make_response("", 304)
+                response.set_etag(matched)
+                if matched != etag:
+                    response.vary.add("Accept-Encoding")
+            else:
+                response = make_response(view(*args, **kwargs))
+                coding = response.headers.get("Content-Encoding")
+                response.set_etag(f"{etag}-{coding}" if coding else etag)
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+"""Request timing: ``Server-Timing`` headers, ``/metrics`` and slow-request profiles."""
+import time
+
+from flask import Blueprint, Response, current_app, g, request
+
+from ..config import PROFILE_SLOW_MS
+from ..services.metrics import (
+    REQUEST_DURATION,
+    REQUESTS,
+    STAGE_DURATION,
+    SamplingProfiler,
+    finish_request,
+    render_metrics,
+    server_timing,
+    start_request,
+)
+
+
+bp = Blueprint("instrumentation", __name__)
+
+profiler = SamplingProfiler(PROFILE_SLOW_MS) if PROFILE_SLOW_MS > 0 else None
+
+
+@bp.get("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.before_app_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    start_request()
+    if profiler is not None:
+        profiler.begin()
+
+
+@bp.after_app_request
+def record_timings(response: Response) -> Response:
+    # Streamed bodies (downloads) are produced after this point; their time
+    # shows up in the access log, not here
+    total = time.perf_counter() - g.request_start
+    stages = finish_request()
+    endpoint = request.endpoint or "unmatched"
+    response.headers["Server-Timing"] = server_timing(stages, total)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_DURATION.observe(total, endpoint=endpoint)
+    for name, seconds in stages.items():
+        STAGE_DURATION.observe(seconds, endpoint=endpoint, stage=name)
+    if profiler is not None:
+        path = profiler.end(endpoint, total)
+        if path:
+            current_app.logger.warning("Slow request %s (%.0f ms), stacks in %s", request.full_path, total * 1000, path)
+    return response
@@ -0,0 +1,30 @@
+"""Query-parameter parsing shared by the page routes and the JSON API."""
+from typing import Tuple
+
+from flask import request
+
+
+def int_arg(name: str, default: int, min_v: int, max_v: int) -> int:
+    try:
+        val = int(request.args.get(name, default))
+    except Exception:
+        val = default
+    return max(min_v, min(max_v, val))
+
+
+def flag_arg(name: str, default: str = "0") -> bool:
+    return request.args.get(name, default) == "1"
+
+
+def year_range_args(default_start: int, min_year: int, max_year: int) -> Tuple[int, int]:
+    start_year = int_arg("start_year", default_start, min_year, max_year)
+    end_year = int_arg("end_year", max_year, min_year, max_year)
+    if start_year > end_year:
+        start_year, end_year = end_year, start_year
+    return start_year, end_year
+
+
+def countries_arg(default: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Repeated ``country`` params (compare mode), de-duplicated in order."""
+    countries = tuple(dict.fromkeys(c for c in request.args.getlist("country") if c))
+    return countries or default
@@ -1,12 +1,114 @@
-DATA_URL = "https://storage.googleapis.com/schoolofdata-datasets/Data-Analysis.Data-Visualization/CO2_per_capita.csv"
+import os
+
+DATA_URL = os.environ.get(
+    "CO2_DATA_URL",
+    "https://storage.googleapis.com/schoolofdata-datasets/Data-Analysis.Data-Visualization/CO2_per_capita.csv",
+)
 LOCAL_PATH = "data/CO2_per_capita.csv"
+# Copy used when DATA_URL cannot be fetched (plain or gzip-compressed CSV)
+SNAPSHOT_PATH = os.environ.get("CO2_SNAPSHOT_PATH", "flask_app/snapshot/CO2_per_capita.csv.gz")
+FETCH_RETRIES = int(os.environ.get("CO2_FETCH_RETRIES", "4"))
+FETCH_BACKOFF = float(os.environ.get("CO2_FETCH_BACKOFF", "0.5"))  # seconds, doubled per retry
+FETCH_TIMEOUT = float(os.environ.get("CO2_FETCH_TIMEOUT", "10"))
+# Load the dataset in a background thread from create_app (gunicorn.conf.py turns
+# this off and drives loading from its hooks instead)
+BACKGROUND_LOAD = os.environ.get("CO2_BACKGROUND_LOAD", "1") == "1"
+# Incremental refresh (services/refresh.py): CSV deltas dropped in INGEST_DIR or
+# posted to /admin/ingest are journaled next to LOCAL_PATH and applied by every
+# worker, which polls both every INGEST_POLL_S seconds (0 = no polling)
+INGEST_DIR = os.environ.get("CO2_INGEST_DIR", "data/incoming")
+INGEST_POLL_S = float(os.environ.get("CO2_INGEST_POLL_S", "5"))
+# Bearer token for the /admin endpoints; unset disables them
+ADMIN_TOKEN = os.environ.get("CO2_ADMIN_TOKEN", "")
 SEPARATOR = ";"
+# Canonical columns: every registered dataset is renamed to these when loaded,
+# CO2_COL holding its indicator values (see services/registry.py)
 CO2_COL = "CO2 Per Capita (metric tons)"
 COUNTRY_COL = "Country Name"
+CODE_COL = "Country Code"
 YEAR_COL = "Year"
+
+# Indicator datasets (services/registry.py): DEFAULT_DATASET is the CSV above;
+# CO2_DATASETS adds more, as inline JSON or the path of a .json file mapping
+# names to {"url", "value_col", "title", ...}. Selected per request with
+# ?indicator=<name>, loaded on first use and evicted least recently used once
+# the loaded ones exceed CO2_DATASET_MEMORY_MB per process (the default is never evicted)
+DEFAULT_DATASET = "co2_per_capita"
+DATASETS = os.environ.get("CO2_DATASETS", "")
+DATASET_MEMORY_MB = float(os.environ.get("CO2_DATASET_MEMORY_MB", "512"))
 CAT_URL = (
     "https://upload.wikimedia.org/wikipedia/commons/thumb/7/74/"
     "A-Cat.jpg/960px-A-Cat.jpg?20101227100718"
 )
 
+# Third-party assets, self-hosted (services/assets.py): `python -m
+# flask_app.services.assets` vendors them under flask_app/static/vendor with
+# content-hashed names and gzip/brotli copies, served from /assets with
+# immutable Cache-Control. Until then pages use these URLs (CO2_ASSET_CDN_FALLBACK=0: never)
+PLOTLY_JS_VERSION = "2.35.2"
+VENDOR_ASSETS = {
+    "plotly.js": f"https://cdn.plot.ly/plotly-{PLOTLY_JS_VERSION}.min.js",
+    "confetti.js": "https://cdn.jsdelivr.net/npm/canvas-confetti@1.9.3/dist/confetti.browser.min.js",
+    "bootstrap.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "cat.jpg": CAT_URL,
+}
+ASSET_CDN_FALLBACK = os.environ.get("CO2_ASSET_CDN_FALLBACK", "1") == "1"
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Trace types the pages draw: what a partial plotly.js bundle must contain
+# (`python -m flask_app.services.assets --plotly <custom bundle>`, see README)
+PLOTLY_TRACES = ("bar", "scatter", "scattergl", "scatter3d")
+
+# Cache backend for derived results (top emitters, missing counts), selected by
+# name via CO2_CACHE_BACKEND. "lru" is per process; "filesystem" and "redis"
+# are shared by all gunicorn workers on the host.
+CACHE_BACKEND = os.environ.get("CO2_CACHE_BACKEND", "lru")
+CACHE_BACKENDS = {
+    "lru": {
+        "CACHE_TYPE": "flask_app.services.cache_backends.LRUCache",
+        "CACHE_THRESHOLD": 512,
+        "CACHE_OPTIONS": {"max_bytes": 64 * 1024 * 1024},
+    },
+    "filesystem": {
+        "CACHE_TYPE": "FileSystemCache",
+        "CACHE_DIR": os.environ.get("CO2_CACHE_DIR", "data/cache"),
+        "CACHE_THRESHOLD": 2048,
+    },
+    "redis": {
+        # Any Redis-protocol server on localhost (redis-server, valkey, ...)
+        "CACHE_TYPE": "RedisCache",
+        "CACHE_REDIS_URL": os.environ.get("CO2_REDIS_URL", "redis://127.0.0.1:6379/0"),
+    },
+}
+
+# Dataset summaries (schema, describe, missing counts, histogram bins) persisted
+# per dataset content hash, see services/artifacts.py
+ARTIFACT_DIR = os.environ.get("CO2_ARTIFACT_DIR", "data/artifacts")
+# Version directories beyond the newest ARTIFACT_KEEP_VERSIONS are removed once
+# unused for ARTIFACT_MAX_AGE_S (workers still on an older version keep theirs)
+ARTIFACT_KEEP_VERSIONS = int(os.environ.get("CO2_ARTIFACT_KEEP_VERSIONS", "3"))
+ARTIFACT_MAX_AGE_S = float(os.environ.get("CO2_ARTIFACT_MAX_AGE_S", "86400"))
+# Rows per chunk of the out-of-core aggregation pass (services/streaming.py)
+STREAM_CHUNK_ROWS = int(os.environ.get("CO2_STREAM_CHUNK_ROWS", "1000000"))
+
+# Figure payloads (services/figures.py): scatter traces with more points than
+# this are sent as WebGL (scattergl) traces
+WEBGL_THRESHOLD = int(os.environ.get("CO2_WEBGL_THRESHOLD", "1000"))
+
+# Per-country time-series payloads pre-rendered at deploy time (full year range,
+# these rolling windows) by `python -m flask_app.services.prerender`
+PRERENDER_DIR = os.environ.get("CO2_PRERENDER_DIR", "data/prerender")
+PRERENDER_WINDOWS = tuple(int(w) for w in os.environ.get("CO2_PRERENDER_WINDOWS", "1,3,5,10").split(","))
+
+# Rows per page of the paginated tables (/api/tables/<name>); clients may ask
+# for up to TABLE_MAX_PAGE_SIZE
+TABLE_PAGE_SIZE = int(os.environ.get("CO2_TABLE_PAGE_SIZE", "25"))
+TABLE_MAX_PAGE_SIZE = 500
+
+# HTTP caching of dashboard responses (strong ETag + Cache-Control max-age)
+HTTP_CACHE_MAX_AGE = int(os.environ.get("CO2_HTTP_CACHE_MAX_AGE", "60"))
 
+# Opt-in sampling profiler: requests slower than CO2_PROFILE_SLOW_MS (0 = off)
+# dump their sampled stacks in folded format to PROFILE_DIR
+PROFILE_SLOW_MS = float(os.environ.get("CO2_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("CO2_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("CO2_PROFILE_DIR", "data/profiles")
@@ -0,0 +1,143 @@
+"""Derived dataset artifacts persisted per dataset content hash.
+
+Summaries that depend only on the data (schema text, describe table,
+missing-value counts, histogram bins, rendered tables) are built once per
+dataset version and stored under ``<ARTIFACT_DIR>/<build id>-<version>/<name>.txt``
+(text) or ``.pkl`` (anything else). The version is the CSV's content hash and
+the build id that of the code (see build.py), so a changed dataset, or a deploy
+changing how a summary is rendered or what a pickled class looks like, gets a
+fresh directory; unchanged data is never recomputed, across restarts and
+workers. Loaded artifacts are also kept in memory, one
+file read per process.
+
+Creating a directory prunes the old ones, but only beyond the newest
+``ARTIFACT_KEEP_VERSIONS`` and once unused for ``ARTIFACT_MAX_AGE_S``: workers
+that have not applied a refresh yet keep reading (and writing) the previous
+version without the two removing each other's directories.
+"""
+import io
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import pandas as pd
+
+from ..config import ARTIFACT_DIR, ARTIFACT_KEEP_VERSIONS, ARTIFACT_MAX_AGE_S, CO2_COL, COUNTRY_COL
+from .build import build_id
+from .fs import atomic_path, atomic_write
+from .metrics import CACHE_REQUESTS
+
+_loaded: Dict[Tuple[str, str, str], Any] = {}
+_lock = threading.RLock()  # builders may load other artifacts
+
+
+def _read(base: str) -> Tuple[bool, Any]:
+    if os.path.exists(f"{base}.txt"):
+        with open(f"{base}.txt", encoding="utf-8") as fh:
+            return True, fh.read()
+    if os.path.exists(f"{base}.pkl"):
+        with open(f"{base}.pkl", "rb") as fh:
+            return True, pickle.load(fh)
+    return False, None
+
+
+def _write(base: str, value: Any) -> None:
+    # Concurrent workers never read a half-written artifact
+    if isinstance(value, str):
+        atomic_write(f"{base}.txt", value)
+        return
+    with atomic_path(f"{base}.pkl") as tmp_path, open(tmp_path, "wb") as fh:
+        pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def version_dir(root: str, version: str) -> str:
+    """Directory of the artifacts of dataset version built by this code."""
+    return os.path.join(root, f"{build_id()}-{version}")
+
+
+def _new_version_dir(root: str, version: str) -> str:
+    """Create the directory of version, pruning old ones (see ``prune``)."""
+    path = version_dir(root, version)
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+        prune(root)
+    return path
+
+
+def prune(root: str, keep: int = ARTIFACT_KEEP_VERSIONS, max_age: float = ARTIFACT_MAX_AGE_S) -> None:
+    """Remove the version directories beyond the newest keep that are unused
+    (not modified) for max_age seconds."""
+    mtimes = {}
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir():
+                mtimes[entry.path] = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue  # pruned by another worker meanwhile
+    oldest_kept = time.time() - max_age
+    for path in sorted(mtimes, key=mtimes.get, reverse=True)[keep:]:
+        if mtimes[path] < oldest_kept:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_stored(version: str, name: str, root: str = ARTIFACT_DIR) -> Tuple[bool, Any]:
+    """(found, value) of artifact name of the dataset version, without building it."""
+    key = (root, version, name)
+    if key in _loaded:
+        return True, _loaded[key]
+    found, value = _read(os.path.join(version_dir(root, version), name))
+    if found:
+        _loaded[key] = value
+    return found, value
+
+
+def load_or_build(version: str, name: str, build: Callable[[], Any], root: str = ARTIFACT_DIR) -> Any:
+    """Return artifact name of the dataset version, building and persisting it on first use."""
+    key = (root, version, name)
+    if key in _loaded:
+        CACHE_REQUESTS.inc(cache="artifact", name=name, result="hit")
+        return _loaded[key]
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+        base = os.path.join(_new_version_dir(root, version), name)
+        found, value = _read(base)
+        CACHE_REQUESTS.inc(cache="artifact", name=name, result="disk" if found else "miss")
+        if not found:
+            value = build()
+            _write(base, value)
+        # Forget the artifacts of versions replaced by a refresh
+        for stale in [k for k in _loaded if k[0] == root and k[1] != version]:
+            del _loaded[stale]
+        _loaded[key] = value
+        return value
+
+
+# ---------------------- Builders ---------------------- #
+def info_text(df: pd.DataFrame) -> str:
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+
+def describe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """``describe(include="all")``, with the float32 CO2 column upcast so the
+    statistics are computed in float64 (see compact.py)."""
+    return df.astype({CO2_COL: "float64"}).describe(include="all")
+
+
+def compute_nan_counts(raw_df: pd.DataFrame) -> pd.DataFrame:
+    nan_df = raw_df[[COUNTRY_COL]].copy()
+    nan_df["Missing CO2"] = raw_df[[CO2_COL]].isna()
+    return nan_counts_table(nan_df.groupby(COUNTRY_COL, observed=True).sum(numeric_only=True))
+
+
+def nan_counts_table(counts: pd.DataFrame) -> pd.DataFrame:
+    """Countries with missing values, most first, from the per-country "Missing CO2"
+    counts indexed by (categorical) name; shared with the chunked pass of streaming.py."""
+    nan_df = counts.sort_values(by="Missing CO2", ascending=False)
+    nan_df = nan_df[nan_df["Missing CO2"] > 0].reset_index()
+    return nan_df
@@ -0,0 +1,170 @@
+"""Self-hosted third-party assets: vendored, content-hashed and precompressed.
+
+``python -m flask_app.services.assets`` is a build step, run where the CDNs are
+reachable or with ``--source name=path`` copies for air-gapped builds. It
+writes each of ``VENDOR_ASSETS`` to ``flask_app/static/vendor/`` as
+``<stem>.<sha256[:12]><ext>``, plus ``.gz`` and (with the ``brotli`` package)
+``.br`` copies of the text assets, and lists them in ``manifest.json``.
+plotly.js is taken from the installed plotly.py package when it bundles
+``PLOTLY_JS_VERSION``; ``--plotly`` vendors another build instead, such as a
+partial bundle, after checking that it registers every trace type of
+``PLOTLY_TRACES``.
+
+Templates link assets through ``asset_url(name)`` (blueprints/assets.py): the
+hashed file under ``/assets``, sent precompressed with immutable
+Cache-Control, or the CDN URL as long as nothing is vendored.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import urllib.request
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..config import FETCH_TIMEOUT, PLOTLY_JS_VERSION, PLOTLY_TRACES, VENDOR_ASSETS
+from .fs import atomic_write
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli copies are optional
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "vendor")
+MANIFEST = "manifest.json"
+COMPRESSED_SUFFIXES = (".gz", ".br")
+COMPRESSIBLE = (".js", ".css", ".svg", ".json")
+TRACE_PATTERN = re.compile(rb'moduleType:"trace",name:"(\w+)"')
+VERSION_PATTERN = re.compile(rb"plotly\.js v(\d+\.\d+\.\d+)")
+
+
+def hashed_name(name: str, content: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+@lru_cache(maxsize=1)
+def load_manifest(directory: str = VENDOR_DIR) -> Dict[str, Dict[str, object]]:
+    """Vendored assets by name (empty until the build step has run), read once per process."""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def vendored_file(name: str) -> Optional[str]:
+    """Hashed filename of asset name under VENDOR_DIR, if vendored."""
+    entry = load_manifest().get(name)
+    return entry["file"] if entry else None
+
+
+def vendored_path(name: str) -> Optional[str]:
+    filename = vendored_file(name)
+    return os.path.join(VENDOR_DIR, filename) if filename else None
+
+
+# ---------------------- Build step ---------------------- #
+def plotly_traces(bundle: bytes) -> Set[str]:
+    """Trace types a plotly.js bundle registers."""
+    return {name.decode() for name in TRACE_PATTERN.findall(bundle)}
+
+
+def plotly_version(bundle: bytes) -> Optional[str]:
+    match = VERSION_PATTERN.search(bundle[:4096])
+    return match.group(1).decode() if match else None
+
+
+def _packaged_plotly() -> Optional[str]:
+    """plotly.py's copy of plotly.js, if it is PLOTLY_JS_VERSION."""
+    try:
+        import plotly
+    except ImportError:  # pragma: no cover - plotly is a requirement
+        return None
+    path = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as fh:
+        return path if plotly_version(fh.read(4096)) == PLOTLY_JS_VERSION else None
+
+
+def _read_source(name: str, sources: Dict[str, str]) -> Tuple[bytes, str]:
+    """(content, origin) of asset name: a --source file, plotly.py's plotly.js or the CDN."""
+    path = sources.get(name) or (_packaged_plotly() if name == "plotly.js" else None)
+    if path:
+        with open(path, "rb") as fh:
+            return fh.read(), path
+    url = VENDOR_ASSETS[name]
+    with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as resp:
+        return resp.read(), url
+
+
+def build(sources: Optional[Dict[str, str]] = None, directory: str = VENDOR_DIR) -> Dict[str, Dict[str, object]]:
+    """Vendor every asset, precompress the text ones and write the manifest; drop files of earlier builds."""
+    sources = sources or {}
+    unknown = set(sources) - set(VENDOR_ASSETS)
+    if unknown:
+        raise ValueError(f"Unknown assets {sorted(unknown)}, expected some of {sorted(VENDOR_ASSETS)}")
+    os.makedirs(directory, exist_ok=True)
+    manifest: Dict[str, Dict[str, object]] = {}
+    for name in VENDOR_ASSETS:
+        content, origin = _read_source(name, sources)
+        entry: Dict[str, object] = {"file": hashed_name(name, content), "source": origin, "bytes": len(content)}
+        if name == "plotly.js":
+            traces = plotly_traces(content)
+            missing = set(PLOTLY_TRACES) - traces
+            if missing:
+                raise ValueError(f"plotly.js from {origin} lacks the trace types {sorted(missing)}")
+            entry["version"] = plotly_version(content)
+            entry["traces"] = sorted(traces)
+            if entry["version"] != PLOTLY_JS_VERSION:
+                log.warning("Vendoring plotly.js %s, the pages are tested with %s", entry["version"], PLOTLY_JS_VERSION)
+        path = os.path.join(directory, entry["file"])
+        atomic_write(path, content)
+        if name.endswith(COMPRESSIBLE):
+            # Maximum levels: compressed once here, sent as is on every request
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            atomic_write(f"{path}.gz", compressed)
+            entry["gzip_bytes"] = len(compressed)
+            if brotli is not None:
+                compressed = brotli.compress(content, quality=11)
+                atomic_write(f"{path}.br", compressed)
+                entry["br_bytes"] = len(compressed)
+        manifest[name] = entry
+    keep = {MANIFEST} | {f"{entry['file']}{suffix}" for entry in manifest.values() for suffix in ("", *COMPRESSED_SUFFIXES)}
+    for filename in os.listdir(directory):
+        if filename not in keep:
+            os.remove(os.path.join(directory, filename))
+    atomic_write(os.path.join(directory, MANIFEST), (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode())
+    load_manifest.cache_clear()
+    return manifest
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--source", action="append", default=[], metavar="NAME=PATH",
+        help=f"local copy of an asset instead of its URL ({', '.join(VENDOR_ASSETS)})",
+    )
+    parser.add_argument("--plotly", metavar="PATH", help="plotly.js build to vendor, e.g. a partial bundle")
+    parser.add_argument("--dir", default=VENDOR_DIR)
+    args = parser.parse_args(argv)
+    sources = dict(item.split("=", 1) for item in args.source)
+    if args.plotly:
+        sources["plotly.js"] = args.plotly
+    if brotli is None:
+        print("brotli not installed: writing gzip copies only")
+    for name, entry in build(sources, args.dir).items():
+        sizes = ", ".join(f"{key[:-6] or 'raw'} {entry[key] / 1e3:.1f} kB" for key in ("bytes", "gzip_bytes", "br_bytes") if key in entry)
+        print(f"{name:<14} {entry['file']:<32} {sizes}  <- {entry['source']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""Identity of the deployed code.
+
+``build_id`` hashes the package's code, templates and static files, so it
+changes with every deploy that could change a response. It versions the HTTP
+ETags (see blueprints/http_cache.py), the persisted artifacts (see
+artifacts.py) and the pre-rendered payload directories (see prerender.py).
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Data kept inside the package rather than code: the fallback snapshot (see loader.py)
+SKIP_DIRS = {"__pycache__", "snapshot"}
+
+
+@lru_cache(maxsize=1)
+def build_id() -> str:
+    """Hash of the package's code, templates and static files."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(PACKAGE_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as fh:
+                digest.update(name.encode())
+                digest.update(fh.read())
+    return digest.hexdigest()[:16]
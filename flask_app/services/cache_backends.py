@@ -0,0 +1,110 @@
+"""Flask-Caching backends used by the data service.
+
+``create_app`` picks one of ``config.CACHE_BACKENDS`` by name. The remote
+backends (filesystem, redis) come with Flask-Caching; this module adds the
+in-process LRU, which keeps values as live objects instead of pickling them.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask
+from flask_caching.backends.base import BaseCache
+
+
+def sizeof(value: Any) -> int:
+    """Approximate retained bytes of a cached value (strings, frames, containers)."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    # pandas objects report their deep memory usage through __sizeof__
+    return sys.getsizeof(value)
+
+
+class LRUCache(BaseCache):
+    """Thread-safe least-recently-used cache local to one process.
+
+    Bounded both by item count (``threshold``) and, when ``max_bytes`` is set,
+    by the approximate total size of the values. Unlike ``SimpleCache`` it does
+    not pickle values, so callers must treat returned objects as read-only.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 512,
+        default_timeout: int = 300,
+        max_bytes: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(default_timeout=default_timeout)
+        self._threshold = threshold
+        self._max_bytes = max_bytes
+        self._items: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app: Flask, config: Dict[str, Any], args: List[Any], kwargs: Dict[str, Any]) -> "LRUCache":
+        kwargs.update(threshold=config["CACHE_THRESHOLD"])
+        return cls(*args, **kwargs)
+
+    def _expiry(self, timeout: Optional[int]) -> float:
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else float("inf")
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                self._pop(key)
+                return None
+            self._items.move_to_end(key)
+            return item[2]
+
+    def _pop(self, key: str) -> Any:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+        return item
+
+    def _store(self, key: str, value: Any, timeout: Optional[int]) -> None:
+        self._pop(key)
+        size = sizeof(value) if self._max_bytes is not None else 0
+        self._items[key] = (self._expiry(timeout), size, value)
+        self._bytes += size
+        while len(self._items) > self._threshold or (
+            self._max_bytes is not None and self._bytes > self._max_bytes and len(self._items) > 1
+        ):
+            self._pop(next(iter(self._items)))
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        with self._lock:
+            self._store(key, value, timeout)
+        return True
+
+    def add(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        with self._lock:
+            if key in self._items and self._items[key][0] > time.monotonic():
+                return False
+            self._store(key, value, timeout)
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._pop(key) is not None
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def clear(self) -> bool:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+        return True
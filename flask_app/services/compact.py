@@ -0,0 +1,106 @@
+"""Compact in-memory representation of the CO2 dataset.
+
+Country names and codes are categoricals (small integer codes plus one copy of
+each string), years are ``int16`` and CO2 per capita is ``float32``. Only the
+raw frame is held; the rows with a CO2 value are selected through ``valid``
+(the negated NaN mask) when needed instead of being kept as a second frame.
+
+Precision contract: CO2 values are the CSV values rounded to the nearest
+``float32``, i.e. a relative error below 6e-8 (about 7 significant digits,
+far finer than the source data's precision). Sums, means and rolling means
+are always accumulated in ``float64`` from those values; exported values are
+written with the shortest representation of the stored ``float32``.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from ..config import CO2_COL, CODE_COL, COUNTRY_COL, YEAR_COL
+
+CATEGORY_COLS = (COUNTRY_COL, CODE_COL)
+YEAR_DTYPE = np.int16
+CO2_DTYPE = np.float32
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame with categorical names/codes, int16 years and float32 CO2.
+
+    Columns already in that form (a frame mapped from the Arrow cache) are kept
+    as they are, not copied.
+    """
+    years = df[YEAR_COL].to_numpy()
+    info = np.iinfo(YEAR_DTYPE)
+    if len(years) and (years.min() < info.min or years.max() > info.max):
+        raise ValueError(f"{YEAR_COL} values do not fit in {np.dtype(YEAR_DTYPE).name}")
+    columns = {}
+    for col in df.columns:
+        if col in CATEGORY_COLS:
+            # Sorted categories, so sorting by code is sorting by name
+            values = df[col].array
+            sorted_categories = isinstance(values, pd.Categorical) and values.categories.is_monotonic_increasing
+            columns[col] = values if sorted_categories else pd.Categorical(df[col])
+        elif col == YEAR_COL:
+            columns[col] = years.astype(YEAR_DTYPE, copy=False)
+        elif col == CO2_COL:
+            columns[col] = df[col].to_numpy().astype(CO2_DTYPE, copy=False)
+        else:
+            columns[col] = df[col].to_numpy()
+    return pd.DataFrame(columns, copy=False)
+
+
+class CompactDataset:
+    """The raw (compact) frame and its CO2-present mask."""
+
+    def __init__(self, raw: pd.DataFrame) -> None:
+        self.raw = raw
+        self.valid = ~np.isnan(raw[CO2_COL].to_numpy())
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CompactDataset":
+        return cls(compact_frame(df))
+
+    def append(self, *others: "CompactDataset") -> "CompactDataset":
+        """New dataset with the rows of others after these (same columns).
+
+        Categoricals are unioned with sorted categories, so codes keep sorting
+        by name.
+        """
+        frames = [self.raw, *(other.raw for other in others)]
+        for frame in frames[1:]:
+            if list(frame.columns) != list(self.raw.columns):
+                raise ValueError(f"Expected columns {list(self.raw.columns)}, got {list(frame.columns)}")
+        columns = {}
+        for col in self.raw.columns:
+            if col in CATEGORY_COLS:
+                columns[col] = union_categoricals([frame[col].array for frame in frames], sort_categories=True)
+            else:
+                columns[col] = np.concatenate([frame[col].to_numpy() for frame in frames])
+        return CompactDataset(pd.DataFrame(columns, copy=False))
+
+    @property
+    def nan_mask(self) -> np.ndarray:
+        return ~self.valid
+
+    def clean(self) -> pd.DataFrame:
+        """Rows with a CO2 value (a transient selection, not cached)."""
+        return self.raw[self.valid]
+
+
+def array_nbytes(values) -> int:
+    """Bytes held by a column: its buffers, plus each distinct Python object once
+    for object arrays (``memory_usage(deep=True)`` counts shared strings per row)."""
+    if isinstance(values, pd.Categorical):
+        return values.codes.nbytes + array_nbytes(values.categories.array)
+    if isinstance(values, pd.api.extensions.ExtensionArray) and values.dtype != object:
+        return int(values.nbytes)
+    arr = np.asarray(values)
+    if arr.dtype != object:
+        return arr.nbytes
+    sizes: Dict[int, int] = {id(v): v.__sizeof__() for v in arr}
+    return arr.nbytes + sum(sizes.values())
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return sum(array_nbytes(df[col].array) for col in df.columns)
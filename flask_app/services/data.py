@@ -0,0 +1,349 @@
+"""Data service shared by the Flask blueprints.
+
+Heavy, immutable objects (the frame, the country store, the range index) are
+held per process in a ``Snapshot`` of each registered dataset (see
+registry.py), selected by the request's ``indicator`` and loaded on first use;
+``datasets`` evicts the least recently used ones over the memory budget.
+``preload`` loads the default dataset in the gunicorn master so forked workers
+share it copy-on-write, and ``refresh`` swaps in a new snapshot when deltas
+are ingested (see refresh.py). Until a dataset's rows are loaded, the
+summaries the chunked pass computes (year bounds, top emitters, rank table,
+missing counts, histogram) are served from its stored aggregates when they
+are current (see streaming.py); datasets registered with ``stream`` are
+never loaded for them.
+Small derived results go through the configured Flask-Caching backend under
+deterministic keys (``co2:<dataset version>:<name>:<args>``), so a filesystem
+or Redis backend is warmed once for all workers. Parameterless summaries of a
+dataset are persisted to disk per dataset version (``artifact``).
+"""
+import logging
+import threading
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..app import cache
+from ..config import (
+    DATASET_MEMORY_MB,
+    DEFAULT_DATASET,
+    INGEST_POLL_S,
+    LOCAL_PATH,
+    CO2_COL,
+)
+from .artifacts import compute_nan_counts, describe_frame, info_text, load_or_build, load_stored
+from .compact import CompactDataset
+from .figures import figure_json
+from .histogram import histogram_bins, histogram_figure
+from .loader import DatasetLoader, fetch_dataset
+from .metrics import CACHE_REQUESTS
+from .range_index import PrefixSumIndex
+from .ranking import RankTable
+from .refresh import DeltaJournal, Poller, Snapshot, claim_incoming
+from .registry import DatasetCache, DatasetSpec, current_spec, get_spec, use_dataset
+from .store import CountryStore
+from .streaming import streamed_version, update as update_aggregates
+
+log = logging.getLogger(__name__)
+
+# (countries or None for all, start_year, end_year) of a memoized result
+Scope = Tuple[Optional[Sequence[str]], int, int]
+
+
+def download_if_needed(spec: Optional[DatasetSpec] = None) -> str:
+    spec = spec or current_spec()
+    fetch_dataset(url=spec.url, path=spec.path, snapshot_path=spec.snapshot_path)
+    return spec.path
+
+
+def load_data(spec: Optional[DatasetSpec] = None) -> CompactDataset:
+    """Compact raw frame plus its value mask; ``clean()`` selects the rows with a value."""
+    spec = spec or current_spec()
+    download_if_needed(spec)
+    return spec.read()
+
+
+def aggregate_top_emitters(index: PrefixSumIndex, start_year: int, end_year: int, top_n: int) -> pd.DataFrame:
+    """Top N countries by mean value over the inclusive year range."""
+    return index.top(start_year, end_year, top_n)
+
+
+# ---------------------- Process-level accessors ---------------------- #
+def load_snapshot(spec: DatasetSpec) -> Snapshot:
+    """The source CSV with the journaled deltas replayed on top (see refresh.py)."""
+    snapshot = Snapshot.build(spec.base_version(), load_data(spec))
+    entries = DeltaJournal(spec.journal_dir).entries()
+    if entries:
+        snapshot = snapshot.append([(sha, spec.read_delta(path)) for sha, path in entries])
+    return snapshot
+
+
+# Loaded on first request of each dataset, least recently used evicted over budget
+datasets = DatasetCache(load_snapshot, int(DATASET_MEMORY_MB * 1024 * 1024))
+_refresh_lock = threading.RLock()
+
+
+def get_snapshot() -> Snapshot:
+    """The current dataset's version and indexes, loaded once per process (until
+    evicted) and replaced (never mutated) by ``refresh``."""
+    return datasets.get(current_spec().name)
+
+
+def rows_loaded() -> bool:
+    """False for a dataset registered with ``stream`` whose rows this process has not loaded."""
+    spec = current_spec()
+    return not spec.stream or datasets.peek(spec.name) is not None
+
+
+def _aggregates_version() -> Optional[str]:
+    """Version of the current dataset's stored aggregates (streaming.py) while its
+    rows are not loaded here: brought up to date for a ``stream`` dataset, else if current."""
+    spec = current_spec()
+    if datasets.peek(spec.name) is not None:
+        return None
+    return update_aggregates(spec) if spec.stream else streamed_version(spec)
+
+
+def get_data() -> CompactDataset:
+    """The compact dataset, loaded once per process."""
+    return get_snapshot().dataset
+
+
+def dataset_version() -> str:
+    """Short hash of the dataset's schema and source CSV, chained with each applied delta; part of every cache key."""
+    return _aggregates_version() or get_snapshot().version
+
+
+def get_store() -> CountryStore:
+    """Country-indexed store over the clean dataset."""
+    return get_snapshot().store
+
+
+def get_range_index() -> PrefixSumIndex:
+    """Prefix-sum country x year index over the store (or the chunked pass)."""
+    version = _aggregates_version()
+    if version is not None:
+        return load_or_build(version, "range_index", lambda: get_snapshot().index, root=current_spec().artifact_dir)
+    return get_snapshot().index
+
+
+def get_year_bounds() -> Tuple[int, int]:
+    """First and last year with a value."""
+    index = get_range_index()
+    return index.first_year, index.last_year
+
+
+# ---------------------- Dataset artifacts ---------------------- #
+def artifact(name: str) -> Callable:
+    """Build a parameterless accessor's result once per dataset version and persist it
+    (see artifacts.py); later calls, restarts and other workers read it back."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper():
+            return load_or_build(dataset_version(), name, fn, root=current_spec().artifact_dir)
+        return wrapper
+    return decorator
+
+
+def stored_artifact(name: str) -> Optional[Any]:
+    """Artifact name of the current dataset version if some process built it, else None."""
+    return load_stored(dataset_version(), name, root=current_spec().artifact_dir)[1]
+
+
+@artifact("info_text")
+def get_info_text() -> str:
+    return info_text(get_data().clean())
+
+
+@artifact("describe")
+def get_describe() -> pd.DataFrame:
+    return describe_frame(get_data().clean())
+
+
+@artifact("nan_counts")
+def get_nan_counts() -> pd.DataFrame:
+    return compute_nan_counts(get_data().raw)
+
+
+@artifact("rank_table")
+def get_rank_table() -> RankTable:
+    """Every country's value and rank in every year (see ranking.py)."""
+    return RankTable.from_index(get_range_index())
+
+
+@artifact("histogram_bins")
+def get_histogram_bins() -> Tuple[np.ndarray, np.ndarray]:
+    return histogram_bins(get_store().columns[CO2_COL])
+
+
+def get_histogram_json() -> str:
+    """Pre-binned histogram figure JSON, built once per process and dataset version."""
+    return _histogram_json(dataset_version())
+
+
+@lru_cache(maxsize=16)
+def _histogram_json(version: str) -> str:
+    spec = current_spec()
+    fig = histogram_figure(*get_histogram_bins(), title=f"Histogram of {spec.title}", x_title=spec.label)
+    return figure_json(fig)
+
+
+def preload(name: str = DEFAULT_DATASET) -> None:
+    """Load a dataset (the default one unless named) and its indexes into the current process.
+
+    Run by its ``DatasetLoader`` in a background thread: for the default dataset
+    from create_app, or synchronously in the gunicorn master (see
+    gunicorn.conf.py) before workers fork; for the others on their first request.
+    A ``stream`` dataset gets its aggregates brought up to date instead.
+    """
+    with use_dataset(name) as spec:
+        if spec.stream:
+            update_aggregates(spec)
+        else:
+            get_snapshot()
+            get_info_text()
+            get_describe()
+        get_nan_counts()
+        get_histogram_json()
+
+
+# Background fetch + preload of the default dataset; routes answer 503 until it
+# reports ready. Other datasets get their own loader on their first request.
+loader = DatasetLoader(prepare=lambda path: preload(), path=LOCAL_PATH)
+_loaders: Dict[str, DatasetLoader] = {DEFAULT_DATASET: loader}
+_loaders_lock = threading.Lock()
+
+
+def dataset_loader(name: str) -> DatasetLoader:
+    """The background loader of dataset name (``loader`` for the default one), created
+    on first use; routes of the dataset answer 503 until it reports ready.
+
+    A dataset evicted since it loaded (see registry.py) gets a new loader, so
+    it is loaded off the request path again (a ``stream`` one is not held).
+    """
+    with _loaders_lock:
+        current, spec = _loaders.get(name), get_spec(name)
+        evicted = current is not None and current.ready and datasets.peek(name) is None and not spec.stream
+        if current is None or (evicted and name != DEFAULT_DATASET):
+            current = _loaders[name] = DatasetLoader(
+                prepare=lambda path: preload(name),
+                name=f"dataset-loader-{name}",
+                url=spec.url,
+                path=spec.path,
+                snapshot_path=spec.snapshot_path,
+            )
+        return current
+
+
+def loader_states() -> Dict[str, Dict[str, object]]:
+    """Load state of every dataset requested in this process."""
+    return {name: current.state() for name, current in list(_loaders.items())}
+
+
+# ---------------------- Incremental refresh ---------------------- #
+def refresh() -> Dict[str, object]:
+    """Apply the journal entries this process has not applied yet to the current dataset (see refresh.py)."""
+    spec = current_spec()
+    with _refresh_lock:
+        current = get_snapshot()
+        pending = [(sha, path) for sha, path in DeltaJournal(spec.journal_dir).entries() if sha not in current.applied]
+        snapshot = current
+        if pending:
+            snapshot = current.append([(sha, spec.read_delta(path)) for sha, path in pending])
+            datasets.put(spec.name, snapshot)
+        return {
+            "dataset": spec.name,
+            "version": snapshot.version,
+            "previous_version": current.version,
+            "applied": [delta.summary() for delta in snapshot.deltas[len(current.deltas):]],
+        }
+
+
+def validate_delta(content: bytes) -> CompactDataset:
+    """The delta parsed for the current dataset; ValueError if it does not fit its
+    format or repeats rows of its latest version (apply the journal first)."""
+    delta = current_spec().read_delta(content)
+    get_snapshot().check_delta(delta)
+    return delta
+
+
+def ingest(content: bytes) -> Dict[str, object]:
+    """Journal a CSV delta for the current dataset (ValueError if it does not fit)
+    and apply it here; other workers pick it up on their next poll."""
+    journal = DeltaJournal(current_spec().journal_dir)
+    with _refresh_lock, journal.lock():
+        refresh()  # check against every entry, including those of other processes
+        validate_delta(content)
+        sha, added = journal.add(content)
+        return {"sha": sha, "journaled": added, **refresh()}
+
+
+def poll_ingest() -> None:
+    """Apply new journal entries to the loaded datasets (the others replay them on
+    load) and journal the files dropped in their ingest directories.
+
+    Files are checked against the dataset they extend, so those of a dataset
+    not loaded in this process wait until it is.
+    """
+    if not loader.ready:
+        return
+    for name in datasets.loaded():
+        with use_dataset(name), _refresh_lock:
+            before = get_snapshot()
+            refresh()
+            claim_incoming(current_spec().ingest_dir, ingest)
+            after = get_snapshot()
+        if after is not before:
+            log.info("Dataset %s refreshed to %s (%d deltas)", name, after.version, len(after.deltas) - len(before.deltas))
+
+
+watcher = Poller(poll_ingest, INGEST_POLL_S, name="dataset-refresh")
+
+
+# ---------------------- Shared-cache accessors ---------------------- #
+def cache_key(name: str, *args: object, version: Optional[str] = None) -> str:
+    return ":".join(["co2", version or dataset_version(), name, *map(str, args)])
+
+
+def year_scope(start_year: int, end_year: int, *rest: object) -> Scope:
+    """Scope of results over all countries in a year range."""
+    return None, start_year, end_year
+
+
+def series_scope(countries: Sequence[str], start_year: int, end_year: int, *rest: object) -> Scope:
+    """Scope of results over some countries in a year range."""
+    return countries, start_year, end_year
+
+
+def memoized(name: str, scope: Optional[Callable[..., Scope]] = None) -> Callable:
+    """Memoize a module-level accessor in the Flask-Caching backend under cache_key(name, *args).
+
+    With ``scope`` (args -> (countries or None, start_year, end_year)) the key
+    carries the version of the last refresh touching that scope instead of the
+    latest one, so refreshes elsewhere in the dataset keep the entry valid.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args):
+            snapshot = datasets.peek(current_spec().name)
+            version = snapshot.scope_version(*scope(*args)) if scope and snapshot else dataset_version()
+            key = cache_key(name, *args, version=version)
+            value = cache.get(key)
+            CACHE_REQUESTS.inc(cache="shared", name=name, result="miss" if value is None else "hit")
+            if value is None:
+                value = fn(*args)
+                cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+@memoized("top_emitters", scope=year_scope)
+def get_top_emitters(start_year: int, end_year: int, top_n: int) -> pd.DataFrame:
+    return aggregate_top_emitters(get_range_index(), start_year, end_year, top_n)
+
+
+def get_series(countries: Sequence[str], start_year: int, end_year: int, rolling_window: int) -> pd.DataFrame:
+    """Year-sorted rows of each country in turn, plus a rolling mean column when rolling_window > 1."""
+    return get_store().compare(countries, start_year, end_year, rolling_window)
@@ -0,0 +1,134 @@
+"""Streaming export of store slices as CSV, gzip-compressed CSV or Parquet.
+
+Rows are produced country by country in fixed-size chunks straight from the
+store's array views, and each chunk is encoded and yielded immediately (Parquet:
+each full row group), so the first byte goes out right away and memory stays
+flat whatever the export size.
+"""
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .store import CountryStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - Parquet export needs pyarrow
+    pa = None
+    pq = None
+
+CHUNK_ROWS = 10_000
+FORMATS = ("csv", "csv.gz", "parquet")
+
+
+def iter_frames(
+    store: CountryStore,
+    countries: Iterable[str],
+    start_year: int,
+    end_year: int,
+    chunk_rows: int = CHUNK_ROWS,
+    names: Optional[Dict[str, str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Year-sorted rows of each country in turn, in frames of at most chunk_rows;
+    columns renamed by names (see registry.py)."""
+    names = names or {}
+    for country in countries:
+        lo, hi = store.bounds(country, start_year, end_year)
+        for start in range(lo, hi, chunk_rows):
+            stop = min(start + chunk_rows, hi)
+            yield pd.DataFrame({names.get(col, col): arr[start:stop] for col, arr in store.columns.items()}, copy=False)
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame], columns: List[str]) -> Iterator[bytes]:
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+    for frame in frames:
+        yield frame.to_csv(index=False, header=False).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Drain:
+    """Write-only file object whose buffered bytes are handed out by take()."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def parquet_chunks(
+    frames: Iterable[pd.DataFrame], schema_frame: pd.DataFrame, row_group_rows: int = CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Parquet in row groups of row_group_rows (the last one smaller); schema_frame fixes the schema up front.
+
+    Frames are buffered until a row group is full, so exports of many small
+    countries do not end up as one tiny row group each.
+    """
+    if pq is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    sink = _Drain()
+    schema = pa.Schema.from_pandas(schema_frame, preserve_index=False)
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        buffered: List[pa.Table] = []
+        rows = 0
+        for frame in frames:
+            buffered.append(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+            if rows >= row_group_rows:
+                table = pa.concat_tables(buffered)
+                full = rows - rows % row_group_rows
+                writer.write_table(table.slice(0, full), row_group_size=row_group_rows)
+                buffered, rows = [table.slice(full)], rows - full
+                yield sink.take()
+        if rows:
+            writer.write_table(pa.concat_tables(buffered), row_group_size=row_group_rows)
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_chunks(
+    store: CountryStore,
+    countries: Iterable[str],
+    start_year: int,
+    end_year: int,
+    fmt: str = "csv",
+    names: Optional[Dict[str, str]] = None,
+) -> Iterator[bytes]:
+    names = names or {}
+    frames = iter_frames(store, countries, start_year, end_year, names=names)
+    columns = [names.get(col, col) for col in store.columns]
+    if fmt == "parquet":
+        # A real row so string columns get a concrete (not null) Arrow type
+        schema_frame = pd.DataFrame({names.get(col, col): arr[:1] for col, arr in store.columns.items()})
+        return parquet_chunks(frames, schema_frame)
+    chunks = csv_chunks(frames, columns)
+    return gzip_chunks(chunks) if fmt == "csv.gz" else chunks
@@ -0,0 +1,125 @@
+"""Compact figure JSON: typed-array numbers and WebGL traces for large figures.
+
+``figure_json`` replaces ``fig.to_json()`` for the dashboard figures. Numeric
+arrays are written as base64-encoded typed arrays in plotly.js's
+``{"dtype", "bdata"}`` format (decoded natively since plotly.js 2.28; the pages
+load 2.35) instead of one decimal per value, whichever plotly.py version built
+the figure. 64-bit integers, which plotly.js has no typed array for, are
+narrowed to the smallest integer type holding them. ``scatter`` traces with more
+than ``WEBGL_THRESHOLD`` points become ``scattergl``, as ``px.line`` already
+does for its own traces in ``render_mode="auto"``.
+"""
+import base64
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+import orjson
+
+from ..config import WEBGL_THRESHOLD
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+TYPED_ARRAY_CODES = {
+    "int8": "i1",
+    "uint8": "u1",
+    "int16": "i2",
+    "uint16": "u2",
+    "int32": "i4",
+    "uint32": "u4",
+    "float32": "f4",
+    "float64": "f8",
+}
+_CODE_DTYPES = {code: np.dtype(name).newbyteorder("<") for name, code in TYPED_ARRAY_CODES.items()}
+
+# Attributes of scatter traces (and their marker/line) that scattergl does not have
+SCATTER_ONLY = {
+    "trace": ("alignmentgroup", "cliponaxis", "fillgradient", "fillpattern", "groupnorm", "hoveron",
+              "offsetgroup", "orientation", "stackgaps", "stackgroup", "zorder"),
+    "marker": ("angleref", "gradient", "maxdisplayed", "standoff"),
+    "line": ("backoff", "simplify", "smoothing"),
+}
+
+
+def typed_array(values: np.ndarray) -> Optional[Dict[str, str]]:
+    """plotly.js typed-array spec of a numeric array, or None if it has no typed-array form."""
+    if values.dtype.kind in "iu" and values.dtype.name not in TYPED_ARRAY_CODES:
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+                values = values.astype(dtype)
+                break
+        else:
+            return None
+    code = TYPED_ARRAY_CODES.get(values.dtype.name)
+    if code is None:
+        return None
+    data = np.ascontiguousarray(values, dtype=_CODE_DTYPES[code])
+    spec = {"dtype": code, "bdata": base64.b64encode(data.tobytes()).decode()}
+    if values.ndim > 1:
+        spec["shape"] = ",".join(map(str, values.shape))
+    return spec
+
+
+def decode_typed_array(spec: Dict[str, str]) -> np.ndarray:
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=_CODE_DTYPES[spec["dtype"]])
+    if "shape" in spec:
+        values = values.reshape([int(n) for n in spec["shape"].split(",")])
+    return values
+
+
+def _is_typed(value: Any) -> bool:
+    return isinstance(value, dict) and "bdata" in value and "dtype" in value
+
+
+def _encode(value: Any, typed: bool) -> Any:
+    if isinstance(value, np.ndarray):
+        spec = typed_array(value) if typed and value.dtype.kind in "iuf" else None
+        return spec if spec is not None else value.tolist()
+    if _is_typed(value):  # plotly.py >= 6 encodes numpy arrays itself
+        return value if typed else decode_typed_array(value).tolist()
+    if isinstance(value, dict):
+        return {k: _encode(v, typed) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v, typed) for v in value]
+    return value
+
+
+def _length(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.shape[0] if value.ndim else 0
+    if _is_typed(value):
+        if "shape" in value:
+            return int(value["shape"].split(",")[0])
+        b64 = value["bdata"]
+        return (len(b64) * 3 // 4 - b64[-2:].count("=")) // _CODE_DTYPES[value["dtype"]].itemsize
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return 0
+
+
+def _webgl(trace: Dict[str, Any], threshold: int) -> Dict[str, Any]:
+    """The trace as scattergl when it is a scatter trace with more than threshold points."""
+    if trace.get("type", "scatter") != "scatter" or max(_length(trace.get("x")), _length(trace.get("y"))) <= threshold:
+        return trace
+    trace = {k: v for k, v in trace.items() if k not in SCATTER_ONLY["trace"]}
+    for part in ("marker", "line"):
+        if isinstance(trace.get(part), dict):
+            trace[part] = {k: v for k, v in trace[part].items() if k not in SCATTER_ONLY[part]}
+    trace["type"] = "scattergl"
+    return trace
+
+
+def figure_json(fig: "go.Figure", typed: bool = True, webgl_threshold: Optional[int] = WEBGL_THRESHOLD) -> str:
+    """Figure JSON for ``Plotly.newPlot``/``Plotly.react``.
+
+    ``typed=False`` writes plain decimal arrays (plotly.py 5's ``to_json``
+    output), ``webgl_threshold=None`` keeps trace types; both exist for the
+    payload benchmark.
+    """
+    figure = fig.to_plotly_json()
+    traces = figure.get("data", [])
+    if webgl_threshold is not None:
+        traces = [_webgl(trace, webgl_threshold) for trace in traces]
+    payload = {"data": _encode(traces, typed), "layout": _encode(figure.get("layout", {}), typed)}
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
@@ -0,0 +1,89 @@
+"""Atomic file writes and per-process background threads shared by the services.
+
+Files read by several workers (Arrow caches, artifacts, journal entries,
+pre-rendered payloads, snapshots, vendored assets) are written to a temporary
+file next to their path and renamed over it, so a reader sees the old file or
+the new one, never a partial write. Background threads (dataset loading,
+polling) must be started again in each forked worker: a thread started in the
+gunicorn master does not exist in its children. ``file_lock`` serializes a
+read-check-write sequence across processes (e.g. journaling a delta).
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows, where the lock only holds within a process
+    fcntl = None
+
+_local_locks: Dict[str, threading.Lock] = {}
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """Yield a temporary path to write path's new content to; it replaces path
+    when the block succeeds and is removed when it fails."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write(path: str, data: Union[bytes, str]) -> None:
+    """Replace path's content with data (str is written as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with atomic_path(path) as tmp_path, open(tmp_path, "wb") as fh:
+        fh.write(data)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path (created if missing) for the block, across
+    processes. Not reentrant: a process holding it must not take it again."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    local = _local_locks.setdefault(path, threading.Lock())
+    # flock excludes other processes; the thread lock covers platforms without it
+    with local, open(path, "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class ProcessThread:
+    """A daemon thread running ``target``, started at most once at a time per process."""
+
+    def __init__(self, target: Callable[[], None], name: str) -> None:
+        self._target = target
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        # A thread started before a fork does not exist in the child
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Start the thread unless it is running in this process; return whether it was started."""
+        with self._lock:
+            if self.running:
+                return False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._target, name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,175 @@
+"""Dataset fetching with retry/backoff, snapshot fallback and background loading.
+
+``fetch_dataset`` makes sure the CSV is on disk: it keeps an existing local
+copy, otherwise downloads ``DATA_URL`` with exponential backoff, and falls back
+to the snapshot when every attempt fails. The snapshot is a gzip copy of the
+last successful download, refreshed by every download and bundled with the app
+by ``python -m flask_app.services.loader`` at build time. ``DatasetLoader`` runs that
+plus any preparation (Arrow conversion, index building) in a background
+thread and exposes the load state for the readiness endpoint, so no request
+ever waits on the upstream server.
+"""
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import time
+import sys
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+from ..config import (
+    DATA_URL,
+    DEFAULT_DATASET,
+    FETCH_BACKOFF,
+    FETCH_RETRIES,
+    FETCH_TIMEOUT,
+    LOCAL_PATH,
+    SNAPSHOT_PATH,
+)
+from .fs import ProcessThread, atomic_path
+
+log = logging.getLogger(__name__)
+
+
+def _download(url: str, path: str, timeout: float) -> None:
+    with atomic_path(path) as tmp_path:
+        with urllib.request.urlopen(url, timeout=timeout) as resp, open(tmp_path, "wb") as out:
+            shutil.copyfileobj(resp, out, 1 << 20)
+
+
+def _copy_snapshot(snapshot_path: str, path: str) -> None:
+    opener = gzip.open if snapshot_path.endswith(".gz") else open
+    with atomic_path(path) as tmp_path:
+        with opener(snapshot_path, "rb") as src, open(tmp_path, "wb") as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+
+
+def save_snapshot(path: str, snapshot_path: str) -> None:
+    """Write the CSV at path as the (gzip-compressed) fallback snapshot."""
+    os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+    with atomic_path(snapshot_path) as tmp_path:
+        with open(path, "rb") as src, gzip.GzipFile(tmp_path, "wb", compresslevel=9, mtime=0) as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+
+
+def fetch_dataset(
+    url: str = DATA_URL,
+    path: str = LOCAL_PATH,
+    retries: int = FETCH_RETRIES,
+    backoff: float = FETCH_BACKOFF,
+    timeout: float = FETCH_TIMEOUT,
+    snapshot_path: Optional[str] = SNAPSHOT_PATH,
+    on_attempt: Callable[[int], None] = lambda attempt: None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> str:
+    """Ensure the CSV exists at path; return where it came from (local, remote or snapshot)."""
+    if os.path.exists(path):
+        return "local"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    last_error: Optional[BaseException] = None
+    for attempt in range(1, retries + 1):
+        on_attempt(attempt)
+        try:
+            _download(url, path, timeout)
+        except OSError as exc:  # URLError, timeouts and HTTP errors are all OSErrors
+            last_error = exc
+            if attempt < retries:
+                sleep(backoff * 2 ** (attempt - 1))
+            continue
+        if snapshot_path:
+            # Keep the fallback as recent as the last good download
+            try:
+                save_snapshot(path, snapshot_path)
+            except OSError as exc:  # e.g. a read-only install: keep the bundled one
+                log.warning("Could not update the snapshot %s: %s", snapshot_path, exc)
+        return "remote"
+    if snapshot_path and os.path.exists(snapshot_path):
+        _copy_snapshot(snapshot_path, path)
+        return "snapshot"
+    raise RuntimeError(f"Could not fetch {url} after {retries} attempts and no snapshot at {snapshot_path}: {last_error}")
+
+
+class DatasetLoader:
+    """Fetch and prepare the dataset once per process, in a background thread.
+
+    ``prepare`` receives the local CSV path and runs after the fetch (e.g. the
+    data service's preload). ``status`` moves pending -> loading -> ready/failed.
+    """
+
+    def __init__(
+        self, prepare: Callable[[str], None] = lambda path: None, name: str = "dataset-loader", **fetch_kwargs
+    ) -> None:
+        self._prepare = prepare
+        self._fetch_kwargs = fetch_kwargs
+        self._thread = ProcessThread(self.run, name=name)
+        self.status = "pending"
+        self.source: Optional[str] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def run(self) -> None:
+        """Fetch and prepare synchronously in the calling thread."""
+        self.status, self.started_at, self.error = "loading", time.time(), None
+        try:
+            path = self._fetch_kwargs.get("path", LOCAL_PATH)
+            self.source = fetch_dataset(on_attempt=self._count_attempt, **self._fetch_kwargs)
+            self._prepare(path)
+            self.status = "ready"
+        except Exception as exc:
+            self.status, self.error = "failed", f"{type(exc).__name__}: {exc}"
+        finally:
+            self.finished_at = time.time()
+
+    def _count_attempt(self, attempt: int) -> None:
+        self.attempts = attempt
+
+    def start(self) -> None:
+        """Start loading in a daemon thread unless ready or already running in this process."""
+        if not self.ready:
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self._thread.join(timeout)
+        return self.ready
+
+    def state(self) -> Dict[str, object]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "status": self.status,
+            "source": self.source,
+            "attempts": self.attempts,
+            "error": self.error,
+            "elapsed_s": elapsed,
+        }
+
+
+def main(argv: List[str] = None) -> int:
+    """Build step: fetch a dataset (unless on disk) and write its snapshot, to bundle with the app."""
+    from .registry import get_spec
+
+    parser = argparse.ArgumentParser(description="Fetch a dataset and write its fallback snapshot")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="registered dataset name")
+    parser.add_argument("--snapshot", default=None, help="default: the dataset's snapshot_path")
+    args = parser.parse_args(argv)
+    spec = get_spec(args.dataset)
+    snapshot_path = args.snapshot or spec.snapshot_path
+    if not snapshot_path:
+        parser.error(f"Dataset {spec.name!r} has no snapshot_path, pass --snapshot")
+    source = fetch_dataset(url=spec.url, path=spec.path, snapshot_path=None)
+    save_snapshot(spec.path, snapshot_path)
+    print(f"Wrote {snapshot_path} ({os.path.getsize(snapshot_path) / 1e3:.0f} kB gzip) from {spec.path} ({source})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
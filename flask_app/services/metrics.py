@@ -0,0 +1,194 @@
+"""Per-request stage timings, process metrics and a sampling profiler.
+
+``stage(name)`` times a block of the current request; the timings of a request
+are collected in a context variable (set by the instrumentation blueprint), so
+services can be instrumented without depending on Flask and stay no-ops
+outside requests. Metrics are plain in-process counters and histograms
+rendered in the Prometheus text format; under gunicorn each worker exposes its
+own, to be summed by the scraper.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import PROFILE_DIR, PROFILE_INTERVAL_MS
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("co2_stages", default=None)
+
+
+# ---------------------- Stage timings ---------------------- #
+def start_request() -> None:
+    _stages.set({})
+
+
+def finish_request() -> Dict[str, float]:
+    """Stage durations (seconds) of the current request, in first-use order."""
+    stages = _stages.get() or {}
+    _stages.set(None)
+    return stages
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the block's duration to stage name of the current request, if any."""
+    stages = _stages.get()
+    if stages is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+
+def server_timing(stages: Dict[str, float], total: float) -> str:
+    """``Server-Timing`` header value, durations in milliseconds."""
+    items = [*stages.items(), ("total", total)]
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in items)
+
+
+# ---------------------- Metrics ---------------------- #
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.label_names)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = (*self.label_names, "le")
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*map(repr, self.buckets), "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(names, (*key, bound))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("co2_requests_total", "HTTP requests by endpoint and status.", ("endpoint", "status"))
+REQUEST_DURATION = Histogram("co2_request_duration_seconds", "Request handling time.", ("endpoint",))
+STAGE_DURATION = Histogram("co2_stage_duration_seconds", "Time per request stage.", ("endpoint", "stage"))
+CACHE_REQUESTS = Counter(
+    "co2_cache_requests_total",
+    "Lookups in the HTTP (ETag), shared (Flask-Caching) and artifact caches; result is hit, miss or disk (artifact read back from disk).",
+    ("cache", "name", "result"),
+)
+METRICS = (REQUESTS, REQUEST_DURATION, STAGE_DURATION, CACHE_REQUESTS)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# ---------------------- Sampling profiler ---------------------- #
+class SamplingProfiler:
+    """Samples the stacks of in-flight requests from a background thread.
+
+    ``begin``/``end`` bracket a request; when it took longer than the
+    threshold, its samples are written in the folded-stack format
+    (``frame;frame;frame count`` per line) read by flamegraph.pl, speedscope
+    and inferno.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float = PROFILE_INTERVAL_MS, out_dir: str = PROFILE_DIR) -> None:
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self._active: Dict[int, Tally] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_thread(self) -> None:
+        # The sampler thread does not survive a fork (gunicorn workers)
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="co2-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[_folded(frame)] += 1
+
+    def begin(self) -> None:
+        with self._lock:
+            self._ensure_thread()
+            self._active[threading.get_ident()] = Tally()
+
+    def end(self, label: str, duration_s: float) -> Optional[str]:
+        """Stop sampling the current thread; return the dump path if the request was slow."""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or duration_s * 1000 < self.threshold_ms:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label)
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_label}-{duration_s * 1000:.0f}ms.folded")
+        with open(path, "w") as fh:
+            for stack, count in samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+
+def _folded(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
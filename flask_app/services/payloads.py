@@ -0,0 +1,212 @@
+"""Figure JSON and first table pages for the interactive dashboard sections.
+
+Shared by the page routes, which render them into templates, and the JSON API,
+whose responses the browser patches into the page with ``Plotly.react``.
+Payloads are memoized by their (already clamped) parameters and the version of
+the last refresh touching their years/countries, so repeated control values
+skip ``px.*``, ``to_json`` and the table page.
+plotly.express is imported on first use, keeping it out of ``create_app()``.
+Sections that depend only on the dataset are persisted per dataset version
+(``artifact``) instead.
+"""
+from typing import Any, Dict, Tuple
+
+import orjson
+import pandas as pd
+
+from ..config import CO2_COL, COUNTRY_COL, YEAR_COL
+from .data import (
+    artifact,
+    get_data,
+    get_describe,
+    get_nan_counts,
+    get_rank_table,
+    get_series,
+    get_top_emitters,
+    memoized,
+    series_scope,
+    year_scope,
+)
+from .figures import figure_json, typed_array
+from .metrics import stage
+from .registry import current_spec, indicator_args
+from .tables import table_frame, table_page
+
+TABLE_CLASSES = ["table", "table-sm", "table-striped"]
+
+
+def table_html(df: pd.DataFrame) -> str:
+    return df.to_html(index=False, classes=TABLE_CLASSES)
+
+
+def display_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """df with the current dataset's column names (see registry.py)."""
+    return df.rename(columns=current_spec().display_names)
+
+
+def first_page(df: pd.DataFrame, name: str, **params: Any) -> Dict[str, Any]:
+    """First page of a table, with the ``/api/tables/<name>`` URL serving the rest."""
+    from flask import url_for
+
+    return table_page(display_frame(df), url_for("api.table", name=name, **params, **indicator_args()))
+
+
+def payload_json(payload: Dict[str, Any]) -> bytes:
+    """JSON body of a payload; the figure is already serialized by plotly and embedded without re-parsing."""
+    if payload.get("figure") is not None:
+        payload = {**payload, "figure": orjson.Fragment(payload["figure"])}
+    return orjson.dumps(payload)
+
+
+@memoized("top_emitters_payload", scope=year_scope)
+def top_emitters_payload(start_year: int, end_year: int, top_n: int) -> Dict[str, Any]:
+    with stage("aggregate"):
+        agg_df = get_top_emitters(start_year, end_year, top_n)
+    bar_json = None
+    if not agg_df.empty:
+        with stage("figure"):
+            import plotly.express as px
+
+            spec = current_spec()
+            fig_bar = px.bar(
+                agg_df,
+                x=CO2_COL,
+                y=COUNTRY_COL,
+                orientation="h",
+                title=f"Top {len(agg_df)} Average {spec.title} {start_year}-{end_year}",
+                text=CO2_COL,
+                labels=spec.display_names,
+            )
+            fig_bar.update_layout(yaxis={"categoryorder": "total ascending"})
+        with stage("to_json"):
+            bar_json = figure_json(fig_bar)
+    with stage("table"):
+        table = first_page(agg_df, "top-emitters", start_year=start_year, end_year=end_year, top_n=top_n)
+    return {"figure": bar_json, "table": table}
+
+
+@memoized("race_payload", scope=year_scope)
+def race_payload(start_year: int, end_year: int, top_n: int) -> Dict[str, Any]:
+    """Frames of the animated top N race: per year with data, the top_n countries
+    (indexes into ``countries``, -1 for empty slots), their values and their
+    rank gain over the previous year, as ``years x top_n`` typed arrays."""
+    with stage("aggregate"):
+        years, countries, codes, values, rank_change = get_rank_table().frames(start_year, end_year, top_n)
+    spec = current_spec()
+    return {
+        "title": f"Top {top_n} {spec.title} by year",
+        "label": spec.label,
+        "years": years,
+        "countries": countries.tolist(),
+        "country": typed_array(codes),
+        "value": typed_array(values),
+        "rank_change": typed_array(rank_change),
+    }
+
+
+@memoized("series_payload", scope=series_scope)
+def series_payload(
+    countries: Tuple[str, ...],
+    start_year: int,
+    end_year: int,
+    rolling_window: int,
+    use_log: bool,
+    show_table: bool,
+) -> Dict[str, Any]:
+    """One country: raw line plus optional rolling mean. Several: one line per
+    country (the rolling mean when rolling_window > 1)."""
+    with stage("aggregate"):
+        country_df = get_series(countries, start_year, end_year, rolling_window)
+    if country_df.empty:
+        return {"figure": None, "table": None}
+
+    with stage("figure"):
+        fig = _series_figure(country_df, countries, start_year, end_year, rolling_window, use_log)
+    with stage("to_json"):
+        fig_json = figure_json(fig)
+    table = None
+    if show_table:
+        with stage("table"):
+            table = first_page(
+                country_df,
+                "series",
+                country=list(countries),
+                start_year=start_year,
+                end_year=end_year,
+                rolling=rolling_window,
+            )
+    return {"figure": fig_json, "table": table}
+
+
+def _series_figure(
+    country_df: pd.DataFrame,
+    countries: Tuple[str, ...],
+    start_year: int,
+    end_year: int,
+    rolling_window: int,
+    use_log: bool,
+):
+    import plotly.express as px
+
+    spec = current_spec()
+    rolling_col = f"Rolling {rolling_window}y"
+    if len(countries) == 1:
+        fig = px.line(
+            country_df,
+            x=YEAR_COL,
+            y=CO2_COL,
+            title=f"{spec.title} - {countries[0]} ({start_year}-{end_year})",
+            markers=True,
+            labels=spec.display_names,
+        )
+        if rolling_window > 1:
+            fig.add_scatter(
+                x=country_df[YEAR_COL],
+                y=country_df[rolling_col],
+                mode="lines",
+                name=f"Rolling {rolling_window}y mean",
+                line=dict(width=3),
+            )
+    else:
+        smoothed = f", rolling {rolling_window}y mean" if rolling_window > 1 else ""
+        fig = px.line(
+            country_df,
+            x=YEAR_COL,
+            y=rolling_col if rolling_window > 1 else CO2_COL,
+            color=COUNTRY_COL,
+            title=f"{spec.title} - {len(countries)} countries ({start_year}-{end_year}{smoothed})",
+            labels=spec.display_names,
+        )
+    if use_log:
+        fig.update_yaxes(type="log")
+    fig.update_layout(yaxis_title=spec.label)
+    return fig
+
+
+@artifact("describe_table")
+def describe_table() -> Dict[str, Any]:
+    return first_page(table_frame(get_describe()), "describe")
+
+
+@artifact("raw_head_html")
+def raw_head_html() -> str:
+    return table_html(display_frame(get_data().raw.head(20)))
+
+
+@artifact("missing_section")
+def missing_payload() -> Dict[str, Any]:
+    """Missing-value table and bar chart of the 25 countries with the most missing rows."""
+    nan_counts = get_nan_counts()
+    if nan_counts.empty:
+        return {"figure": None, "table": None}
+    import plotly.express as px
+
+    spec = current_spec()
+    fig_nan = px.bar(
+        nan_counts.head(25),
+        x=COUNTRY_COL,
+        y="Missing CO2",
+        title=f"Top countries by missing {spec.short} rows",
+        labels=spec.display_names,
+    )
+    return {"figure": figure_json(fig_nan), "table": first_page(nan_counts, "missing")}
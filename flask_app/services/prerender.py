@@ -0,0 +1,189 @@
+"""Per-country time-series payloads rendered ahead of time.
+
+``python -m flask_app.services.prerender`` is a deploy step, run once the CSV
+is on disk: it renders the default ``/api/series`` payload of every country
+(full year range, each of ``PRERENDER_WINDOWS``, linear scale, with table) in
+a process pool and writes it gzip-compressed under
+``PRERENDER_DIR/<dataset>/<build id>-<version>/`` (the default dataset unless
+``--dataset`` names another registered one, see registry.py). The series routes serve those files directly
+(the API sends the stored bytes to clients accepting gzip) and render live
+only what was not pre-rendered: custom year ranges, other windows, log scale,
+several countries.
+
+The directory of a file names the deployed code (see build.py) and the
+version of the last refresh touching its country and years (see refresh.py):
+ingesting rows for other countries keeps it valid, while payloads rendered by
+an earlier deploy simply miss until the step is re-run.
+"""
+import argparse
+import gzip
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+import orjson
+
+from ..config import DEFAULT_DATASET, PRERENDER_WINDOWS
+from .build import build_id
+from .fs import atomic_write
+from .metrics import CACHE_REQUESTS
+from .registry import current_spec, get_spec, indicator_args, use_dataset
+
+_app = None
+
+
+def payload_path(
+    version: str,
+    country: str,
+    start_year: int,
+    end_year: int,
+    rolling_window: int,
+    use_log: bool,
+    show_table: bool,
+    root: str,
+) -> str:
+    name = f"{quote(country, safe='')}.{start_year}-{end_year}.r{rolling_window}.{int(use_log)}{int(show_table)}.json.gz"
+    return os.path.join(root, f"{build_id()}-{version}", name)
+
+
+def find_prerendered(
+    countries: Tuple[str, ...],
+    start_year: int,
+    end_year: int,
+    rolling_window: int,
+    use_log: bool,
+    show_table: bool,
+    root: Optional[str] = None,
+) -> Optional[str]:
+    """Path of the pre-rendered series payload of the current dataset for these
+    (clamped) arguments, if there is one."""
+    if len(countries) != 1:
+        return None
+    from .data import get_snapshot
+
+    root = root or current_spec().prerender_dir
+    version = get_snapshot().scope_version(countries, start_year, end_year)
+    path = payload_path(version, countries[0], start_year, end_year, rolling_window, use_log, show_table, root)
+    found = os.path.exists(path)
+    CACHE_REQUESTS.inc(cache="prerender", name="series_payload", result="hit" if found else "miss")
+    return path if found else None
+
+
+def read_prerendered(path: str) -> bytes:
+    """The gzip-compressed JSON body, as stored."""
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+def prerendered_payload(path: str) -> Dict[str, Optional[str]]:
+    """The payload with its figure as JSON text, as ``series_payload`` returns it."""
+    payload = orjson.loads(gzip.decompress(read_prerendered(path)))
+    if payload.get("figure") is not None:
+        payload["figure"] = orjson.dumps(payload["figure"]).decode()
+    return payload
+
+
+# ---------------------- Build step ---------------------- #
+def _init_worker() -> None:
+    """Load the app and dataset, unless inherited from the parent through fork."""
+    global _app
+    if _app is None:
+        from ..app import create_app
+        from .data import preload
+
+        _app = create_app(background_load=False)
+        preload()
+
+
+def _render(dataset: str, countries: Sequence[str], windows: Sequence[int], root: str) -> List[str]:
+    """Render and write the payloads of countries; return the written paths."""
+    from flask import url_for
+
+    from .data import get_snapshot
+    from .payloads import payload_json, series_payload
+
+    render = series_payload.__wrapped__  # bypass the shared cache, every key is rendered once
+    paths = []
+    with _app.test_request_context(), use_dataset(dataset):
+        snapshot = get_snapshot()
+        start_year, end_year = snapshot.store.min_year, snapshot.store.max_year
+        for country in countries:
+            version = snapshot.scope_version((country,), start_year, end_year)
+            download_url = url_for(
+                "pages.download_csv",
+                country=[country],
+                start_year=start_year,
+                end_year=end_year,
+                **indicator_args(),
+            )
+            for window in windows:
+                payload = render((country,), start_year, end_year, window, False, True)
+                body = payload_json({**payload, "download_url": download_url})
+                path = payload_path(version, country, start_year, end_year, window, False, True, root)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write(path, gzip.compress(body, compresslevel=9, mtime=0))
+                paths.append(path)
+    return paths
+
+
+def build(
+    workers: int = 0,
+    windows: Sequence[int] = PRERENDER_WINDOWS,
+    root: Optional[str] = None,
+    dataset: str = DEFAULT_DATASET,
+) -> Dict[str, object]:
+    """Pre-render every country's default payloads; drop version directories no longer used."""
+    from .data import get_store
+
+    t0 = time.perf_counter()
+    root = root or get_spec(dataset).prerender_dir
+    _init_worker()
+    with use_dataset(dataset):
+        countries = get_store().country_list  # loaded before the fork, shared with the workers
+    workers = workers or os.cpu_count() or 1
+    # Interleaved chunks so each worker gets a similar mix of long and short series
+    chunks = [countries[i::workers * 4] for i in range(min(len(countries), workers * 4))]
+    # fork shares the loaded dataset with the workers; elsewhere each loads its own
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    written: Set[str] = set()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker) as pool:
+        n = len(chunks)
+        for paths in pool.map(_render, [dataset] * n, chunks, [windows] * n, [root] * n):
+            written.update(paths)
+    versions = {os.path.basename(os.path.dirname(p)) for p in written}
+    for entry in os.listdir(root) if os.path.isdir(root) else []:
+        if entry not in versions:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return {
+        "countries": len(countries),
+        "files": len(written),
+        "bytes": sum(os.path.getsize(p) for p in written),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=0, help="processes (default: CPU count)")
+    parser.add_argument("--windows", default=",".join(map(str, PRERENDER_WINDOWS)), help="rolling windows")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="registered dataset name")
+    parser.add_argument("--root", default=None, help="default: PRERENDER_DIR/<dataset>")
+    args = parser.parse_args(argv)
+    windows = [int(w) for w in args.windows.split(",")]
+    root = args.root or get_spec(args.dataset).prerender_dir
+    stats = build(args.workers, windows, root, args.dataset)
+    print(
+        f"Pre-rendered {stats['files']} payloads of {stats['countries']} countries "
+        f"({stats['bytes'] / 1e6:.1f} MB gzip) in {stats['seconds']} s to {root}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
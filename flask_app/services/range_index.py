@@ -0,0 +1,98 @@
+"""Prefix-sum index answering per-country year-range means in O(countries).
+
+A dense ``country x year`` matrix of CO2 sums and row counts is accumulated once
+and cumulated along the year axis. The mean over ``[start_year, end_year]`` is
+then two subtractions per country, and the top N comes from a partial selection
+instead of a groupby plus full sort.
+"""
+import numpy as np
+import pandas as pd
+
+from ..config import CO2_COL, COUNTRY_COL
+from .store import CountryStore
+
+
+class PrefixSumIndex:
+    """Cumulative sums/counts with a leading zero column.
+
+    ``sums[:, j]`` holds the total over years ``< first_year + j``, so the range
+    ``[a, b]`` is ``sums[:, b - first_year + 1] - sums[:, a - first_year]``.
+    """
+
+    def __init__(self, countries: np.ndarray, first_year: int, sums: np.ndarray, counts: np.ndarray):
+        self.countries = countries
+        self.first_year = first_year
+        self.last_year = first_year + sums.shape[1] - 2
+        self.sums = sums
+        self.counts = counts
+
+    @property
+    def nbytes(self) -> int:
+        return self.sums.nbytes + self.counts.nbytes
+
+    @classmethod
+    def from_store(cls, store: CountryStore) -> "PrefixSumIndex":
+        first_year = store.min_year
+        n_years = store.max_year - first_year + 1
+        n_countries = len(store.countries)
+        row_country = np.repeat(np.arange(n_countries), np.diff(store.offsets))
+        cell = row_country * n_years + (store.years - first_year)
+        values = store.columns[CO2_COL].astype(np.float64)
+        size = n_countries * n_years
+        sums = np.zeros((n_countries, n_years + 1))
+        counts = np.zeros((n_countries, n_years + 1), dtype=np.int64)
+        sums[:, 1:] = np.bincount(cell, weights=values, minlength=size).reshape(n_countries, n_years)
+        counts[:, 1:] = np.bincount(cell, minlength=size).reshape(n_countries, n_years)
+        np.cumsum(sums, axis=1, out=sums)
+        np.cumsum(counts, axis=1, out=counts)
+        return cls(store.countries, first_year, sums, counts)
+
+    def merged(self, other: "PrefixSumIndex") -> "PrefixSumIndex":
+        """Index over the rows of both indexes.
+
+        Each is laid onto the union of countries and years and the two are
+        added (cumulative sums are linear), so refreshing the index after an
+        append only bins the appended rows: O(countries x years), not O(rows).
+        """
+        countries = np.union1d(self.countries, other.countries).astype(object)
+        first_year = min(self.first_year, other.first_year)
+        last_year = max(self.last_year, other.last_year)
+        sums, counts = self._aligned(countries, first_year, last_year)
+        other_sums, other_counts = other._aligned(countries, first_year, last_year)
+        return PrefixSumIndex(countries, first_year, sums + other_sums, counts + other_counts)
+
+    def _aligned(self, countries: np.ndarray, first_year: int, last_year: int):
+        """(sums, counts) over the given (sorted, superset) countries and year span."""
+        rows = np.searchsorted(countries, self.countries)
+        # Column j covers years < first_year + j: own column clipped to [0, own years]
+        cols = np.clip(np.arange(last_year - first_year + 2) + first_year - self.first_year, 0, self.sums.shape[1] - 1)
+        sums = np.zeros((len(countries), len(cols)))
+        counts = np.zeros((len(countries), len(cols)), dtype=np.int64)
+        sums[rows] = self.sums[:, cols]
+        counts[rows] = self.counts[:, cols]
+        return sums, counts
+
+    def _columns(self, start_year: int, end_year: int):
+        lo = min(max(start_year, self.first_year), self.last_year + 1) - self.first_year
+        hi = min(max(end_year, self.first_year - 1), self.last_year) - self.first_year + 1
+        return lo, max(lo, hi)
+
+    def range_means(self, start_year: int, end_year: int):
+        """Return (countries, means) for countries with data in the range."""
+        lo, hi = self._columns(start_year, end_year)
+        counts = self.counts[:, hi] - self.counts[:, lo]
+        present = counts > 0
+        totals = self.sums[present, hi] - self.sums[present, lo]
+        return self.countries[present], totals / counts[present]
+
+    def top(self, start_year: int, end_year: int, top_n: int) -> pd.DataFrame:
+        countries, means = self.range_means(start_year, end_year)
+        if len(means) == 0:
+            return pd.DataFrame(columns=[COUNTRY_COL, CO2_COL])
+        if top_n < len(means):
+            # Partial selection of the N largest, then sort only those
+            picked = np.argpartition(-means, top_n - 1)[:top_n]
+        else:
+            picked = np.arange(len(means))
+        picked = picked[np.argsort(-means[picked], kind="stable")]
+        return pd.DataFrame({COUNTRY_COL: countries[picked], CO2_COL: means[picked]})
@@ -0,0 +1,88 @@
+"""Per-year country rankings behind the animated top-N race.
+
+The yearly value of every country (its mean over the year's rows) falls out
+of the prefix-sum index as one difference along the year axis; a single
+stable sort of each year column then ranks every country at once. The table
+is built once per dataset version (an artifact, see artifacts.py), and the
+frames of a race for any year window and ``top_n`` are slices of it, with no
+per-frame aggregation.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from .range_index import PrefixSumIndex
+
+
+class RankTable:
+    """Dense ``country x year`` values and ranks, plus the countries in rank order.
+
+    ``values[i, j]`` is the value of ``countries[i]`` in year ``first_year + j``
+    (NaN without data), ``ranks[i, j]`` its 1-based rank among the countries
+    with data that year (0 without) and ``leaders[r, j]`` the country ranked
+    ``r + 1`` (-1 past the last country with data). Ties rank by country name.
+    """
+
+    def __init__(
+        self, countries: np.ndarray, first_year: int, values: np.ndarray, ranks: np.ndarray, leaders: np.ndarray
+    ) -> None:
+        self.countries = countries
+        self.first_year = first_year
+        self.last_year = first_year + values.shape[1] - 1
+        self.values = values
+        self.ranks = ranks
+        self.leaders = leaders
+
+    @classmethod
+    def from_index(cls, index: PrefixSumIndex) -> "RankTable":
+        counts = np.diff(index.counts, axis=1)
+        present = counts > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.diff(index.sums, axis=1) / counts
+        values[~present] = np.nan
+        # One stable sort per year: descending value, countries without data last
+        order = np.argsort(np.where(present, -values, np.inf), axis=0, kind="stable")
+        n_countries = len(index.countries)
+        ranks = np.empty(order.shape, dtype=np.int32)
+        positions = np.broadcast_to(np.arange(1, n_countries + 1, dtype=np.int32)[:, None], order.shape)
+        np.put_along_axis(ranks, order, positions, axis=0)
+        ranks[~present] = 0
+        leaders = order.astype(np.int32)
+        leaders[np.arange(n_countries)[:, None] >= present.sum(axis=0)] = -1
+        return cls(index.countries, index.first_year, values.astype(np.float32), ranks, leaders)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.ranks.nbytes + self.leaders.nbytes
+
+    def frames(
+        self, start_year: int, end_year: int, top_n: int
+    ) -> Tuple[List[int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The top_n of each year in the inclusive range with data.
+
+        Returns ``(years, countries, codes, values, rank_change)``: ``countries``
+        lists each country appearing in a frame once, and the ``years x top_n``
+        arrays hold, per frame and rank, the index of the country in it (-1 for
+        empty slots), its value and its rank gain over the previous year (0 if
+        it was not ranked then).
+        """
+        lo = max(start_year, self.first_year) - self.first_year
+        hi = min(end_year, self.last_year) - self.first_year + 1
+        top_n = min(top_n, len(self.countries))
+        if hi <= lo or top_n <= 0:
+            empty = np.empty((0, max(top_n, 0)), dtype=np.int32)
+            return [], self.countries[:0], empty, empty.astype(np.float32), empty
+        leaders = self.leaders[:top_n, lo:hi].T
+        with_data = (leaders >= 0).any(axis=1)
+        cols, leaders = np.arange(lo, hi)[with_data], leaders[with_data]
+        filled = leaders >= 0
+        rows = np.where(filled, leaders, 0)
+        values = np.where(filled, self.values[rows, cols[:, None]], np.float32(np.nan))
+        current = self.ranks[rows, cols[:, None]]
+        previous = np.where(cols[:, None] > 0, self.ranks[rows, np.maximum(cols - 1, 0)[:, None]], 0)
+        rank_change = np.where(filled & (previous > 0), previous - current, 0).astype(np.int32)
+        used, codes = np.unique(leaders[filled], return_inverse=True)
+        country_codes = np.full(leaders.shape, -1, dtype=np.int32)
+        country_codes[filled] = codes
+        years = (cols + self.first_year).tolist()
+        return years, self.countries[used], country_codes, values.astype(np.float32), rank_change
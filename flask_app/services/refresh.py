@@ -0,0 +1,276 @@
+"""Incremental dataset refresh: appending rows without a full reload.
+
+New rows (new years, new countries) arrive as CSV deltas with the dataset's
+columns and separator, posted to ``/admin/ingest`` or dropped in
+``INGEST_DIR``. Each delta is written once to an append-only journal next to
+the CSV (``<csv>.deltas/``) and every process applies the entries it has not
+seen yet on top of its in-memory ``Snapshot``: the compact frame is appended
+to, only the store blocks of the delta's countries are re-sorted and the range
+index is extended with the delta's sums only. The source CSV is never
+rewritten, so its Arrow cache and content hash stay valid and a restart
+replays the journal.
+
+Deltas only add rows: one repeating a (country, year) of the dataset, or
+twice within itself, is rejected (``Snapshot.check_delta``), since the
+aggregates would silently count it twice. The check and the journal write
+happen under the journal's file lock, after applying every entry, so deltas
+ingested concurrently by several workers are checked against each other.
+
+Each delta bumps the dataset version and records the countries and years it
+touches. Cache keys of scoped results (top emitters, series) carry the
+version of the last delta touching their arguments (``scope_version``), so
+cached entries for untouched year ranges and countries stay valid in every
+backend; dataset-wide summaries follow the latest version.
+"""
+import hashlib
+import io
+import logging
+import os
+import time
+from functools import cached_property
+from typing import Callable, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from ..config import COUNTRY_COL, YEAR_COL
+from .compact import CompactDataset, array_nbytes, frame_nbytes
+from .fs import ProcessThread, atomic_write, file_lock
+from .range_index import PrefixSumIndex
+from .store import CountryStore
+
+log = logging.getLogger(__name__)
+
+
+def journal_dir_for(csv_path: str) -> str:
+    return f"{csv_path}.deltas"
+
+
+def read_delta(
+    source: Union[str, bytes],
+    sep: str,
+    columns: Sequence[str],
+    normalize: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> CompactDataset:
+    """Parse a CSV delta (path or bytes) into compact form; ValueError if it does not fit the dataset.
+
+    ``normalize`` maps the source columns to the dataset's (see registry.py).
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    frame = pd.read_csv(source, sep=sep)  # ParserError / EmptyDataError are ValueErrors
+    if normalize is not None:
+        frame = normalize(frame)
+    if list(frame.columns) != list(columns):
+        raise ValueError(f"Expected columns {list(columns)}, got {list(frame.columns)}")
+    if frame.empty:
+        raise ValueError("Delta has no rows")
+    if not pd.api.types.is_integer_dtype(frame[YEAR_COL]):
+        raise ValueError(f"{YEAR_COL} must be integers")
+    repeated = frame[frame.duplicated([COUNTRY_COL, YEAR_COL])]
+    if len(repeated):
+        first = repeated.iloc[0]
+        raise ValueError(
+            f"{len(repeated)} rows repeat a {COUNTRY_COL}/{YEAR_COL} of the delta, "
+            f"e.g. {first[COUNTRY_COL]} {first[YEAR_COL]}"
+        )
+    return CompactDataset.from_frame(frame)
+
+
+class Delta:
+    """The part of the dataset touched by one applied journal entry."""
+
+    def __init__(self, sha: str, version: str, countries: FrozenSet[str], start_year: int, end_year: int, rows: int):
+        self.sha = sha
+        self.version = version
+        self.countries = countries
+        self.start_year = start_year
+        self.end_year = end_year
+        self.rows = rows
+
+    @classmethod
+    def of(cls, sha: str, previous_version: str, dataset: CompactDataset) -> "Delta":
+        years = dataset.raw[YEAR_COL].to_numpy()
+        return cls(
+            sha,
+            hashlib.sha256(f"{previous_version}:{sha}".encode()).hexdigest()[:16],
+            frozenset(dataset.raw[COUNTRY_COL].dropna().unique().tolist()),
+            int(years.min()),
+            int(years.max()),
+            len(dataset.raw),
+        )
+
+    def touches(self, countries: Optional[Sequence[str]], start_year: int, end_year: int) -> bool:
+        """Whether rows of this delta fall in the year range (and, unless None, the countries)."""
+        if end_year < self.start_year or start_year > self.end_year:
+            return False
+        return countries is None or not self.countries.isdisjoint(countries)
+
+    def summary(self) -> dict:
+        return {
+            "sha": self.sha,
+            "version": self.version,
+            "rows": self.rows,
+            "countries": len(self.countries),
+            "start_year": self.start_year,
+            "end_year": self.end_year,
+        }
+
+
+class Snapshot:
+    """One version of the dataset and the indexes over it; never mutated, replaced on refresh."""
+
+    def __init__(
+        self,
+        base_version: str,
+        dataset: CompactDataset,
+        store: CountryStore,
+        index: PrefixSumIndex,
+        deltas: Tuple[Delta, ...] = (),
+    ) -> None:
+        self.base_version = base_version
+        self.dataset = dataset
+        self.store = store
+        self.index = index
+        self.deltas = deltas
+        self.applied = frozenset(delta.sha for delta in deltas)
+
+    @classmethod
+    def build(cls, base_version: str, dataset: CompactDataset) -> "Snapshot":
+        store = CountryStore.from_frame(dataset.clean())
+        return cls(base_version, dataset, store, PrefixSumIndex.from_store(store))
+
+    @property
+    def version(self) -> str:
+        return self.deltas[-1].version if self.deltas else self.base_version
+
+    @cached_property
+    def nbytes(self) -> int:
+        """Approximate bytes held: the compact frame and mask, the store columns and the range index."""
+        store = sum(array_nbytes(values) for values in self.store.columns.values()) + self.store.offsets.nbytes
+        return frame_nbytes(self.dataset.raw) + self.dataset.valid.nbytes + store + self.index.nbytes
+
+    @cached_property
+    def keys(self) -> pd.MultiIndex:
+        """(country, year) of every row, including those without a value."""
+        return pd.MultiIndex.from_arrays([self.dataset.raw[COUNTRY_COL].astype(object), self.dataset.raw[YEAR_COL]])
+
+    def check_delta(self, delta: CompactDataset) -> None:
+        """ValueError if the delta has rows for a (country, year) the dataset already has."""
+        keys = pd.MultiIndex.from_arrays([delta.raw[COUNTRY_COL].astype(object), delta.raw[YEAR_COL]])
+        existing = keys[keys.isin(self.keys)]
+        if len(existing):
+            country, year = existing[0]
+            raise ValueError(
+                f"{len(existing)} rows repeat a {COUNTRY_COL}/{YEAR_COL} of the dataset, e.g. {country} {year}; "
+                "deltas only add rows"
+            )
+
+    def scope_version(self, countries: Optional[Sequence[str]], start_year: int, end_year: int) -> str:
+        """Version of the last delta touching the scope; results within it are unchanged since."""
+        for delta in reversed(self.deltas):
+            if delta.touches(countries, start_year, end_year):
+                return delta.version
+        return self.base_version
+
+    def append(self, entries: Sequence[Tuple[str, CompactDataset]]) -> "Snapshot":
+        """Snapshot with the (sha, delta) entries applied in order."""
+        if not entries:
+            return self
+        deltas = list(self.deltas)
+        for sha, delta in entries:
+            deltas.append(Delta.of(sha, deltas[-1].version if deltas else self.base_version, delta))
+        first, *rest = (delta for _, delta in entries)
+        added = first.append(*rest)
+        dataset = self.dataset.append(added)
+        store, index = self.store, self.index
+        if added.valid.any():
+            # Only the appended rows are sorted and binned
+            added_store = CountryStore.from_frame(added.clean())
+            store = store.merged(added_store)
+            index = index.merged(PrefixSumIndex.from_store(added_store))
+        return Snapshot(self.base_version, dataset, store, index, tuple(deltas))
+
+
+class DeltaJournal:
+    """Append-only directory of ingested deltas, ``<time_ns>-<sha256>.csv`` in ingest order."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def entries(self) -> List[Tuple[str, str]]:
+        """(sha, path) of every entry, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(".csv"))
+        return [(n[:-4].split("-", 1)[1], os.path.join(self.directory, n)) for n in names]
+
+    def lock(self):
+        """Cross-process lock of the journal (see fs.file_lock): hold it to check a
+        delta against every entry and journal it without another process doing so in between."""
+        return file_lock(os.path.join(self.directory, ".lock"))
+
+    def add(self, content: bytes) -> Tuple[str, bool]:
+        """Journal content unless an identical delta is already there; return (sha, added)."""
+        sha = hashlib.sha256(content).hexdigest()
+        if any(entry_sha == sha for entry_sha, _ in self.entries()):
+            return sha, False
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns():020d}-{sha}.csv")
+        atomic_write(path, content)  # other workers never apply a half-written delta
+        return sha, True
+
+
+def claim_incoming(incoming_dir: str, ingest: Callable[[bytes], object]) -> List[object]:
+    """Hand each ``*.csv`` of incoming_dir to ingest (which checks and journals it);
+    files it rejects with ValueError go to ``rejected/``.
+
+    Files are claimed by an atomic rename, so with several workers polling the
+    same directory each file is journaled once.
+    """
+    if not os.path.isdir(incoming_dir):
+        return []
+    results = []
+    for name in sorted(os.listdir(incoming_dir)):
+        path = os.path.join(incoming_dir, name)
+        if not name.endswith(".csv") or not os.path.isfile(path):
+            continue
+        claimed = f"{path}.{os.getpid()}.claim"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            continue  # another worker got it
+        with open(claimed, "rb") as fh:
+            content = fh.read()
+        try:
+            results.append(ingest(content))
+        except ValueError as exc:
+            log.warning("Rejected dataset delta %s: %s", name, exc)
+            os.makedirs(os.path.join(incoming_dir, "rejected"), exist_ok=True)
+            os.replace(claimed, os.path.join(incoming_dir, "rejected", name))
+            continue
+        os.remove(claimed)
+    return results
+
+
+class Poller:
+    """Call ``tick`` every ``interval`` seconds from a daemon thread, once per process."""
+
+    def __init__(self, tick: Callable[[], None], interval: float, name: str) -> None:
+        self._tick = tick
+        self.interval = interval
+        self.name = name
+        self._thread = ProcessThread(self._run, name=name)
+
+    def start(self) -> None:
+        """Start polling unless disabled (interval <= 0) or already running in this process."""
+        if self.interval > 0:
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._tick()
+            except Exception:
+                log.exception("%s tick failed", self.name)
+
@@ -0,0 +1,306 @@
+"""Registry of the per-country indicator datasets and the cache of their snapshots.
+
+Each dataset is a CSV with one row per country and year, described by a
+``DatasetSpec``: where to fetch it, its separator and which source columns hold
+the country name, code, year and indicator value. On load those columns are
+renamed to the canonical ones (``COUNTRY_COL``, ``CODE_COL``, ``YEAR_COL``,
+``CO2_COL``), so the compact frame, store, range index and every service built
+on them work unchanged; ``display_names`` maps them back for figures, tables
+and exports.
+
+The dataset of a request is chosen by its ``indicator`` query parameter and
+held in a context variable (like the stage timings of metrics.py), so the
+data accessors need no extra argument. ``DatasetCache`` loads a dataset's
+snapshot on first use and evicts the least recently used ones once the loaded
+snapshots exceed the memory budget; the default dataset (preloaded in the
+gunicorn master, gating readiness) is pinned.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from ..config import (
+    ARTIFACT_DIR,
+    CO2_COL,
+    CODE_COL,
+    COUNTRY_COL,
+    DATA_URL,
+    DATASETS,
+    DEFAULT_DATASET,
+    INGEST_DIR,
+    LOCAL_PATH,
+    PRERENDER_DIR,
+    SEPARATOR,
+    SNAPSHOT_PATH,
+    YEAR_COL,
+)
+from .arrow_cache import ensure_cache, read_csv_cached, source_sha256
+from .compact import CompactDataset, compact_frame
+from .refresh import Snapshot, journal_dir_for, read_delta
+
+log = logging.getLogger(__name__)
+
+NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+# Columns of every loaded dataset, in order
+COLUMNS = (COUNTRY_COL, CODE_COL, YEAR_COL, CO2_COL)
+
+
+class DatasetSpec:
+    """Where a dataset comes from and which of its columns are the country, code, year and value.
+
+    ``code_col`` may be None for sources without country codes (the name is
+    used). ``title`` names the indicator in headings ("CO2 Per Capita"),
+    ``label`` is its value column as displayed (with the unit) and ``short``
+    its name in compound labels ("Missing CO2"). ``stream`` marks a dataset too
+    large to hold per process: its summaries come from the chunked pass of
+    streaming.py and its rows are loaded only by the routes that need them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        value_col: str,
+        path: Optional[str] = None,
+        snapshot_path: Optional[str] = None,
+        separator: str = ",",
+        country_col: str = COUNTRY_COL,
+        code_col: Optional[str] = CODE_COL,
+        year_col: str = YEAR_COL,
+        title: Optional[str] = None,
+        label: Optional[str] = None,
+        short: Optional[str] = None,
+        stream: bool = False,
+    ) -> None:
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Dataset name {name!r} must match {NAME_PATTERN.pattern}")
+        self.name = name
+        self.url = url
+        self.value_col = value_col
+        self.path = path or os.path.join("data", f"{name}.csv")
+        self.snapshot_path = snapshot_path
+        self.separator = separator
+        self.country_col = country_col
+        self.code_col = code_col
+        self.year_col = year_col
+        self.title = title or value_col
+        self.label = label or value_col
+        self.short = short or self.title
+        self.stream = stream
+
+    @property
+    def source_columns(self) -> List[str]:
+        return [c for c in (self.country_col, self.code_col, self.year_col, self.value_col) if c is not None]
+
+    @property
+    def fingerprint(self) -> str:
+        """The schema fields; part of the dataset version, so redefining a dataset invalidates its caches."""
+        return repr((self.name, self.separator, self.country_col, self.code_col, self.year_col, self.value_col))
+
+    @property
+    def display_names(self) -> Dict[str, str]:
+        """Canonical column -> name shown in figures, tables and exports."""
+        return {CO2_COL: self.label, "Missing CO2": f"Missing {self.short}"}
+
+    @property
+    def artifact_dir(self) -> str:
+        return os.path.join(ARTIFACT_DIR, self.name)
+
+    @property
+    def prerender_dir(self) -> str:
+        return os.path.join(PRERENDER_DIR, self.name)
+
+    @property
+    def journal_dir(self) -> str:
+        return journal_dir_for(self.path)
+
+    @property
+    def ingest_dir(self) -> str:
+        return INGEST_DIR if self.name == DEFAULT_DATASET else os.path.join(INGEST_DIR, self.name)
+
+    def normalize(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """The country, code, year and value columns under their canonical names; ValueError if one is missing."""
+        missing = [c for c in self.source_columns if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Dataset {self.name!r}: missing columns {missing}, got {list(frame.columns)}")
+        sources = (self.country_col, self.code_col or self.country_col, self.year_col, self.value_col)
+        return pd.DataFrame({col: frame[source] for col, source in zip(COLUMNS, sources)}, copy=False)
+
+    def compact(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """The compact frame (compact.py) of a parsed source CSV, as stored in its Arrow cache."""
+        return compact_frame(self.normalize(frame))
+
+    @property
+    def cache_options(self) -> Dict[str, object]:
+        """Arrow cache layout (arrow_cache.py): the compact frame, so loading maps it without copies."""
+        return {"convert": self.compact, "layout": f"compact:{self.fingerprint}"}
+
+    def ensure_cache(self) -> str:
+        """Build or refresh the Arrow cache of the local CSV and return its path."""
+        return ensure_cache(self.path, self.separator, **self.cache_options)
+
+    def read(self) -> CompactDataset:
+        """The compact dataset of the local CSV, memory-mapped from its Arrow cache."""
+        return CompactDataset.from_frame(read_csv_cached(self.path, self.separator, **self.cache_options))
+
+    def read_delta(self, source: Union[str, bytes]) -> CompactDataset:
+        """A CSV delta in this dataset's source format (see refresh.py); ValueError if it does not fit."""
+        return read_delta(source, self.separator, COLUMNS, self.normalize)
+
+    def base_version(self, content_sha256: Optional[str] = None) -> str:
+        """Short hash of the schema and the CSV's content (its SHA-256 if already known);
+        chained with each delta by refresh.py."""
+        content = content_sha256 or source_sha256(self.path, self.separator, **self.cache_options)
+        return hashlib.sha256(f"{self.fingerprint}:{content}".encode()).hexdigest()[:16]
+
+
+def load_registry(source: str = DATASETS) -> Dict[str, DatasetSpec]:
+    """The default CO2 dataset plus those of source (inline JSON or a .json file path)."""
+    specs = {
+        DEFAULT_DATASET: DatasetSpec(
+            DEFAULT_DATASET,
+            url=DATA_URL,
+            value_col=CO2_COL,
+            path=LOCAL_PATH,
+            snapshot_path=SNAPSHOT_PATH,
+            separator=SEPARATOR,
+            title="CO2 Per Capita",
+            short="CO2",
+        )
+    }
+    if source:
+        if not source.lstrip().startswith("{"):
+            with open(source, encoding="utf-8") as fh:
+                source = fh.read()
+        for name, fields in json.loads(source).items():
+            try:
+                specs[name] = DatasetSpec(name, **fields)
+            except TypeError as exc:
+                raise ValueError(f"Dataset {name!r} in CO2_DATASETS: {exc}") from exc
+    return specs
+
+
+REGISTRY = load_registry()
+
+
+# ---------------------- Current dataset ---------------------- #
+_current: ContextVar[str] = ContextVar("co2_dataset", default=DEFAULT_DATASET)
+
+
+def get_spec(name: str) -> DatasetSpec:
+    """The registered dataset name; KeyError if there is none."""
+    return REGISTRY[name]
+
+
+def current_spec() -> DatasetSpec:
+    """The dataset of the current request (the default outside requests)."""
+    return REGISTRY[_current.get()]
+
+
+def select_dataset(name: str) -> None:
+    """Make name the current dataset of this context; KeyError if it is not registered."""
+    get_spec(name)
+    _current.set(name)
+
+
+@contextmanager
+def use_dataset(name: str) -> Iterator[DatasetSpec]:
+    """Run a block (a build step, a script) against dataset name."""
+    token = _current.set(get_spec(name).name)
+    try:
+        yield REGISTRY[name]
+    finally:
+        _current.reset(token)
+
+
+def indicator_args() -> Dict[str, str]:
+    """Query parameters selecting the current dataset, for links and API URLs (none for the default)."""
+    name = _current.get()
+    return {} if name == DEFAULT_DATASET else {"indicator": name}
+
+
+# ---------------------- Loaded snapshots ---------------------- #
+class DatasetCache:
+    """Snapshots of the registered datasets, loaded on first use and evicted least
+    recently used once their total ``nbytes`` exceeds ``budget``.
+
+    Loads of different datasets run concurrently; concurrent requests for the
+    same dataset wait for a single load. The pinned dataset is never evicted,
+    nor is the one just returned, so a single dataset over budget still loads.
+    """
+
+    def __init__(self, load: Callable[[DatasetSpec], Snapshot], budget: int, pinned: str = DEFAULT_DATASET) -> None:
+        self._load = load
+        self.budget = budget
+        self.pinned = pinned
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, name: str) -> Snapshot:
+        with self._lock:
+            snapshot = self._touch(name)
+            if snapshot is not None:
+                return snapshot
+            load_lock = self._loading.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                snapshot = self._touch(name)  # loaded by another thread meanwhile
+            if snapshot is None:
+                snapshot = self._load(get_spec(name))
+                self.put(name, snapshot)
+            return snapshot
+
+    def peek(self, name: str) -> Optional[Snapshot]:
+        """The loaded snapshot of name, if any, without loading it or marking it used."""
+        return self._snapshots.get(name)
+
+    def put(self, name: str, snapshot: Snapshot) -> None:
+        """Add or replace (on refresh) the snapshot of name, then evict down to the budget."""
+        with self._lock:
+            self._snapshots[name] = snapshot
+            self._snapshots.move_to_end(name)
+            self._evict(keep=name)
+
+    def loaded(self) -> List[str]:
+        """Names of the loaded datasets, least recently used first."""
+        return list(self._snapshots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(snapshot.nbytes for snapshot in self._snapshots.values())
+
+    def state(self) -> Dict[str, object]:
+        return {
+            "budget_bytes": self.budget,
+            "bytes": self.nbytes,
+            "evictions": self.evictions,
+            "loaded": {name: snapshot.nbytes for name, snapshot in self._snapshots.items()},
+        }
+
+    def _touch(self, name: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None:
+            self._snapshots.move_to_end(name)
+        return snapshot
+
+    def _evict(self, keep: str) -> None:
+        total = self.nbytes
+        for name in list(self._snapshots):
+            if total <= self.budget:
+                break
+            if name in (keep, self.pinned):
+                continue
+            total -= self._snapshots.pop(name).nbytes
+            self.evictions += 1
+            log.info("Evicted dataset %s (%.1f MB loaded, budget %.1f MB)", name, total / 2**20, self.budget / 2**20)
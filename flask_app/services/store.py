@@ -0,0 +1,166 @@
+"""Country-indexed columnar store for the CO2 dataset.
+
+Rows are grouped by country and sorted by year once, when the dataset is
+loaded. Each country then owns a contiguous block of every column and a
+country/year-range lookup is a dict hit plus a binary search, returning
+zero-copy views instead of re-scanning the whole frame with boolean masks.
+"""
+from functools import cached_property
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from ..config import CO2_COL, COUNTRY_COL, YEAR_COL
+
+
+class CountryStore:
+    """Per-country contiguous, year-sorted NumPy columns with offsets.
+
+    ``offsets[i]:offsets[i + 1]`` is the row block of ``countries[i]`` in every
+    array of ``columns``; within a block, ``columns[YEAR_COL]`` is ascending.
+    """
+
+    def __init__(self, countries: np.ndarray, offsets: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.countries = countries
+        self.offsets = offsets
+        self.columns = columns
+        self.years = columns[YEAR_COL]
+        self._index = {name: i for i, name in enumerate(countries.tolist())}
+        self._prefix_sums: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CountryStore":
+        """Build from a frame; categorical columns (see compact.py) stay categorical."""
+        country = df[COUNTRY_COL].array
+        if isinstance(country, pd.Categorical):
+            # Categories are sorted, so sorting by code sorts by name
+            keys, names = country.codes, np.asarray(country.categories, dtype=object)
+        else:
+            names, keys = np.unique(country.to_numpy(dtype=object), return_inverse=True)
+        # One stable sort of the whole frame; everything after is slicing
+        order = np.lexsort((df[YEAR_COL].to_numpy(), keys))
+        columns = {col: _take(df[col].array, order) for col in df.columns}
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.diff(sorted_keys, prepend=-2))
+        countries = names[sorted_keys[starts]]
+        offsets = np.append(starts, len(order)).astype(np.int64)
+        return cls(countries, offsets, columns)
+
+    def merged(self, other: "CountryStore") -> "CountryStore":
+        """Store with the rows of both (same columns, no (country, year) in both).
+
+        Blocks of countries in only one store are copied as they are; only the
+        blocks of countries in both are concatenated and re-sorted by year, so
+        appending a delta sorts the delta's countries, not the whole dataset.
+        """
+        n = len(self)
+        columns = {col: _concat(self.columns[col], other.columns[col]) for col in self.columns}
+        countries = np.union1d(self.countries, other.countries).astype(object)
+        blocks = []
+        for name in countries.tolist():
+            own, new = self._index.get(name), other._index.get(name)
+            own_rows = np.arange(self.offsets[own], self.offsets[own + 1]) if own is not None else None
+            new_rows = n + np.arange(other.offsets[new], other.offsets[new + 1]) if new is not None else None
+            if own_rows is None or new_rows is None:
+                blocks.append(new_rows if own_rows is None else own_rows)
+                continue
+            block = np.concatenate([own_rows, new_rows])
+            blocks.append(block[np.argsort(columns[YEAR_COL][block], kind="stable")])
+        order = np.concatenate(blocks)
+        offsets = np.concatenate([[0], np.cumsum([len(block) for block in blocks])]).astype(np.int64)
+        return CountryStore(countries, offsets, {col: _take(values, order) for col, values in columns.items()})
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    @property
+    def country_list(self) -> List[str]:
+        return self.countries.tolist()
+
+    @cached_property
+    def min_year(self) -> int:
+        return int(self.years.min())
+
+    @cached_property
+    def max_year(self) -> int:
+        return int(self.years.max())
+
+    def bounds(self, country: str, start_year: int, end_year: int) -> Tuple[int, int]:
+        """Return the ``[lo, hi)`` row positions of country within the year range."""
+        i = self._index.get(country)
+        if i is None:
+            return 0, 0
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        block = self.years[lo:hi]
+        # Keep the bounds representable in the (possibly int16) year dtype
+        info = np.iinfo(block.dtype)
+        start_year = min(max(start_year, info.min), info.max)
+        end_year = min(max(end_year, info.min), info.max)
+        return (
+            lo + int(np.searchsorted(block, start_year, side="left")),
+            lo + int(np.searchsorted(block, end_year, side="right")),
+        )
+
+    def slice(self, country: str, start_year: int, end_year: int) -> pd.DataFrame:
+        """Year-sorted rows of one country as a frame backed by array views."""
+        lo, hi = self.bounds(country, start_year, end_year)
+        return pd.DataFrame({col: arr[lo:hi] for col, arr in self.columns.items()}, copy=False)
+
+    def rows(self, countries: Sequence[str], start_year: int, end_year: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row positions of every country's year range, concatenated in the given order,
+        and for each row the position where its country's range starts."""
+        bounds = np.array([self.bounds(c, start_year, end_year) for c in countries], dtype=np.int64).reshape(-1, 2)
+        lengths = bounds[:, 1] - bounds[:, 0]
+        range_start = np.repeat(bounds[:, 0], lengths)
+        out_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.arange(int(lengths.sum())) - out_start + range_start, range_start
+
+    def prefix_sums(self, column: str = CO2_COL) -> np.ndarray:
+        """Cumulative sum of column with a leading zero, computed once per column.
+
+        Assumes the column has no NaN (the store is built from the clean frame).
+        """
+        sums = self._prefix_sums.get(column)
+        if sums is None:
+            sums = np.concatenate([[0.0], np.cumsum(self.columns[column], dtype=np.float64)])
+            self._prefix_sums[column] = sums
+        return sums
+
+    def compare(
+        self,
+        countries: Sequence[str],
+        start_year: int,
+        end_year: int,
+        rolling_window: int = 1,
+        column: str = CO2_COL,
+    ) -> pd.DataFrame:
+        """Rows of several countries (in the given order) with an optional rolling mean.
+
+        The rolling mean matches ``Series.rolling(window, min_periods=1).mean()``
+        applied per country to its year range, but is computed for all
+        countries at once from the cached prefix sums: two gathers and a
+        division per row, whatever the window size.
+        """
+        rows, range_start = self.rows(countries, start_year, end_year)
+        df = pd.DataFrame({col: arr[rows] for col, arr in self.columns.items()})
+        if rolling_window > 1 and len(rows):
+            sums = self.prefix_sums(column)
+            first = np.maximum(range_start, rows - rolling_window + 1)
+            df[f"Rolling {rolling_window}y"] = (sums[rows + 1] - sums[first]) / (rows + 1 - first)
+        return df
+
+
+def _concat(first, second):
+    """Concatenate two columns; categoricals are unioned with sorted categories (see compact.py)."""
+    if isinstance(first, pd.Categorical):
+        return union_categoricals([first, second], sort_categories=True)
+    return np.concatenate([first, second])
+
+
+def _take(values, order: np.ndarray):
+    """Reorder a column, keeping categoricals categorical and the rest as NumPy arrays."""
+    if isinstance(values, pd.Categorical):
+        return values.take(order)
+    return values.to_numpy()[order] if hasattr(values, "to_numpy") else np.asarray(values)[order]
@@ -0,0 +1,344 @@
+"""Out-of-core aggregation: dataset summaries in one chunked pass over the source.
+
+The in-memory path parses the whole CSV into the compact frame, the store and
+the range index before computing anything. For sources larger than memory
+(sub-national or monthly data, hundreds of millions of rows) ``aggregate``
+reads the CSV ``STREAM_CHUNK_ROWS`` rows at a time instead and folds each
+chunk into ``ChunkedAggregates``:
+
+- the missing-value counts per country,
+- the ``country x year`` sums and row counts behind the prefix-sum index (top
+  emitters, rank table),
+- the histogram: values are counted into ``FINE_BINS`` fine bins over the
+  range seen so far, whose width doubles (merging pairs of bins, exactly)
+  when a chunk falls outside it, then re-binned into the final bins over the
+  overall min/max.
+
+Memory is bounded by one chunk plus the ``country x year`` matrices. The
+results are those of the in-memory path: values get the same float32
+rounding (see compact.py), so missing counts and row counts are equal; sums
+are equal up to float64 summation order when the rows of a country and year
+fall into several chunks. Bin edges are equal; a bin count may be off by the
+share of the values of the fine bin each of its edges cuts through.
+
+The aggregates are stored as artifacts of the dataset version (see
+artifacts.py), with a record of the CSV and journal entries they cover.
+``update`` keeps them current: entries journaled since are folded into the
+stored aggregates, a changed CSV gets a new pass. Until a process loads a
+dataset's rows, data.py serves the year bounds, top emitters, rank table,
+missing counts and histogram from them; datasets registered with ``stream``
+are never loaded for those (see registry.py).
+
+``python -m flask_app.services.streaming [--dataset NAME]`` runs ``update``
+as a build step like prerender.py. ``--check`` also loads the dataset in
+memory and compares.
+"""
+import argparse
+import copy
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import CO2_COL, COUNTRY_COL, DEFAULT_DATASET, STREAM_CHUNK_ROWS, YEAR_COL
+from .artifacts import compute_nan_counts, load_or_build, load_stored, nan_counts_table, version_dir
+from .build import build_id
+from .compact import compact_frame
+from .fs import atomic_write
+from .histogram import HIST_BINS, histogram_bins
+from .range_index import PrefixSumIndex
+from .ranking import RankTable
+from .refresh import Delta, DeltaJournal
+from .registry import DatasetSpec, get_spec
+
+READ_BUFFER = 1 << 20
+# Bins the histogram is counted in before being re-binned to HIST_BINS
+FINE_BINS = 1 << 12
+# CSV and journal entries the stored aggregates of a dataset cover
+STATE = "streamed.json"
+_update_lock = threading.Lock()
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary file hashing the bytes read through it, so the pass yields the CSV's SHA-256 too."""
+
+    def __init__(self, fh: io.BufferedReader) -> None:
+        self._fh = fh
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._fh.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:n])
+        return n
+
+
+class ChunkedAggregates:
+    """Running results over the compact chunks (see compact.py) passed to ``add``.
+
+    ``version`` is set by ``aggregate`` to the dataset version the chunks make
+    up. Holds no file, so it is stored as a pickled artifact and extended later.
+    """
+
+    def __init__(self, chunk_rows: int = STREAM_CHUNK_ROWS) -> None:
+        self.chunk_rows = chunk_rows
+        self.version: Optional[str] = None
+        self.rows = 0
+        self._ids: Dict[str, int] = {}
+        self._missing = np.zeros(0, dtype=np.int64)
+        self.first_year: Optional[int] = None
+        self.last_year: Optional[int] = None
+        self._sums = np.zeros((0, 0))
+        self._counts = np.zeros((0, 0), dtype=np.int64)
+        # Fine histogram: bin i counts the values in [lo + i * width, lo + (i + 1) * width)
+        self._fine = np.zeros(FINE_BINS, dtype=np.int64)
+        self._lo, self._width = 0.0, 0.0
+        self._finite = 0
+        self._min, self._max = np.inf, -np.inf
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """Fold in a chunk with categorical country names, int16 years and float32 values."""
+        names = frame[COUNTRY_COL].array
+        # Chunk codes -> ids of the whole pass (-1, no name, stays -1)
+        lookup = np.array([self._ids.setdefault(name, len(self._ids)) for name in names.categories] + [-1])
+        country = lookup[names.codes]
+        values = frame[CO2_COL].to_numpy()
+        valid = ~np.isnan(values)
+        n = len(self._ids)
+        self._missing = np.pad(self._missing, (0, n - len(self._missing)))
+        self._missing += np.bincount(country[(country >= 0) & ~valid], minlength=n)
+        rows = (country >= 0) & valid
+        if rows.any():
+            self._add_cells(country[rows], frame[YEAR_COL].to_numpy()[rows], values[rows])
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            self._add_values(finite.astype(np.float64))
+        self.rows += len(frame)
+
+    def _add_cells(self, country: np.ndarray, years: np.ndarray, values: np.ndarray) -> None:
+        lo, hi = int(years.min()), int(years.max())
+        if self.first_year is None:
+            self.first_year, self.last_year = lo, lo - 1
+        first, last = min(lo, self.first_year), max(hi, self.last_year)
+        # Grow the matrices to the countries and years seen so far
+        widths = ((0, len(self._ids) - len(self._sums)), (self.first_year - first, last - self.last_year))
+        self._sums, self._counts = np.pad(self._sums, widths), np.pad(self._counts, widths)
+        self.first_year, self.last_year = first, last
+        cell = country * (last - first + 1) + (years.astype(np.int64) - first)
+        # Bin over the chunk's cells only, not a chunk-sized copy of the whole matrix
+        cells, inverse = np.unique(cell, return_inverse=True)
+        self._sums.reshape(-1)[cells] += np.bincount(inverse, weights=values.astype(np.float64))
+        self._counts.reshape(-1)[cells] += np.bincount(inverse)
+
+    def _add_values(self, values: np.ndarray) -> None:
+        lo, hi = float(values.min()), float(values.max())
+        if not self._finite:
+            self._lo = lo
+            self._width = (hi - lo) / (FINE_BINS - 1) or max(abs(lo), 1.0) / FINE_BINS
+        while lo < self._lo or hi >= self._lo + FINE_BINS * self._width:
+            # Twice as wide: pairs of bins merge, so counts stay exact
+            merged = self._fine.reshape(-1, 2).sum(axis=1)
+            if lo < self._lo:
+                self._fine = np.concatenate([np.zeros_like(merged), merged])
+                self._lo -= FINE_BINS * self._width
+            else:
+                self._fine = np.concatenate([merged, np.zeros_like(merged)])
+            self._width *= 2
+        bins = np.clip(((values - self._lo) / self._width).astype(np.int64), 0, FINE_BINS - 1)
+        self._fine += np.bincount(bins, minlength=FINE_BINS)
+        self._finite += len(values)
+        self._min, self._max = min(self._min, lo), max(self._max, hi)
+
+    def nan_counts(self) -> pd.DataFrame:
+        """``compute_nan_counts`` of the rows seen (see artifacts.py)."""
+        names = np.array(list(self._ids), dtype=object)
+        order = np.argsort(names)
+        counts = pd.DataFrame(
+            {"Missing CO2": self._missing[order]}, index=pd.CategoricalIndex(names[order], name=COUNTRY_COL)
+        )
+        return nan_counts_table(counts)
+
+    def index(self) -> PrefixSumIndex:
+        """The prefix-sum index over the rows with a value; ValueError if there are none."""
+        if self.first_year is None:
+            raise ValueError("No rows with a value")
+        names = np.array(list(self._ids), dtype=object)
+        sums, counts = self._sums, self._counts
+        present = np.flatnonzero(counts.sum(axis=1) > 0)
+        rows = present[np.argsort(names[present])]
+        prefix_sums = np.zeros((len(rows), sums.shape[1] + 1))
+        prefix_counts = np.zeros((len(rows), sums.shape[1] + 1), dtype=np.int64)
+        np.cumsum(sums[rows], axis=1, out=prefix_sums[:, 1:])
+        np.cumsum(counts[rows], axis=1, out=prefix_counts[:, 1:])
+        return PrefixSumIndex(names[rows], self.first_year, prefix_sums, prefix_counts)
+
+    def histogram(self, nbins: int = HIST_BINS) -> Tuple[np.ndarray, np.ndarray]:
+        """``histogram_bins`` of the values seen, re-binned from the fine bins.
+
+        The edges are those of ``histogram_bins``; the values below each edge
+        are interpolated within the fine bin it falls in, so they are off by at
+        most that bin's count (see ``edge_error``).
+        """
+        if not self._finite:
+            return histogram_bins(np.empty(0), nbins)
+        edges = np.histogram_bin_edges(np.empty(0), bins=nbins, range=(self._min, self._max))
+        cumulative = np.concatenate([[0], np.cumsum(self._fine)])
+        below = np.interp((edges - self._lo) / self._width, np.arange(FINE_BINS + 1), cumulative)
+        below[0], below[-1] = 0, self._finite
+        return np.diff(np.rint(below).astype(np.int64)), edges
+
+    def edge_error(self, edges: np.ndarray) -> np.ndarray:
+        """Bound on the error of the values below each of edges: the count of its fine bin."""
+        bins = np.clip(((edges - self._lo) / self._width).astype(np.int64), 0, FINE_BINS - 1)
+        return self._fine[bins]
+
+
+def aggregate(spec: DatasetSpec, chunk_rows: int = STREAM_CHUNK_ROWS) -> ChunkedAggregates:
+    """One chunked pass over the dataset's CSV, then its journaled deltas (see refresh.py)."""
+    aggregates = ChunkedAggregates(chunk_rows)
+    columns = [COUNTRY_COL, YEAR_COL, CO2_COL]
+    with open(spec.path, "rb") as fh:
+        reader = _HashingReader(fh)
+        source = io.BufferedReader(reader, READ_BUFFER)
+        with pd.read_csv(source, sep=spec.separator, usecols=spec.source_columns, chunksize=chunk_rows) as chunks:
+            for chunk in chunks:
+                aggregates.add(compact_frame(spec.normalize(chunk)[columns]))
+        for _ in iter(lambda: source.read(READ_BUFFER), b""):
+            pass  # hash any bytes the parser left unread
+    aggregates.version = spec.base_version(reader.digest.hexdigest())
+    _add_deltas(spec, aggregates, DeltaJournal(spec.journal_dir).entries())
+    return aggregates
+
+
+def _add_deltas(spec: DatasetSpec, aggregates: ChunkedAggregates, entries: List[Tuple[str, str]]) -> None:
+    for sha, path in entries:
+        delta = spec.read_delta(path)
+        aggregates.add(delta.raw)
+        aggregates.version = Delta.of(sha, aggregates.version, delta).version
+
+
+def write_artifacts(spec: DatasetSpec, aggregates: ChunkedAggregates) -> List[str]:
+    """Store the results as the dataset version's artifacts (kept if already built); return their names."""
+    builders = {
+        "aggregates": lambda: aggregates,
+        "nan_counts": aggregates.nan_counts,
+        "histogram_bins": aggregates.histogram,
+        "range_index": aggregates.index,
+        "rank_table": lambda: RankTable.from_index(aggregates.index()),
+    }
+    for name, build in builders.items():
+        load_or_build(aggregates.version, name, build, root=spec.artifact_dir)
+    return list(builders)
+
+
+# ---------------------- Stored aggregates ---------------------- #
+def _sources(spec: DatasetSpec) -> Dict[str, Any]:
+    """What the aggregates of the dataset as it is now are computed from."""
+    st = os.stat(spec.path)
+    return {
+        "build": build_id(),
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "deltas": [sha for sha, _ in DeltaJournal(spec.journal_dir).entries()],
+    }
+
+
+def _read_state(spec: DatasetSpec) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(spec.artifact_dir, STATE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def streamed_version(spec: DatasetSpec) -> Optional[str]:
+    """Version of the dataset's stored aggregates if they cover its CSV and journal as they are now."""
+    state = _read_state(spec)
+    if state is None or not os.path.exists(spec.path):
+        return None
+    version = state.pop("version")
+    return version if state == _sources(spec) else None
+
+
+def update(spec: DatasetSpec, chunk_rows: int = STREAM_CHUNK_ROWS) -> str:
+    """Bring the dataset's stored aggregates up to date and return their version.
+
+    Entries journaled since are folded into the stored aggregates; a changed
+    CSV (or code, see build.py) gets a new pass.
+    """
+    with _update_lock:
+        sources, state = _sources(spec), _read_state(spec) or {}
+        version = state.pop("version", None)
+        if state == sources:
+            return version
+        found, aggregates = False, None
+        if version is not None and state == {**sources, "deltas": sources["deltas"][:len(state["deltas"])]}:
+            found, aggregates = load_stored(version, "aggregates", root=spec.artifact_dir)
+        if found:
+            aggregates = copy.deepcopy(aggregates)  # the stored one may be in use
+            _add_deltas(spec, aggregates, DeltaJournal(spec.journal_dir).entries()[len(state["deltas"]):])
+        else:
+            aggregates = aggregate(spec, chunk_rows)
+        write_artifacts(spec, aggregates)
+        state = {"version": aggregates.version, **sources}
+        atomic_write(os.path.join(spec.artifact_dir, STATE), json.dumps(state, indent=2) + "\n")
+        return aggregates.version
+
+
+def compare(spec: DatasetSpec, aggregates: ChunkedAggregates) -> Dict[str, bool]:
+    """Which results match those of the in-memory path (this loads the whole dataset)."""
+    from .data import load_snapshot
+
+    snapshot = load_snapshot(spec)
+    index, expected = aggregates.index(), snapshot.index
+    counts, edges = aggregates.histogram()
+    expected_counts, expected_edges = histogram_bins(snapshot.store.columns[CO2_COL])
+    return {
+        "version": aggregates.version == snapshot.version,
+        "nan_counts": aggregates.nan_counts().equals(compute_nan_counts(snapshot.dataset.raw)),
+        "histogram_bins": np.array_equal(edges, expected_edges) and bool(
+            # Values below each edge, within the count of the fine bin it cuts through
+            np.all(np.abs(np.cumsum(counts) - np.cumsum(expected_counts)) <= aggregates.edge_error(edges[1:]) + 1)
+        ),
+        "index": (
+            index.first_year == expected.first_year
+            and np.array_equal(index.countries, expected.countries)
+            and np.array_equal(index.counts, expected.counts)
+            and np.allclose(index.sums, expected.sums, rtol=1e-12, atol=0)
+        ),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="registered dataset name")
+    parser.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS)
+    parser.add_argument("--check", action="store_true", help="compare with the in-memory path")
+    args = parser.parse_args(argv)
+    spec = get_spec(args.dataset)
+
+    t0 = time.perf_counter()
+    version = update(spec, args.chunk_rows)
+    seconds = time.perf_counter() - t0
+    _, aggregates = load_stored(version, "aggregates", root=spec.artifact_dir)
+    print(
+        f"Aggregates of {aggregates.rows} rows of {spec.name} up to date in {seconds:.2f} s "
+        f"in {version_dir(spec.artifact_dir, version)}"
+    )
+    if args.check:
+        results = compare(spec, aggregates)
+        print("\n".join(f"  {name:<15}{'same' if same else 'DIFFERENT'}" for name, same in results.items()))
+        return 0 if all(results.values()) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Server-side paginated, sortable tables.
+
+Tables are sent one page at a time as JSON instead of being rendered whole
+with ``to_html``: the first page is embedded in the page or API payload, and
+the table component in static/js/app.js loads further pages and re-sorts
+through ``/api/tables/<name>`` (its ``source``). Response size and rendering
+time depend on the page size, not on the length of the table.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config import TABLE_PAGE_SIZE
+
+
+def table_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame whose index is data (e.g. ``describe``) as a plain frame with a leading blank-named column."""
+    return df.rename_axis("").reset_index()
+
+
+def sort_order(column: pd.Series, descending: bool) -> np.ndarray:
+    """Stable row order by column, missing values last; mixed-type columns sort as text."""
+    try:
+        ordered = column.sort_values(ascending=not descending, kind="stable", na_position="last")
+    except TypeError:
+        ordered = column.astype(str).sort_values(ascending=not descending, kind="stable")
+    return column.index.get_indexer(ordered.index)
+
+
+def _cells(values: Any) -> List[Any]:
+    """JSON-ready cell values: float32 as its shortest repr (see compact.py), NaN as null."""
+    if isinstance(values, pd.Categorical):
+        values = np.asarray(values, dtype=object)
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        return [float(str(v)) if math.isfinite(v) else None for v in values]
+    cells = [v.item() if isinstance(v, np.generic) else v for v in values.tolist()]
+    return [None if isinstance(v, float) and not math.isfinite(v) else v for v in cells]
+
+
+def table_page(
+    df: pd.DataFrame,
+    source: str,
+    page: int = 0,
+    page_size: int = TABLE_PAGE_SIZE,
+    sort: Optional[int] = None,
+    descending: bool = False,
+) -> Dict[str, Any]:
+    """One page of df, optionally sorted by the column at position sort."""
+    df = df.reset_index(drop=True)
+    lo = page * page_size
+    if sort is not None and 0 <= sort < len(df.columns):
+        rows = sort_order(df.iloc[:, sort], descending)[lo:lo + page_size]
+    else:
+        sort, rows = None, np.arange(lo, min(lo + page_size, len(df)))
+    columns = [_cells(df.iloc[:, i].array.take(rows)) for i in range(len(df.columns))]
+    return {
+        "source": source,
+        "columns": [str(c) for c in df.columns],
+        "rows": [list(row) for row in zip(*columns)],
+        "total": len(df),
+        "page": page,
+        "page_size": page_size,
+        "sort": sort,
+        "desc": descending,
+    }
@@ -1,3 +1,213 @@
+// Paginated tables ({source, columns, rows, total, page, page_size, sort, desc}):
+// the first page comes embedded in the page or API payload, later pages and
+// other sort orders are fetched from table.source (/api/tables/<name>)
+function formatCell(value) {
+  if (value === null) return '';
+  if (typeof value === 'number' && !Number.isInteger(value)) return String(Number(value.toFixed(6)));
+  return String(value);
+}
+
+function appendRows(tbody, rows) {
+  const fragment = document.createDocumentFragment();
+  rows.forEach((row) => {
+    const tr = document.createElement('tr');
+    row.forEach((value) => {
+      const td = document.createElement('td');
+      td.textContent = formatCell(value);
+      tr.appendChild(td);
+    });
+    fragment.appendChild(tr);
+  });
+  tbody.appendChild(fragment);
+}
+
+async function fetchTablePage(table, page, sort, desc) {
+  const url = new URL(table.source, window.location.href);
+  url.searchParams.set('page', page);
+  url.searchParams.set('page_size', table.page_size);
+  if (sort === null) {
+    url.searchParams.delete('sort');
+  } else {
+    url.searchParams.set('sort', sort);
+    url.searchParams.set('desc', desc ? '1' : '0');
+  }
+  const resp = await fetch(url);
+  if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+  return resp.json();
+}
+
+function mountTable(container, table) {
+  container.replaceChildren();
+  if (!table) return;
+  const el = document.createElement('table');
+  el.className = 'table table-sm table-striped';
+  const headRow = el.createTHead().insertRow();
+  table.columns.forEach((name, i) => {
+    const th = document.createElement('th');
+    th.textContent = name + (table.sort === i ? (table.desc ? ' ▼' : ' ▲') : '');
+    th.role = 'button';
+    // Header click: first page in this column's order (toggles direction)
+    th.addEventListener('click', async () => {
+      const desc = table.sort === i ? !table.desc : false;
+      mountTable(container, await fetchTablePage(table, 0, i, desc));
+    });
+    headRow.appendChild(th);
+  });
+  const tbody = el.createTBody();
+  appendRows(tbody, table.rows);
+
+  const footer = document.createElement('div');
+  footer.className = 'd-flex align-items-center gap-2 small text-muted';
+  const status = document.createElement('span');
+  const more = document.createElement('button');
+  more.type = 'button';
+  more.className = 'btn btn-sm btn-outline-secondary';
+  more.textContent = 'Load more';
+  let loaded = table.rows.length;
+  let page = table.page;
+  const update = () => {
+    status.textContent = `${loaded} of ${table.total} rows`;
+    more.hidden = loaded >= table.total;
+  };
+  more.addEventListener('click', async () => {
+    more.disabled = true;
+    try {
+      const next = await fetchTablePage(table, page + 1, table.sort, table.desc);
+      appendRows(tbody, next.rows);
+      loaded += next.rows.length;
+      page = next.page;
+    } finally {
+      more.disabled = false;
+      update();
+    }
+  });
+  update();
+  footer.append(status, more);
+  container.append(el, footer);
+}
+
+// Patch a section in place from a JSON API payload ({figure, table, download_url})
+function patchSection(section, payload) {
+  const plot = section.querySelector('[data-role="plot"]');
+  const empty = section.querySelector('[data-role="empty"]');
+  if (payload.figure) {
+    plot.hidden = false;
+    Plotly.react(plot, payload.figure.data, payload.figure.layout, {responsive: true});
+  } else {
+    plot.hidden = true;
+  }
+  if (empty) empty.hidden = Boolean(payload.figure);
+
+  const table = section.querySelector('[data-role="table"]');
+  if (table) {
+    mountTable(table, payload.table);
+    const block = table.closest('[data-role="table-block"]') || table;
+    block.hidden = !payload.table;
+  }
+
+  const download = section.querySelector('[data-role="download"]');
+  if (download && payload.download_url) {
+    download.href = payload.download_url;
+    download.hidden = !payload.figure;
+  }
+}
+
+// Forms with data-api refresh their target section through the API when a
+// data-live control changes; the Apply button and data-submit controls (the
+// indicator, which changes the year bounds and countries) submit the whole page.
+function bindLiveForm(form) {
+  const section = document.getElementById(form.dataset.target);
+  if (!section) return;
+  let timer = null;
+  let controller = null;
+
+  const refresh = async () => {
+    const params = new URLSearchParams(new FormData(form));
+    if (controller) controller.abort();
+    controller = new AbortController();
+    try {
+      const resp = await fetch(`${form.dataset.api}?${params}`, {signal: controller.signal});
+      if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+      patchSection(section, await resp.json());
+      history.replaceState(null, '', `${form.getAttribute('action')}?${params}`);
+    } catch (err) {
+      if (err.name !== 'AbortError') form.submit();
+    }
+  };
+
+  form.querySelectorAll('[data-live]').forEach((input) => {
+    const eventName = input.type === 'number' ? 'input' : 'change';
+    input.addEventListener(eventName, () => {
+      clearTimeout(timer);
+      timer = setTimeout(refresh, 150);
+    });
+  });
+  form.querySelectorAll('[data-submit]').forEach((input) => {
+    input.addEventListener('change', () => form.submit());
+  });
+}
+
+// Animated top N race: one payload of typed arrays (years x top_n), turned into
+// one Plotly frame per year; bars sit at their rank, labelled with the country.
+const TYPED_ARRAYS = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+                      i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array};
+
+function decodeTyped(spec) {
+  const bytes = Uint8Array.from(atob(spec.bdata), (c) => c.charCodeAt(0));
+  return new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+}
+
+function raceFrames(payload) {
+  const codes = decodeTyped(payload.country);
+  const values = decodeTyped(payload.value);
+  const changes = decodeTyped(payload.rank_change);
+  const topN = payload.years.length ? codes.length / payload.years.length : 0;
+  return payload.years.map((year, i) => {
+    const x = [], y = [], text = [];
+    for (let r = 0; r < topN; r++) {
+      const k = i * topN + r;
+      if (codes[k] < 0) continue;
+      const change = changes[k] > 0 ? ` ▲${changes[k]}` : changes[k] < 0 ? ` ▼${-changes[k]}` : '';
+      x.push(values[k]);
+      y.push(r + 1);
+      text.push(`${payload.countries[codes[k]]}${change}`);
+    }
+    return {name: String(year), data: [{x, y, text}], layout: {title: {text: `${payload.title}: ${year}`}}};
+  });
+}
+
+function mountRace(section) {
+  const form = document.querySelector(`form[data-target="${section.dataset.form}"]`);
+  const plot = section.querySelector('[data-role="plot"]');
+  const empty = section.querySelector('[data-role="empty"]');
+  section.querySelector('[data-role="play"]').addEventListener('click', async () => {
+    const url = new URL(section.dataset.race, window.location.href);
+    if (form) new FormData(form).forEach((value, key) => url.searchParams.set(key, value));
+    const payload = await (await fetch(url)).json();
+    const frames = raceFrames(payload);
+    empty.hidden = frames.length > 0;
+    plot.hidden = frames.length === 0;
+    if (!frames.length) return;
+    const topN = Math.max(...frames.map((f) => f.data[0].y.length));
+    const xMax = Math.max(...frames.flatMap((f) => f.data[0].x));
+    const first = frames[0];
+    const trace = {type: 'bar', orientation: 'h', textposition: 'inside', insidetextanchor: 'start', ...first.data[0]};
+    const layout = {
+      title: first.layout.title,
+      xaxis: {title: {text: payload.label}, range: [0, xMax * 1.05]},
+      yaxis: {title: {text: 'Rank'}, autorange: false, range: [topN + 0.5, 0.5], dtick: 1},
+      sliders: [{
+        currentvalue: {prefix: 'Year: '},
+        steps: frames.map((f) => ({label: f.name, method: 'animate',
+                                   args: [[f.name], {mode: 'immediate', frame: {duration: 0, redraw: true}}]})),
+      }],
+    };
+    await Plotly.newPlot(plot, [trace], layout, {responsive: true});
+    await Plotly.addFrames(plot, frames);
+    Plotly.animate(plot, null, {frame: {duration: 400, redraw: true}, transition: {duration: 250}});
+  });
+}
+
 document.addEventListener('DOMContentLoaded', () => {
   const btn = document.getElementById('celebrateBtn');
   if (btn) {
@@ -5,6 +215,8 @@ document.addEventListener('DOMContentLoaded', () => {
       confetti({ particleCount: 150, spread: 80, origin: { y: 0.6 } });
     });
   }
-});
-
 
+  document.querySelectorAll('[data-table]').forEach((el) => mountTable(el, JSON.parse(el.dataset.table)));
+  document.querySelectorAll('form[data-api]').forEach(bindLiveForm);
+  document.querySelectorAll('[data-race]').forEach(mountRace);
+});
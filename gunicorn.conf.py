@@ -0,0 +1,36 @@
+"""Gunicorn settings for the Flask app: ``gunicorn -c gunicorn.conf.py``.
+
+When the CSV is already on disk the dataset and its indexes are loaded once in
+the master and shared copy-on-write by the forked workers. Otherwise each
+worker fetches it in a background thread and answers 503 (see /readyz) until
+it is ready, so a slow upstream never holds a request past the worker timeout.
+"""
+import gc
+import os
+
+# create_app runs in the master here (preload_app); loading is driven by the hooks below
+os.environ.setdefault("CO2_BACKGROUND_LOAD", "0")
+
+wsgi_app = "flask_app.app:create_app()"
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8502")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+preload_app = True
+
+
+def on_starting(server):
+    from flask_app.config import LOCAL_PATH
+    from flask_app.services.data import loader
+
+    if os.path.exists(LOCAL_PATH):
+        loader.run()
+        # Keep the preloaded objects out of the GC's generations so collections in
+        # the workers do not write to (and un-share) their pages
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from flask_app.services.data import loader, watcher
+
+    loader.start()  # no-op when the master already loaded the dataset
+    watcher.start()  # each worker applies ingested deltas to its own copy
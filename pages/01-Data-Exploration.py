@@ -1,14 +1,9 @@
 import streamlit as st
 import plotly.express as px
 
-st.snow()
+from streamlit_data import show_cat, snow_once
 
-def show_cat(sidebar: bool = True):
-    url = "https://upload.wikimedia.org/wikipedia/commons/thumb/7/74/A-Cat.jpg/960px-A-Cat.jpg?20101227100718"
-    if sidebar:
-        st.sidebar.image(url, caption="Cat", use_container_width=True)
-    else:
-        st.image(url, caption="Cat", use_container_width=True)
+snow_once()
 
 st.sidebar.title("Celebrate 🎊")
 if st.sidebar.button("Balloons! 🎈"):
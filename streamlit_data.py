@@ -0,0 +1,141 @@
+"""Shared data layer for the Streamlit app (`app.py`) and its pages.
+
+The dataset and everything derived from it (compact frame, country store,
+prefix-sum index, histogram bins, overview tables) live in ``st.cache_resource``
+entries keyed by the local CSV's mtime and the ingested deltas (see
+flask_app/services/refresh.py): they are built once per process and
+shared by every session and page, without the per-rerun copy ``st.cache_data``
+makes. Pages only read them, so returning the same objects is safe. Summaries
+are also persisted per dataset content hash and shared with the Flask app
+(see flask_app/services/artifacts.py).
+"""
+import os
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from flask_app.config import CAT_URL, CO2_COL, DEFAULT_DATASET
+from flask_app.services.artifacts import compute_nan_counts, describe_frame, info_text, load_or_build
+from flask_app.services.assets import vendored_path
+from flask_app.services.compact import CompactDataset
+from flask_app.services.histogram import histogram_bins
+from flask_app.services.loader import DatasetLoader
+from flask_app.services.range_index import PrefixSumIndex
+from flask_app.services.refresh import DeltaJournal, Snapshot
+from flask_app.services.registry import REGISTRY
+from flask_app.services.store import CountryStore
+
+# (CSV mtime, shas of the journaled deltas)
+Version = Tuple[float, Tuple[str, ...]]
+# The Streamlit pages show the default (CO2 per capita) dataset of the registry
+spec = REGISTRY[DEFAULT_DATASET]
+journal = DeltaJournal(spec.journal_dir)
+
+
+# ---------------------- Decorations ---------------------- #
+def snow_once() -> None:
+    """Let it snow on the first run of a session only, not on every widget change."""
+    if not st.session_state.get("_snowed"):
+        st.session_state["_snowed"] = True
+        st.snow()
+
+
+def show_cat(sidebar: bool = True) -> None:
+    """Display the cat image: the vendored copy if the asset build step ran, else its URL."""
+    target = st.sidebar if sidebar else st
+    target.image(vendored_path("cat.jpg") or CAT_URL, caption="Cat", use_container_width=True)
+
+
+# ---------------------- Dataset ---------------------- #
+@st.cache_resource(show_spinner=False)
+def dataset_loader() -> DatasetLoader:
+    """Fetch (with retries, falling back to the bundled snapshot) and convert the CSV
+    in a background thread shared by all sessions."""
+    loader = DatasetLoader(prepare=lambda path: spec.ensure_cache(), url=spec.url, path=spec.path)
+    loader.start()
+    return loader
+
+
+def dataset_version() -> Version:
+    """mtime of the local CSV and the journaled deltas once the background load is
+    done; until then show its progress and rerun instead of blocking on the
+    upstream server. A delta ingested through the Flask app shows up on the next rerun."""
+    loader = dataset_loader()
+    if loader.status == "failed":
+        st.error(f"Could not load the dataset: {loader.error}")
+        if st.button("Retry download"):
+            loader.start()
+            st.rerun()
+        st.stop()
+    if not loader.ready:
+        st.info(f"Fetching the CO2 dataset (attempt {max(loader.attempts, 1)})…")
+        time.sleep(1)
+        st.rerun()
+    return os.path.getmtime(spec.path), tuple(sha for sha, _ in journal.entries())
+
+
+# Each version (CSV mtime, applied deltas) is a new key: keep the current one and
+# the previous one (sessions still rerunning on it), not every version since start
+@st.cache_resource(show_spinner=True, max_entries=2)
+def get_base_snapshot(mtime: float) -> Snapshot:
+    """The source CSV alone: compact frame plus CO2 mask (see flask_app/services/compact.py) and indexes."""
+    return Snapshot.build(spec.base_version(), spec.read())
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_snapshot(version: Version) -> Snapshot:
+    """The base snapshot with the journaled deltas appended, without re-reading the CSV."""
+    mtime, shas = version
+    base = get_base_snapshot(mtime)
+    entries = [(sha, path) for sha, path in journal.entries() if sha in shas]
+    if not entries:
+        return base
+    return base.append([(sha, spec.read_delta(path)) for sha, path in entries])
+
+
+def get_dataset(version: Version) -> CompactDataset:
+    return get_snapshot(version).dataset
+
+
+def get_store(version: Version) -> CountryStore:
+    return get_snapshot(version).store
+
+
+def get_range_index(version: Version) -> PrefixSumIndex:
+    return get_snapshot(version).index
+
+
+def content_hash(version: Version) -> str:
+    """Dataset version (schema and CSV content hash chained with the deltas), the key of the persisted artifacts."""
+    return get_snapshot(version).version
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_histogram(version: Version) -> Tuple[np.ndarray, np.ndarray]:
+    """(counts, edges) of the CO2 column."""
+    return load_or_build(
+        content_hash(version),
+        "histogram_bins",
+        lambda: histogram_bins(get_store(version).columns[CO2_COL]),
+        root=spec.artifact_dir,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_overview(version: Version) -> Tuple[str, pd.DataFrame]:
+    """``info()`` text and ``describe(include="all")`` of the clean frame."""
+    dataset = get_dataset(version)
+    return (
+        load_or_build(content_hash(version), "info_text", lambda: info_text(dataset.clean()), spec.artifact_dir),
+        load_or_build(content_hash(version), "describe", lambda: describe_frame(dataset.clean()), spec.artifact_dir),
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_nan_counts(version: Version) -> pd.DataFrame:
+    return load_or_build(
+        content_hash(version), "nan_counts", lambda: compute_nan_counts(get_dataset(version).raw), root=spec.artifact_dir
+    )
@@ -0,0 +1,142 @@
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_app.app import create_app  # noqa: E402
+from flask_app.config import (  # noqa: E402
+    CO2_COL,
+    CODE_COL,
+    COUNTRY_COL,
+    DATASET_MEMORY_MB,
+    LOCAL_PATH,
+    SEPARATOR,
+    YEAR_COL,
+)
+from flask_app.services import data  # noqa: E402
+from flask_app.services.compact import CO2_DTYPE, CompactDataset  # noqa: E402
+from flask_app.services.registry import DatasetCache  # noqa: E402
+from flask_app.services.store import CountryStore  # noqa: E402
+
+# (status, body, delay in seconds) of one response
+Reply = Tuple[int, bytes, float]
+
+
+class FileServer:
+    """Local stand-in for the dataset's HTTP server.
+
+    ``routes`` maps a path to the replies of its successive requests; the last
+    one repeats. ``hits`` counts the requests per path.
+    """
+
+    def __init__(self) -> None:
+        self.routes: Dict[str, List[Reply]] = {}
+        self.hits: Dict[str, int] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                replies = server.routes.get(self.path, [(404, b"", 0.0)])
+                n = server.hits.get(self.path, 0)
+                server.hits[self.path] = n + 1
+                status, body, delay = replies[min(n, len(replies) - 1)]
+                time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up (timeout)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def file_server():
+    server = FileServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def closed_port() -> int:
+    """A free local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_frame(n_countries: int = 12, first_year: int = 1990, last_year: int = 2009, seed: int = 0) -> pd.DataFrame:
+    """Small dataset in canonical columns: shuffled rows, some NaN values, uneven year coverage."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n_countries):
+        start = first_year + int(rng.integers(0, 5))
+        for year in range(start, last_year + 1):
+            value = float(np.round(rng.gamma(2.0, 3.0), 3)) if rng.random() > 0.1 else np.nan
+            rows.append((f"Country {i:02d}", f"C{i:02d}", year, value))
+    frame = pd.DataFrame(rows, columns=[COUNTRY_COL, CODE_COL, YEAR_COL, CO2_COL])
+    return frame.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    return make_frame()
+
+
+def reference(frame: pd.DataFrame) -> pd.DataFrame:
+    """Rows with a value, as stored: float32-rounded values accumulated in float64 (see compact.py)."""
+    clean = frame.dropna(subset=[CO2_COL]).copy()
+    clean[CO2_COL] = clean[CO2_COL].astype(CO2_DTYPE).astype(np.float64)
+    return clean
+
+
+@pytest.fixture
+def dataset(frame) -> CompactDataset:
+    return CompactDataset.from_frame(frame)
+
+
+@pytest.fixture
+def store(dataset) -> CountryStore:
+    return CountryStore.from_frame(dataset.clean())
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, frame):
+    """The app serving frame as the default dataset, loaded, with its data under tmp_path."""
+    # Relative data, cache and artifact paths resolve in tmp_path
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(LOCAL_PATH) or ".")
+    frame.to_csv(LOCAL_PATH, sep=SEPARATOR, index=False)
+    monkeypatch.setattr(data, "datasets", DatasetCache(data.load_snapshot, int(DATASET_MEMORY_MB * 2**20)))
+    monkeypatch.setattr(data.loader, "status", "ready")
+    return create_app(cache_backend="lru", background_load=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
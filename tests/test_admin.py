@@ -0,0 +1,85 @@
+"""The ingest endpoint and poller, against the app serving the synthetic frame."""
+import os
+
+import pandas as pd
+import pytest
+
+from flask_app.blueprints import admin
+from flask_app.config import CO2_COL, CODE_COL, COUNTRY_COL, SEPARATOR, YEAR_COL
+from flask_app.services import data
+from flask_app.services.refresh import DeltaJournal
+from flask_app.services.registry import current_spec
+
+TOKEN = {"Authorization": "Bearer secret"}
+SERIES = "/api/series?country=Country 00"
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+
+
+def delta(rows) -> bytes:
+    frame = pd.DataFrame(rows, columns=[COUNTRY_COL, CODE_COL, YEAR_COL, CO2_COL])
+    return frame.to_csv(sep=SEPARATOR, index=False).encode()
+
+
+def test_ingest_appends_rows_and_changes_the_etag(client):
+    before = client.get(SERIES)
+    etag, rows = before.headers["ETag"], before.get_json()["table"]["total"]
+    response = client.post("/admin/ingest", data=delta([("Country 00", "C00", 2010, 4.5)]), headers=TOKEN)
+    assert response.status_code == 200
+    assert response.get_json()["journaled"] and len(response.get_json()["applied"]) == 1
+
+    after = client.get(SERIES, headers={"If-None-Match": etag})
+    assert after.status_code == 200 and after.headers["ETag"] != etag
+    assert after.get_json()["table"]["total"] == rows + 1
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        delta([("Country 00", "C00", 2010, 4.5), ("Country 00", "C00", 2010, 5.0)]),  # repeated within
+        b"country;year\nA;2000\n",  # other columns
+        delta([("Country 00", "C00", "late", 4.5)]),  # non-integer year
+        b"",
+    ],
+)
+def test_ingest_rejects_invalid_deltas(app, client, body):
+    response = client.post("/admin/ingest", data=body, headers=TOKEN)
+    assert response.status_code == 400 and response.get_json()["error"]
+    with app.test_request_context():
+        assert DeltaJournal(current_spec().journal_dir).entries() == []
+
+
+def test_ingest_rejects_rows_the_dataset_has(frame, client):
+    row = frame.dropna().iloc[0]
+    body = delta([(row[COUNTRY_COL], row[CODE_COL], row[YEAR_COL], 1.0)])
+    response = client.post("/admin/ingest", data=body, headers=TOKEN)
+    assert response.status_code == 400 and "only add rows" in response.get_json()["error"]
+
+
+def test_ingest_requires_the_token(client):
+    assert client.post("/admin/ingest", data=delta([("A", "AAA", 2010, 1.0)])).status_code == 401
+
+
+def test_ingest_checks_deltas_journaled_by_other_workers(app, client):
+    body = delta([("Country 00", "C00", 2010, 4.5)])
+    with app.test_request_context():
+        # Journaled by another worker: not applied here yet
+        DeltaJournal(current_spec().journal_dir).add(delta([("Country 00", "C00", 2010, 9.0)]))
+    response = client.post("/admin/ingest", data=body, headers=TOKEN)
+    assert response.status_code == 400 and "only add rows" in response.get_json()["error"]
+
+
+def test_poller_journals_incoming_files_one_at_a_time(app):
+    with app.test_request_context():
+        spec = current_spec()
+        data.get_snapshot()
+        os.makedirs(spec.ingest_dir)
+        for name, value in (("a.csv", 1.0), ("b.csv", 2.0)):
+            with open(os.path.join(spec.ingest_dir, name), "wb") as fh:
+                fh.write(delta([("Country 00", "C00", 2010, value)]))
+        data.poll_ingest()
+        assert len(DeltaJournal(spec.journal_dir).entries()) == 1
+        assert os.listdir(os.path.join(spec.ingest_dir, "rejected")) == ["b.csv"]
@@ -0,0 +1,26 @@
+import os
+import time
+
+from flask_app.services.artifacts import load_or_build, prune, version_dir
+
+
+def make_versions(root, ages):
+    now = time.time()
+    for name, age in ages.items():
+        os.makedirs(root / name)
+        os.utime(root / name, (now - age, now - age))
+
+
+def test_prune_keeps_the_newest_and_the_recently_used(tmp_path):
+    make_versions(tmp_path, {"v1": 4000, "v2": 3000, "v3": 2000, "v4": 10, "v5": 0})
+    prune(str(tmp_path), keep=2, max_age=2500)
+    assert sorted(os.listdir(tmp_path)) == ["v3", "v4", "v5"]
+
+
+def test_new_version_keeps_the_previous_one(tmp_path):
+    assert load_or_build("v1", "answer", lambda: "42", root=str(tmp_path)) == "42"
+    assert load_or_build("v2", "answer", lambda: "43", root=str(tmp_path)) == "43"
+    dirs = [version_dir(str(tmp_path), version) for version in ("v1", "v2")]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in dirs)
+    # Another worker still on v1 reads its artifact back instead of rebuilding it
+    assert load_or_build("v1", "answer", lambda: "rebuilt", root=str(tmp_path)) == "42"
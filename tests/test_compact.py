@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.config import CO2_COL, CODE_COL, COUNTRY_COL, YEAR_COL
+from flask_app.services.compact import CompactDataset, compact_frame
+from flask_app.services.registry import DatasetSpec
+
+
+def test_compact_frame(frame, dataset):
+    raw = dataset.raw
+    assert raw[YEAR_COL].dtype == np.int16 and raw[CO2_COL].dtype == np.float32
+    for col in (COUNTRY_COL, CODE_COL):
+        assert list(raw[col].cat.categories) == sorted(frame[col].unique())
+        assert raw[col].astype(str).tolist() == frame[col].tolist()
+    np.testing.assert_array_equal(raw[CO2_COL].to_numpy(), frame[CO2_COL].to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(dataset.valid, frame[CO2_COL].notna().to_numpy())
+    assert len(dataset.clean()) == frame[CO2_COL].notna().sum()
+
+
+def test_compact_frame_rejects_years_out_of_int16(frame):
+    with pytest.raises(ValueError):
+        compact_frame(frame.assign(**{YEAR_COL: frame[YEAR_COL] + 40_000}))
+
+
+def test_append_unions_categories(frame):
+    first, second = frame[frame[COUNTRY_COL] < "Country 06"], frame[frame[COUNTRY_COL] >= "Country 06"]
+    appended = CompactDataset.from_frame(first).append(CompactDataset.from_frame(second))
+    assert list(appended.raw[COUNTRY_COL].cat.categories) == sorted(frame[COUNTRY_COL].unique())
+    expected = first[COUNTRY_COL].tolist() + second[COUNTRY_COL].tolist()
+    assert appended.raw[COUNTRY_COL].astype(str).tolist() == expected
+
+
+def test_dataset_is_mapped_from_the_compact_arrow_cache(tmp_path, frame):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "indicator.csv"
+    frame.rename(columns={CO2_COL: "value"}).to_csv(path, sep=";", index=False)
+    spec = DatasetSpec("indicator", url="", value_col="value", path=str(path), separator=";")
+
+    for _ in range(2):  # converting, then mapping the cache
+        raw = spec.read().raw
+        pd.testing.assert_frame_equal(raw, CompactDataset.from_frame(frame).raw)
+        # Read-only views of the mapped file, not heap copies
+        assert not raw[COUNTRY_COL].array.codes.flags.writeable
+        assert not raw[YEAR_COL].to_numpy().flags.writeable
+        assert not raw[CO2_COL].to_numpy().flags.writeable
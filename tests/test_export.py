@@ -0,0 +1,45 @@
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from flask_app.config import COUNTRY_COL, YEAR_COL
+from flask_app.services.compact import CompactDataset
+from flask_app.services.export import export_chunks, parquet_chunks
+from flask_app.services.store import CountryStore
+
+
+@pytest.fixture
+def store(frame):
+    return CountryStore.from_frame(CompactDataset.from_frame(frame).clean())
+
+
+def test_parquet_row_groups_span_countries(store, frame):
+    frames = (store.slice(country, 1990, 2009) for country in store.country_list)
+    schema_frame = store.slice(store.country_list[0], 1990, 1990)
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(parquet_chunks(frames, schema_frame, row_group_rows=50))))
+    sizes = [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)]
+    assert sum(sizes) == len(store)
+    assert all(size == 50 for size in sizes[:-1]) and 0 < sizes[-1] <= 50
+    expected = frame.dropna().sort_values([COUNTRY_COL, YEAR_COL], ignore_index=True)
+    result = parquet.read().to_pandas()
+    assert result[COUNTRY_COL].astype(str).tolist() == expected[COUNTRY_COL].tolist()
+    assert result[YEAR_COL].tolist() == expected[YEAR_COL].tolist()
+
+
+def test_csv_export_matches_the_store(store):
+    countries = store.country_list[:3]
+    body = b"".join(export_chunks(store, countries, 1995, 2000, "csv"))
+    result = pd.read_csv(io.BytesIO(body))
+    expected = store.compare(countries, 1995, 2000)
+    assert result[YEAR_COL].tolist() == expected[YEAR_COL].tolist()
+    assert result[COUNTRY_COL].tolist() == expected[COUNTRY_COL].astype(str).tolist()
+
+
+def test_download_clamps_bad_years_and_quotes_the_filename(client):
+    response = client.get("/pages/time-series/download?country=Country 00&start_year=abc&end_year=2100")
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == 'attachment; filename="co2_per_capita_Country 00_1990_2009.csv"'
+    rows = pd.read_csv(io.BytesIO(response.get_data()), sep=None, engine="python")
+    assert len(rows) > 0
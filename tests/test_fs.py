@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from flask_app.services.fs import ProcessThread, atomic_path, atomic_write, file_lock
+
+
+def test_atomic_write_replaces_content(tmp_path):
+    path = str(tmp_path / "file.txt")
+    atomic_write(path, "old")
+    atomic_write(path, b"new")
+    with open(path, "rb") as fh:
+        assert fh.read() == b"new"
+    assert os.listdir(tmp_path) == ["file.txt"]
+
+
+def test_failed_write_keeps_old_content_and_removes_tmp(tmp_path):
+    path = str(tmp_path / "file.txt")
+    atomic_write(path, "old")
+    with pytest.raises(RuntimeError):
+        with atomic_path(path) as tmp_path_:
+            with open(tmp_path_, "w") as fh:
+                fh.write("partial")
+            raise RuntimeError("write failed")
+    with open(path) as fh:
+        assert fh.read() == "old"
+    assert os.listdir(tmp_path) == ["file.txt"]
+
+
+def test_process_thread_runs_once_at_a_time():
+    release = threading.Event()
+    runs = []
+    thread = ProcessThread(lambda: (runs.append(1), release.wait(5)), name="test")
+    assert thread.start()
+    assert not thread.start()
+    release.set()
+    thread.join(5)
+    assert not thread.running
+    assert thread.start()
+    thread.join(5)
+    assert len(runs) == 2
+
+
+def _hold_lock(path, held, release):
+    with file_lock(path):
+        held.set()
+        release.wait(10)
+
+
+def test_file_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / "journal" / ".lock")
+    context = multiprocessing.get_context("fork")
+    held, release = context.Event(), context.Event()
+    holder = context.Process(target=_hold_lock, args=(path, held, release))
+    holder.start()
+    try:
+        assert held.wait(10)
+        acquired = threading.Event()
+
+        def take():
+            with file_lock(path):
+                acquired.set()
+
+        thread = threading.Thread(target=take)
+        thread.start()
+        assert not acquired.wait(0.3)
+        release.set()
+        assert acquired.wait(10)
+        thread.join()
+    finally:
+        release.set()
+        holder.join(10)
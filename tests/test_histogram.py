@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from flask_app.config import CO2_COL
+from flask_app.services.histogram import histogram_bins
+
+from .conftest import reference
+
+
+def test_histogram_bins_match_pd_cut(frame, store):
+    counts, edges = histogram_bins(store.columns[CO2_COL], nbins=20)
+    values = reference(frame)[CO2_COL]
+    assert edges[0] == values.min() and edges[-1] == values.max()
+    expected = pd.cut(values, edges, include_lowest=True).value_counts(sort=False)
+    np.testing.assert_array_equal(counts, expected.to_numpy())
+
+
+def test_histogram_bins_skip_missing_and_infinite_values():
+    counts, _ = histogram_bins(np.array([1.0, np.nan, np.inf, 2.0, -np.inf]), nbins=4)
+    assert counts.sum() == 2
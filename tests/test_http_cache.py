@@ -0,0 +1,52 @@
+"""Conditional GET of the API routes, against the app serving the synthetic frame."""
+import gzip
+import os
+
+from flask_app.services import data, prerender
+from flask_app.services.registry import current_spec
+
+SERIES = "/api/series?country=Country 00"
+
+
+def test_repeat_request_gets_304(client):
+    first = client.get(SERIES)
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert first.headers["Cache-Control"].startswith("public")
+
+    repeat = client.get(SERIES, headers={"If-None-Match": first.headers["ETag"]})
+    assert repeat.status_code == 304 and repeat.get_data() == b""
+    assert repeat.headers["ETag"] == first.headers["ETag"]
+
+    other = client.get(f"{SERIES}&rolling=3", headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200 and other.headers["ETag"] != first.headers["ETag"]
+
+
+def test_etag_does_not_depend_on_parameter_order(client):
+    url = "/api/top-emitters?start_year=1995&end_year=2000"
+    etag = client.get(url).headers["ETag"]
+    assert client.get("/api/top-emitters?end_year=2000&start_year=1995").headers["ETag"] == etag
+
+
+def test_gzip_and_identity_bodies_have_distinct_etags(app, client):
+    with app.test_request_context():
+        snapshot = data.get_snapshot()
+        start_year, end_year = snapshot.store.min_year, snapshot.store.max_year
+        version = snapshot.scope_version(("Country 00",), start_year, end_year)
+        root = current_spec().prerender_dir
+        path = prerender.payload_path(version, "Country 00", start_year, end_year, 1, False, True, root)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as fh:
+        fh.write(gzip.compress(b'{"figure": null}'))
+
+    zipped = client.get(SERIES, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(SERIES, headers={"Accept-Encoding": "identity"})
+    assert zipped.headers["Content-Encoding"] == "gzip" and "Content-Encoding" not in plain.headers
+    assert plain.get_data() == b'{"figure": null}'
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert zipped.headers["Vary"] == plain.headers["Vary"] == "Accept-Encoding"
+
+    revalidated = client.get(SERIES, headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]})
+    assert revalidated.status_code == 304 and revalidated.headers["Vary"] == "Accept-Encoding"
+    # The gzip validator does not match the identity representation
+    mismatch = client.get(SERIES, headers={"Accept-Encoding": "identity", "If-None-Match": zipped.headers["ETag"]})
+    assert mismatch.status_code == 200 and mismatch.get_data() == b'{"figure": null}'
@@ -0,0 +1,93 @@
+import gzip
+import os
+
+import pytest
+
+from flask_app.services.loader import DatasetLoader, fetch_dataset, save_snapshot
+
+CSV = b"Country Name;Country Code;Year;CO2 Per Capita (metric tons)\nA;AA;2000;1.5\n"
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "data" / "co2.csv"), str(tmp_path / "snapshot" / "co2.csv.gz")
+
+
+def _read(path):
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+def test_fetch_downloads_and_refreshes_snapshot(file_server, paths):
+    path, snapshot = paths
+    file_server.routes["/co2.csv"] = [(200, CSV, 0.0)]
+    assert fetch_dataset(url=file_server.url("/co2.csv"), path=path, snapshot_path=snapshot) == "remote"
+    assert _read(path) == CSV
+    with gzip.open(snapshot, "rb") as fh:
+        assert fh.read() == CSV
+    # An existing local copy is kept without any request
+    assert fetch_dataset(url=file_server.url("/co2.csv"), path=path, snapshot_path=snapshot) == "local"
+    assert file_server.hits["/co2.csv"] == 1
+
+
+def test_fetch_retries_server_errors_with_backoff(file_server, paths):
+    path, snapshot = paths
+    file_server.routes["/co2.csv"] = [(503, b"", 0.0), (500, b"", 0.0), (200, CSV, 0.0)]
+    sleeps = []
+    source = fetch_dataset(
+        url=file_server.url("/co2.csv"), path=path, retries=4, backoff=0.5, snapshot_path=snapshot, sleep=sleeps.append
+    )
+    assert source == "remote"
+    assert file_server.hits["/co2.csv"] == 3
+    assert sleeps == [0.5, 1.0]
+    assert _read(path) == CSV
+
+
+def test_fetch_retries_timeouts(file_server, paths):
+    path, snapshot = paths
+    file_server.routes["/co2.csv"] = [(200, CSV, 1.0), (200, CSV, 0.0)]
+    sleeps = []
+    source = fetch_dataset(
+        url=file_server.url("/co2.csv"), path=path, timeout=0.2, snapshot_path=snapshot, sleep=sleeps.append
+    )
+    assert source == "remote"
+    assert file_server.hits["/co2.csv"] == 2
+    assert len(sleeps) == 1
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".part")]
+
+
+def test_fetch_falls_back_to_snapshot_when_server_is_down(closed_port, paths, tmp_path):
+    path, snapshot = paths
+    source_csv = tmp_path / "source.csv"
+    source_csv.write_bytes(CSV)
+    save_snapshot(str(source_csv), snapshot)
+    sleeps = []
+    source = fetch_dataset(
+        url=f"http://127.0.0.1:{closed_port}/co2.csv", path=path, retries=3, snapshot_path=snapshot, sleep=sleeps.append
+    )
+    assert source == "snapshot"
+    assert _read(path) == CSV
+    assert len(sleeps) == 2
+
+
+def test_fetch_without_snapshot_fails(closed_port, paths):
+    path, snapshot = paths
+    with pytest.raises(RuntimeError, match="no snapshot"):
+        fetch_dataset(
+            url=f"http://127.0.0.1:{closed_port}/co2.csv", path=path, retries=2, snapshot_path=snapshot, sleep=lambda s: None
+        )
+    assert not os.path.exists(path)
+
+
+def test_loader_reports_state(file_server, paths):
+    path, snapshot = paths
+    file_server.routes["/co2.csv"] = [(500, b"", 0.0), (200, CSV, 0.0)]
+    prepared = []
+    loader = DatasetLoader(
+        prepare=prepared.append, url=file_server.url("/co2.csv"), path=path, snapshot_path=snapshot, backoff=0.01
+    )
+    loader.start()
+    assert loader.wait(5)
+    assert prepared == [path]
+    assert loader.state()["source"] == "remote"
+    assert loader.state()["attempts"] == 2
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from flask_app.config import CO2_COL, COUNTRY_COL, YEAR_COL
+from flask_app.services.compact import CompactDataset
+from flask_app.services.range_index import PrefixSumIndex
+from flask_app.services.store import CountryStore
+
+from .conftest import reference
+
+
+@pytest.mark.parametrize(
+    "start_year, end_year, top_n", [(1990, 2009, 5), (1995, 1999, 3), (2005, 2005, 30), (2020, 2030, 5)]
+)
+def test_top_matches_groupby_mean(frame, store, start_year, end_year, top_n):
+    clean = reference(frame)
+    in_range = clean[clean[YEAR_COL].between(start_year, end_year)]
+    expected = in_range.groupby(COUNTRY_COL)[CO2_COL].mean().sort_values(ascending=False).head(top_n)
+
+    top = PrefixSumIndex.from_store(store).top(start_year, end_year, top_n)
+    assert top[COUNTRY_COL].tolist() == expected.index.tolist()
+    np.testing.assert_allclose(top[CO2_COL].to_numpy(dtype=np.float64), expected.to_numpy(), rtol=1e-12)
+
+
+def test_merged_matches_one_index(frame):
+    def index(rows):
+        return PrefixSumIndex.from_store(CountryStore.from_frame(CompactDataset.from_frame(rows).clean()))
+
+    early, late = frame[frame[YEAR_COL] < 2000], frame[frame[YEAR_COL] >= 2000]
+    merged, expected = index(early).merged(index(late)), index(frame)
+    np.testing.assert_array_equal(merged.countries, expected.countries)
+    np.testing.assert_array_equal(merged.counts, expected.counts)
+    np.testing.assert_allclose(merged.sums, expected.sums, rtol=1e-12)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from flask_app.config import CO2_COL, COUNTRY_COL, YEAR_COL
+from flask_app.services.range_index import PrefixSumIndex
+from flask_app.services.ranking import RankTable
+
+from .conftest import reference
+
+
+def test_rank_table_matches_per_year_ranking(frame, store):
+    table = RankTable.from_index(PrefixSumIndex.from_store(store))
+    clean = reference(frame)
+    countries = table.countries.tolist()
+    for year, rows in clean.groupby(YEAR_COL):
+        # Descending value, ties by name
+        ranked = rows.sort_values([CO2_COL, COUNTRY_COL], ascending=[False, True])[COUNTRY_COL].tolist()
+        col = year - table.first_year
+        for rank, country in enumerate(ranked, start=1):
+            assert table.ranks[countries.index(country), col] == rank
+            assert table.leaders[rank - 1, col] == countries.index(country)
+        assert (table.leaders[len(ranked):, col] == -1).all()
+        missing = [countries.index(c) for c in countries if c not in ranked]
+        assert (table.ranks[missing, col] == 0).all() and np.isnan(table.values[missing, col]).all()
+
+
+def test_frames_are_each_years_top_n(frame, store):
+    table = RankTable.from_index(PrefixSumIndex.from_store(store))
+    clean = reference(frame)
+    years, frame_countries, codes, values, _ = table.frames(2000, 2002, 3)
+    assert years == [2000, 2001, 2002]
+    for i, year in enumerate(years):
+        rows = clean[clean[YEAR_COL] == year].nlargest(3, CO2_COL)
+        assert frame_countries[codes[i]].tolist() == rows[COUNTRY_COL].tolist()
+        np.testing.assert_allclose(values[i], rows[CO2_COL].to_numpy(dtype=np.float32))
+    assert table.frames(2050, 2060, 3)[0] == []
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.config import CO2_COL, CODE_COL, COUNTRY_COL, YEAR_COL
+from flask_app.services.compact import CompactDataset
+from flask_app.services.range_index import PrefixSumIndex
+from flask_app.services.refresh import DeltaJournal, Snapshot, read_delta
+from flask_app.services.store import CountryStore
+
+COLUMNS = [COUNTRY_COL, CODE_COL, YEAR_COL, CO2_COL]
+
+
+def delta_csv(rows) -> bytes:
+    return pd.DataFrame(rows, columns=COLUMNS).to_csv(index=False).encode()
+
+
+def split(frame: pd.DataFrame):
+    """The frame without its last two years (the base) and those years plus a new country (the delta)."""
+    last = frame[YEAR_COL].max()
+    base = frame[frame[YEAR_COL] < last - 1]
+    new = pd.DataFrame([("Newland", "NEW", 2000, 1.5), ("Newland", "NEW", 2001, np.nan)], columns=COLUMNS)
+    return base, pd.concat([frame[frame[YEAR_COL] >= last - 1], new], ignore_index=True)
+
+
+def assert_same_store(store: CountryStore, expected: CountryStore) -> None:
+    assert store.country_list == expected.country_list
+    np.testing.assert_array_equal(store.offsets, expected.offsets)
+    for col, values in expected.columns.items():
+        np.testing.assert_array_equal(np.asarray(store.columns[col]), np.asarray(values))
+
+
+def test_append_matches_a_full_build(frame):
+    base, delta = split(frame)
+    snapshot = Snapshot.build("v0", CompactDataset.from_frame(base))
+    appended = snapshot.append([("sha", read_delta(delta_csv(delta), ",", COLUMNS))])
+    expected = Snapshot.build("v0", CompactDataset.from_frame(pd.concat([base, delta], ignore_index=True)))
+
+    assert_same_store(appended.store, expected.store)
+    index = PrefixSumIndex.from_store(expected.store)
+    np.testing.assert_array_equal(appended.index.countries, index.countries)
+    np.testing.assert_allclose(appended.index.sums, index.sums)
+    np.testing.assert_array_equal(appended.index.counts, index.counts)
+    assert len(appended.dataset.raw) == len(frame) + 2
+    assert appended.version != snapshot.version
+
+
+def test_store_merge_of_disjoint_years(frame):
+    early, late = frame[frame[YEAR_COL] < 2000], frame[frame[YEAR_COL] >= 2000]
+    early_store = CountryStore.from_frame(CompactDataset.from_frame(early).clean())
+    late_store = CountryStore.from_frame(CompactDataset.from_frame(late).clean())
+    expected = CountryStore.from_frame(CompactDataset.from_frame(frame).clean())
+    assert_same_store(late_store.merged(early_store), expected)
+
+
+def test_delta_repeating_dataset_rows_is_rejected(frame):
+    snapshot = Snapshot.build("v0", CompactDataset.from_frame(frame))
+    row = frame.iloc[0]
+    delta = read_delta(delta_csv([(row[COUNTRY_COL], row[CODE_COL], row[YEAR_COL], 1.0)]), ",", COLUMNS)
+    with pytest.raises(ValueError, match="deltas only add rows"):
+        snapshot.check_delta(delta)
+    snapshot.check_delta(read_delta(delta_csv([(row[COUNTRY_COL], row[CODE_COL], 2030, 1.0)]), ",", COLUMNS))
+
+
+def test_delta_repeating_its_own_rows_is_rejected():
+    with pytest.raises(ValueError, match="repeat"):
+        read_delta(delta_csv([("A", "AAA", 2030, 1.0), ("A", "AAA", 2030, 2.0)]), ",", COLUMNS)
+
+
+def test_journal_adds_each_delta_once(tmp_path):
+    journal = DeltaJournal(str(tmp_path / "deltas"))
+    assert journal.entries() == []
+    first, added = journal.add(b"a")
+    assert added
+    second, _ = journal.add(b"b")
+    assert journal.add(b"a") == (first, False)
+    assert [sha for sha, _ in journal.entries()] == [first, second]
+    with open(journal.entries()[1][1], "rb") as fh:
+        assert fh.read() == b"b"
+
+
+def test_scope_version_follows_the_last_delta_touching_the_scope(frame):
+    snapshot = Snapshot.build("v0", CompactDataset.from_frame(frame))
+    late = read_delta(delta_csv([("Country 00", "C00", 2010, 1.0), ("Country 01", "C01", 2011, 2.0)]), ",", COLUMNS)
+    new = read_delta(delta_csv([("Newland", "NEW", 2012, 3.0)]), ",", COLUMNS)
+    updated = snapshot.append([("sha1", late), ("sha2", new)])
+    first, second = updated.deltas
+    assert updated.version == second.version != first.version
+
+    assert updated.scope_version(["Country 00"], 1990, 2009) == "v0"
+    assert updated.scope_version(["Country 05"], 1990, 2030) == "v0"
+    assert updated.scope_version(["Country 00"], 2000, 2010) == first.version
+    assert updated.scope_version(["Country 01", "Newland"], 2011, 2012) == second.version
+    assert updated.scope_version(None, 1990, 2009) == "v0"
+    assert updated.scope_version(None, 2011, 2011) == first.version
+    assert updated.scope_version(None, 1990, 2030) == second.version
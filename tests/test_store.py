@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.config import CO2_COL, COUNTRY_COL, YEAR_COL
+
+from .conftest import reference
+
+COUNTRIES = ["Country 03", "Country 00", "Country 11"]
+
+
+@pytest.mark.parametrize("window", [1, 3, 7])
+def test_rolling_means_match_pandas(frame, store, window):
+    result = store.compare(COUNTRIES, 1993, 2006, window)
+
+    clean = reference(frame)
+    expected = []
+    for country in COUNTRIES:
+        rows = clean[(clean[COUNTRY_COL] == country) & clean[YEAR_COL].between(1993, 2006)].sort_values(YEAR_COL)
+        if window > 1:
+            rows = rows.assign(**{f"Rolling {window}y": rows[CO2_COL].rolling(window, min_periods=1).mean()})
+        expected.append(rows)
+    expected = pd.concat(expected, ignore_index=True)
+    assert result[COUNTRY_COL].astype(str).tolist() == expected[COUNTRY_COL].tolist()
+    assert result[YEAR_COL].tolist() == expected[YEAR_COL].tolist()
+    if window > 1:
+        np.testing.assert_allclose(result[f"Rolling {window}y"], expected[f"Rolling {window}y"], rtol=1e-12)
+
+
+def test_unknown_country_has_no_rows(store):
+    assert store.bounds("Atlantis", 1990, 2009) == (0, 0)
+    assert store.compare(["Atlantis"], 1990, 2009, 3).empty
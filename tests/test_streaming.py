@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.config import CO2_COL, CODE_COL, COUNTRY_COL, DEFAULT_DATASET, SEPARATOR, YEAR_COL
+from flask_app.services import data
+from flask_app.services.artifacts import compute_nan_counts
+from flask_app.services.compact import CompactDataset, compact_frame
+from flask_app.services.histogram import histogram_bins
+from flask_app.services.range_index import PrefixSumIndex
+from flask_app.services.refresh import DeltaJournal
+from flask_app.services.registry import REGISTRY
+from flask_app.services.store import CountryStore
+from flask_app.services.streaming import ChunkedAggregates, streamed_version, update
+
+COLUMNS = [COUNTRY_COL, YEAR_COL, CO2_COL]
+
+
+def assert_close_histogram(aggregates: ChunkedAggregates, values: np.ndarray, nbins: int) -> None:
+    """Same edges; the values below each edge within the count of the fine bin it cuts through."""
+    counts, edges = aggregates.histogram(nbins=nbins)
+    expected_counts, expected_edges = histogram_bins(values, nbins=nbins)
+    np.testing.assert_array_equal(edges, expected_edges)
+    assert counts.sum() == expected_counts.sum()
+    error = np.abs(np.cumsum(counts) - np.cumsum(expected_counts))
+    assert np.all(error <= aggregates.edge_error(edges[1:]) + 1)
+
+
+@pytest.mark.parametrize("chunk_rows", [7, 64, 10_000])
+def test_chunks_match_the_in_memory_path(frame, chunk_rows):
+    dataset = CompactDataset.from_frame(frame[COLUMNS])
+    store = CountryStore.from_frame(dataset.clean())
+    aggregates = ChunkedAggregates(chunk_rows)
+    for start in range(0, len(frame), chunk_rows):
+        aggregates.add(compact_frame(frame[COLUMNS].iloc[start:start + chunk_rows]))
+
+    assert aggregates.rows == len(frame)
+    expected_missing = frame[CO2_COL].isna().groupby(frame[COUNTRY_COL]).sum()
+    nan_counts = aggregates.nan_counts()
+    assert nan_counts.equals(compute_nan_counts(dataset.raw))
+    assert dict(zip(nan_counts[COUNTRY_COL], nan_counts["Missing CO2"])) == expected_missing[expected_missing > 0].to_dict()
+
+    index, expected = aggregates.index(), PrefixSumIndex.from_store(store)
+    assert index.first_year == expected.first_year
+    np.testing.assert_array_equal(index.countries, expected.countries)
+    np.testing.assert_array_equal(index.counts, expected.counts)
+    np.testing.assert_allclose(index.sums, expected.sums, rtol=1e-12)
+
+    assert_close_histogram(aggregates, store.columns[CO2_COL], nbins=20)
+
+
+def test_histogram_widens_to_each_chunk():
+    rng = np.random.default_rng(1)
+    # Each chunk outside the range of the previous ones, below and above
+    chunks = [rng.normal(0, 1, 5000), rng.normal(-40, 5, 5000), rng.normal(300, 50, 5000), np.full(10, 7.0)]
+    aggregates = ChunkedAggregates()
+    for values in chunks:
+        frame = pd.DataFrame({COUNTRY_COL: "A", YEAR_COL: 2000, CO2_COL: values})
+        aggregates.add(compact_frame(frame))
+    values = np.concatenate(chunks).astype(np.float32)
+    assert_close_histogram(aggregates, values, nbins=60)
+
+
+def test_no_values():
+    aggregates = ChunkedAggregates()
+    aggregates.add(compact_frame(pd.DataFrame({COUNTRY_COL: ["A"], YEAR_COL: [2000], CO2_COL: [np.nan]})))
+    with pytest.raises(ValueError):
+        aggregates.index()
+    assert aggregates.histogram(nbins=4)[0].sum() == 0
+
+
+def test_update_folds_new_journal_entries(app):
+    spec = REGISTRY[DEFAULT_DATASET]
+    assert streamed_version(spec) is None
+    version = update(spec)
+    assert streamed_version(spec) == version == spec.base_version()
+
+    delta = pd.DataFrame([("Newland", "NEW", 2030, 1.5)], columns=[COUNTRY_COL, CODE_COL, YEAR_COL, CO2_COL])
+    DeltaJournal(spec.journal_dir).add(delta.to_csv(sep=SEPARATOR, index=False).encode())
+    assert streamed_version(spec) is None
+    assert update(spec) == data.load_snapshot(spec).version == streamed_version(spec)
+    assert data.get_range_index().last_year == 2030
+
+
+def test_stream_dataset_serves_summaries_without_loading_rows(app, client, monkeypatch):
+    monkeypatch.setattr(REGISTRY[DEFAULT_DATASET], "stream", True)
+    for url in ("/", "/?show_missing=1", "/api/top-emitters", "/api/top-emitters/race", "/api/tables/missing"):
+        assert client.get(url).status_code == 200, url
+    assert data.datasets.peek(DEFAULT_DATASET) is None
+
+    top = client.get("/api/top-emitters").get_json()
+    # Loading the rows (the series needs them) changes neither the version nor the results
+    assert client.get("/api/series").status_code == 200
+    assert data.datasets.peek(DEFAULT_DATASET) is not None
+    assert client.get("/api/top-emitters").get_json() == top
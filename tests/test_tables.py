@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.config import CO2_COL, COUNTRY_COL, YEAR_COL
+from flask_app.services.tables import table_page
+
+
+def cells(frame: pd.DataFrame):
+    """Rows as table_page returns them: NaN as None."""
+    return [[None if isinstance(v, float) and np.isnan(v) else v for v in row] for row in frame.itertuples(index=False)]
+
+
+def test_pages_cover_the_frame_in_order(frame):
+    pages = [table_page(frame, "t", page, page_size=50) for page in range(-(-len(frame) // 50))]
+    assert all(page["total"] == len(frame) for page in pages)
+    assert [row for page in pages for row in page["rows"]] == cells(frame)
+    assert table_page(frame, "t", len(pages), page_size=50)["rows"] == []
+
+
+@pytest.mark.parametrize("column, descending", [(CO2_COL, False), (CO2_COL, True), (COUNTRY_COL, True), (YEAR_COL, False)])
+def test_sorted_pages_match_sort_values(frame, column, descending):
+    sort = list(frame.columns).index(column)
+    expected = frame.sort_values(column, ascending=not descending, kind="stable", na_position="last")
+    page = table_page(frame, "t", 2, page_size=20, sort=sort, descending=descending)
+    assert page["sort"] == sort and page["desc"] == descending
+    assert page["rows"] == cells(expected.iloc[40:60])
+
+
+def test_unknown_sort_column_is_ignored(frame):
+    page = table_page(frame, "t", 0, page_size=5, sort=99)
+    assert page["sort"] is None
+    assert page["rows"] == cells(frame.head(5))